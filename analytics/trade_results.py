@@ -1,5 +1,7 @@
 import pandas as pd
 from api.yf import download_data
+from api.cache import get_default_cache
+from utils.trading_calendar import previous_session
 
 def calculate_accuracy(df: pd.DataFrame) -> pd.Series:
     """
@@ -458,7 +460,7 @@ def calculate_nr_of_trades(df: pd.DataFrame) -> pd.Series:
     
     return nr_trades
 
-def run_report(df: pd.DataFrame, group_by: str, settings_df: pd.DataFrame) -> pd.DataFrame:
+def run_report(df: pd.DataFrame, group_by: str, settings_df: pd.DataFrame, benchmark: bool = True) -> pd.DataFrame:
     """
     Run the report on the trade data, combining all metrics in a specific order.
     
@@ -470,6 +472,9 @@ def run_report(df: pd.DataFrame, group_by: str, settings_df: pd.DataFrame) -> pd
         Time period to group by ('day', 'week', 'month', 'year')
     settings_df : pd.DataFrame
         DataFrame containing backtest settings
+    benchmark : bool, optional
+        Download SPY and QQQ for the comparison columns, by default True.
+        If False the columns are left empty and nothing is downloaded.
         
     Returns
     -------
@@ -510,7 +515,10 @@ def run_report(df: pd.DataFrame, group_by: str, settings_df: pd.DataFrame) -> pd
     result = result.reset_index().rename(columns={'index': 'period'})
 
     # Generate comparison data
-    comparison_data = generate_comparison_data(group_by, settings_df)
+    if benchmark:
+        comparison_data = generate_comparison_data(group_by, settings_df)
+    else:
+        comparison_data = pd.DataFrame(columns=['period', 'spy_perc_return', 'qqq_perc_return'])
 
     # Merge with comparison data
     result = pd.merge(result, comparison_data, on='period', how='left')
@@ -552,10 +560,8 @@ def get_backtest_timeframe(settings_df: pd.DataFrame) -> dict:
     start_date = pd.to_datetime(settings_df['backtesting_start'].iloc[0])
     end_date = pd.to_datetime(settings_df['backtesting_end'].iloc[0])
     
-    # Create business day range ending exactly at min_trade_date with one extra day before
-    # This gives us exactly the previous business day
-    earliest_date = pd.bdate_range(end=start_date, periods=2)[0]
-    earliest_date = earliest_date.strftime('%Y-%m-%d')
+    # Previous NYSE session, so holidays are skipped as well as weekends
+    earliest_date = previous_session(start_date).strftime('%Y-%m-%d')
     print(f"get_backtest_timeframe: Original min date: {start_date}, Previous business day: {earliest_date}")
 
     end_date = end_date.strftime('%Y-%m-%d')
@@ -586,8 +592,9 @@ def generate_comparison_data(group_by: str, settings_df: pd.DataFrame, tickers:
     # Get timeframe dictionary with start_date and end_date
     start_date, end_date = get_backtest_timeframe(settings_df)
     
-    # Download data with adjusted start date
-    benchmark_data = download_data(tickers, start=start_date, end=end_date)
+    # Download data with adjusted start date, repeated reports reuse the on-disk cache
+    benchmark_data = download_data(tickers, start=start_date, end=end_date, cache=True)
+    get_default_cache().report()
     
     # Process each ticker and prepare a list for concatenation
     ticker_dfs = []
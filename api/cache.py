@@ -0,0 +1,448 @@
+"""
+On-disk cache for daily market-data downloads.
+
+Each (ticker, interval) is stored as one compressed .npz file holding its bars
+as typed column arrays plus the date range the cache covers. Bars dated before
+the entry's stable_end were already final when they were fetched and never
+expire. The bars from stable_end on (today's, still forming) are refetched
+once they are older than the TTL. A request outside the covered range only
+fetches the missing edges and merges them into the entry.
+
+Every edge fetch also re-reads one stored bar. If the provider's prices for
+that bar changed (auto-adjusted history after a split or dividend), the whole
+entry is refetched instead of merging adjusted bars onto unadjusted ones.
+Empty fetches are never cached, since yfinance returns an empty frame instead
+of raising when a download fails.
+"""
+import os
+import threading
+import time
+from urllib.parse import quote
+import numpy as np
+import pandas as pd
+
+# Anchored to the project root so every working directory shares the cache
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'market_data_cache')
+EXCHANGE_TIMEZONE = 'America/New_York'
+
+# Start date used for period="max"
+MAX_PERIOD_START = '1970-01-01'
+
+# Columns rebuilt on read instead of stored
+DATE_COLUMN = 'date'
+TICKER_COLUMN = 'ticker'
+
+# Stored columns and their dtypes. Every entry holds exactly these, whatever
+# extra columns (e.g. capital gains) a download had, and the actions default
+# to 0 when a download has none.
+CACHE_COLUMNS = {
+    'open': 'float64',
+    'high': 'float64',
+    'low': 'float64',
+    'close': 'float64',
+    'volume': 'int64',
+    'dividends': 'float64',
+    'stock splits': 'float64',
+}
+REQUIRED_COLUMNS = ['open', 'high', 'low', 'close']
+ACTION_COLUMNS = ['dividends', 'stock splits']
+
+# Relative price difference on an overlapping bar that counts as re-adjusted history
+ADJUSTMENT_TOLERANCE = 1e-6
+
+def exchange_today():
+    """Current date at the exchange, as datetime64[D]"""
+    return np.datetime64(pd.Timestamp.now(tz=EXCHANGE_TIMEZONE).date(), 'D')
+
+def resolve_period(period, today=None):
+    """
+    Convert a yfinance period into the start date it covers.
+
+    Args:
+        period (str): yfinance period, e.g. "5d", "1wk", "6mo", "5y", "ytd" or "max"
+        today (np.datetime64, optional): Current date (default: exchange_today())
+
+    Returns:
+        np.datetime64: First date of the period, as datetime64[D]
+    """
+    today = pd.Timestamp(today if today is not None else exchange_today())
+    if period == 'max':
+        return np.datetime64(MAX_PERIOD_START, 'D')
+    if period == 'ytd':
+        return np.datetime64(f"{today.year}-01-01", 'D')
+
+    for unit, offset in (('wk', 'weeks'), ('mo', 'months'), ('y', 'years'), ('d', 'days')):
+        if period.endswith(unit):
+            start = today - pd.DateOffset(**{offset: int(period[:-len(unit)])})
+            return np.datetime64(start.date(), 'D')
+    raise ValueError(f"Unsupported period: {period}")
+
+class DiskCache:
+    """
+    Disk cache of per-ticker bars in the download_data long format.
+
+    Thread-safe: each ticker has its own lock and files are replaced atomically.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, ttl=900):
+        """
+        Initialize the cache, the directory is created on the first write
+
+        Args:
+            cache_dir (str): Directory holding the .npz files (default: CACHE_DIR)
+            ttl (float): Seconds before bars that were not final when fetched are refetched (default: 900)
+        """
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Zero the hit and byte counters"""
+        self.requests = 0
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.bytes_fetched = 0
+
+    def get_path(self, ticker, interval='1d'):
+        """File path of a ticker's cache entry"""
+        return os.path.join(self.cache_dir, f"{quote(ticker, safe='')}_{interval}.npz")
+
+    def _get_lock(self, path):
+        with self._lock:
+            return self._locks.setdefault(path, threading.Lock())
+
+    def _load(self, path):
+        """
+        Read a cache entry.
+
+        Returns:
+            dict: columns (name to array), dates, covered_start, covered_end,
+                  stable_end and tail_fetched_at, or None if there is no readable entry
+        """
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                names = [str(name) for name in data['column_names']]
+                if names != list(CACHE_COLUMNS):
+                    # Written with another column layout, rebuilt on this request
+                    return None
+                return {
+                    'columns': {name: data[f"column_{i}"] for i, name in enumerate(names)},
+                    'dates': data['dates'],
+                    'covered_start': data['covered_start'][()],
+                    'covered_end': data['covered_end'][()],
+                    'stable_end': data['stable_end'][()],
+                    'tail_fetched_at': float(data['tail_fetched_at']),
+                }
+        except Exception as e:
+            print(f"Error reading cache file {path}, ignoring it: {e}")
+            return None
+
+    def _save(self, path, entry):
+        """Write a cache entry atomically"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        names = list(entry['columns'])
+        arrays = {f"column_{i}": entry['columns'][name] for i, name in enumerate(names)}
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            column_names=np.array(names, dtype=str),
+            dates=entry['dates'],
+            covered_start=np.array(entry['covered_start']),
+            covered_end=np.array(entry['covered_end']),
+            stable_end=np.array(entry['stable_end']),
+            tail_fetched_at=np.array(entry['tail_fetched_at']),
+            **arrays
+        )
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _to_entry_columns(df):
+        """
+        Split a fetched frame into a date array and the CACHE_COLUMNS arrays
+
+        Returns:
+            tuple: (dates, columns), or None if the frame is empty or misses a price column
+        """
+        if df is None or df.empty or any(name not in df.columns for name in REQUIRED_COLUMNS):
+            return None
+        dates = pd.to_datetime(df[DATE_COLUMN]).to_numpy().astype('datetime64[D]')
+        order = np.argsort(dates, kind='stable')
+        columns = {}
+        for name, dtype in CACHE_COLUMNS.items():
+            if name in df.columns:
+                series = pd.to_numeric(df[name], errors='coerce')
+            else:
+                series = pd.Series(0.0 if name in ACTION_COLUMNS else np.nan, index=df.index)
+            if dtype == 'int64':
+                series = series.fillna(0)
+            columns[name] = series.to_numpy(dtype=dtype)[order]
+        return dates[order], columns
+
+    @staticmethod
+    def _rows_nbytes(columns, n_rows):
+        """Bytes of n_rows rows of the given column arrays"""
+        return sum(array.dtype.itemsize for array in columns.values()) * n_rows
+
+    @staticmethod
+    def _get_fetch_ranges(entry, ranges):
+        """
+        Extend every missing range by one stored bar, to check the provider still agrees with it
+
+        A range after stored bars starts at the last stored bar before it, and a
+        range before stored bars ends after the first stored bar after it.
+        """
+        if entry is None or len(entry['dates']) == 0:
+            return list(ranges)
+        dates = entry['dates']
+        fetch_ranges = []
+        for start, end in ranges:
+            before = dates[dates < start]
+            after = dates[dates >= end]
+            if len(before):
+                start = before[-1]
+            elif len(after):
+                end = after[0] + 1
+            fetch_ranges.append((start, end))
+        return fetch_ranges
+
+    @staticmethod
+    def _agrees(entry, fetched_dates, fetched_columns, ranges):
+        """
+        Check the fetched bars against the stored ones on the dates outside the missing ranges
+
+        Only bars that were final when they were stored are compared.
+        """
+        overlap = np.isin(entry['dates'], fetched_dates) & (entry['dates'] < entry['stable_end'])
+        for start, end in ranges:
+            overlap &= ~((entry['dates'] >= start) & (entry['dates'] < end))
+        if not overlap.any():
+            return True
+
+        stored_index = np.flatnonzero(overlap)
+        fetched_index = np.searchsorted(fetched_dates, entry['dates'][stored_index])
+        for name in REQUIRED_COLUMNS:
+            stored = entry['columns'][name][stored_index]
+            fetched = fetched_columns[name][fetched_index]
+            if not np.allclose(stored, fetched, rtol=ADJUSTMENT_TOLERANCE, atol=0, equal_nan=True):
+                return False
+        return True
+
+    def _merge(self, entry, fetched, ranges, now, today):
+        """
+        Replace the fetched ranges of an entry with the fetched bars
+
+        Args:
+            entry (dict): Cache entry, None to build a new one
+            fetched (list): (dates, columns) of every fetched range
+            ranges (list): (start, end) of every fetched range
+        """
+        dates = entry['dates'] if entry else np.array([], dtype='datetime64[D]')
+        keep = np.ones(len(dates), dtype=bool)
+        for start, end in ranges:
+            keep &= ~((dates >= start) & (dates < end))
+
+        frames_dates = [dates[keep]]
+        frames_columns = [
+            {name: entry['columns'][name][keep] for name in CACHE_COLUMNS} if entry
+            else {name: np.array([], dtype=dtype) for name, dtype in CACHE_COLUMNS.items()}
+        ]
+        for new_dates, new_columns in fetched:
+            frames_dates.append(new_dates)
+            frames_columns.append(new_columns)
+
+        merged_dates = np.concatenate(frames_dates)
+        order = np.argsort(merged_dates, kind='stable')
+        merged_columns = {
+            name: np.concatenate([frame[name] for frame in frames_columns])[order]
+            for name in CACHE_COLUMNS
+        }
+
+        covered_start = min([start for start, _ in ranges] + ([entry['covered_start']] if entry else []))
+        covered_end = max([end for _, end in ranges] + ([entry['covered_end']] if entry else []))
+        tail_fetched = entry is None or any(end >= covered_end for _, end in ranges)
+        return {
+            'columns': merged_columns,
+            'dates': merged_dates[order],
+            'covered_start': covered_start,
+            'covered_end': covered_end,
+            # Bars before today were final when fetched, today's bar may still change
+            'stable_end': min(covered_end, today) if tail_fetched else entry['stable_end'],
+            'tail_fetched_at': now if tail_fetched else entry['tail_fetched_at'],
+        }
+
+    def get_missing_ranges(self, entry, start, end, now):
+        """
+        Get the date ranges a request needs from the provider.
+
+        Args:
+            entry (dict): Cache entry, None if there is none
+            start (np.datetime64): First requested date
+            end (np.datetime64): Requested end date, exclusive
+            now (float): Current time.time()
+
+        Returns:
+            list: (start, end) tuples of datetime64[D], end exclusive
+        """
+        if entry is None:
+            return [(start, end)]
+
+        ranges = []
+        if start < entry['covered_start']:
+            # Fetching up to the covered start also fills a gap before it
+            ranges.append((start, entry['covered_start']))
+
+        tail_start = entry['covered_end']
+        stale = now - entry['tail_fetched_at'] > self.ttl
+        if stale and end > entry['stable_end'] and entry['stable_end'] < entry['covered_end']:
+            tail_start = entry['stable_end']
+        if end > tail_start:
+            ranges.append((tail_start, max(end, entry['covered_end'])))
+        return ranges
+
+    def _fetch(self, ticker, fetch, entry, ranges):
+        """
+        Fetch the missing ranges and check them against the entry
+
+        Returns:
+            tuple: (entry to merge into, fetched ranges, (dates, columns) per range). The
+                   entry is None if the provider re-adjusted its history, then the whole
+                   covered range is fetched again. Ranges that came back empty are left out.
+        """
+        fetch_ranges = self._get_fetch_ranges(entry, ranges)
+        fetched = []
+        for range_start, range_end in fetch_ranges:
+            result = self._to_entry_columns(fetch(ticker, start=str(range_start), end=str(range_end)))
+            if result is None:
+                print(f"Empty download for {ticker} from {range_start} to {range_end}, not caching it")
+                continue
+            if entry is not None and not self._agrees(entry, *result, ranges):
+                print(f"Cached bars of {ticker} no longer match the provider (adjusted for a split "
+                      f"or dividend), refetching the whole entry")
+                full_range = (min(entry['covered_start'], *(start for start, _ in ranges)),
+                              max(entry['covered_end'], *(end for _, end in ranges)))
+                return self._fetch(ticker, fetch, None, [full_range])
+            fetched.append(((range_start, range_end), result))
+        return entry, [fetch_range for fetch_range, _ in fetched], [result for _, result in fetched]
+
+    def get(self, ticker, fetch, start=None, end=None, period='5y', interval='1d'):
+        """
+        Get a ticker's bars, fetching only what the cache does not hold.
+
+        Args:
+            ticker (str): Database ticker symbol
+            fetch (callable): Called as fetch(ticker, start='YYYY-MM-DD', end='YYYY-MM-DD')
+                              and returns the ticker's bars in the download_data format
+            start (str, optional): First date (YYYY-MM-DD)
+            end (str, optional): End date, exclusive (YYYY-MM-DD)
+            period (str): yfinance period used if start and end are not both given (default: "5y")
+            interval (str): Bar interval, part of the cache key (default: "1d")
+
+        Returns:
+            pd.DataFrame: Bars from start to end in the download_data format, with the
+                          CACHE_COLUMNS price and action columns
+        """
+        today = exchange_today()
+        if start and end:
+            start, end = np.datetime64(str(start)[:10], 'D'), np.datetime64(str(end)[:10], 'D')
+        else:
+            start, end = resolve_period(period, today), today + 1
+
+        path = self.get_path(ticker, interval)
+        with self._get_lock(path):
+            now = time.time()
+            entry = self._load(path)
+            cached = entry is not None
+            ranges = self.get_missing_ranges(entry, start, end, now)
+
+            fetch_ranges = []
+            if ranges:
+                entry, fetch_ranges, fetched = self._fetch(ticker, fetch, entry, ranges)
+                if fetched:
+                    entry = self._merge(entry, fetched, fetch_ranges, now, today)
+                    self._save(path, entry)
+
+        if entry is None:
+            # Nothing cached and the download came back empty
+            with self._lock:
+                self.requests += 1
+                self.misses += 1
+            return pd.DataFrame()
+
+        in_request = (entry['dates'] >= start) & (entry['dates'] < end)
+        from_provider = np.zeros(len(entry['dates']), dtype=bool)
+        for range_start, range_end in fetch_ranges:
+            from_provider |= (entry['dates'] >= range_start) & (entry['dates'] < range_end)
+
+        with self._lock:
+            self.requests += 1
+            if not ranges:
+                self.hits += 1
+            elif cached and self._was_partial(ranges, start, end):
+                self.partial_hits += 1
+            else:
+                self.misses += 1
+            self.bytes_saved += self._rows_nbytes(entry['columns'], int((in_request & ~from_provider).sum()))
+            self.bytes_fetched += self._rows_nbytes(entry['columns'], int(from_provider.sum()))
+
+        return self._to_dataframe(entry, in_request, ticker)
+
+    @staticmethod
+    def _was_partial(ranges, start, end):
+        """True if the fetched ranges did not cover the whole request"""
+        return not any(range_start <= start and range_end >= end for range_start, range_end in ranges)
+
+    @staticmethod
+    def _to_dataframe(entry, mask, ticker):
+        """Build the download_data frame of the masked rows"""
+        dates = pd.DatetimeIndex(entry['dates'][mask])
+        df = pd.DataFrame({DATE_COLUMN: dates.strftime('%Y-%m-%d')})
+        for name in CACHE_COLUMNS:
+            df[name] = entry['columns'][name][mask]
+        # Date parts as download_ticker derives them
+        df['year'] = dates.year
+        df['month'] = dates.month
+        df['week'] = pd.array(dates.isocalendar()['week'].to_numpy(), dtype='UInt32')
+        df[TICKER_COLUMN] = ticker
+        return df
+
+    def stats(self):
+        """
+        Get the cache counters.
+
+        Returns:
+            dict: requests, hits, partial_hits, misses, hit_rate, bytes_saved, bytes_fetched
+        """
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'hits': self.hits,
+                'partial_hits': self.partial_hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / self.requests if self.requests else 0.0,
+                'bytes_saved': self.bytes_saved,
+                'bytes_fetched': self.bytes_fetched,
+            }
+
+    def report(self):
+        """Print the hit rate and the bytes served from disk instead of the provider"""
+        stats = self.stats()
+        print(f"Market data cache: {stats['requests']} requests, {stats['hits']} hits, "
+              f"{stats['partial_hits']} partial, {stats['misses']} misses "
+              f"({stats['hit_rate']:.0%} hit rate), {stats['bytes_saved'] / 1e6:.2f} MB served from cache, "
+              f"{stats['bytes_fetched'] / 1e6:.2f} MB fetched")
+
+# Cache shared by callers that pass cache=True to download_data
+_default_cache = None
+
+def get_default_cache():
+    """Get the process-wide DiskCache in CACHE_DIR"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = DiskCache()
+    return _default_cache
@@ -0,0 +1,126 @@
+import random
+import threading
+import time
+
+class RateLimitError(Exception):
+    """Raised by a data provider when it rejects a request for exceeding its rate limit"""
+
+class TokenBucket:
+    """
+    Thread-safe token-bucket rate limiter.
+
+    Tokens are added continuously at `rate` per second up to `capacity`. Every
+    request takes one token and waits when none are left, so bursts of up to
+    `capacity` requests go through at once and the long-run rate stays at `rate`.
+    """
+
+    def __init__(self, rate, capacity=None):
+        """
+        Initialize a full bucket
+
+        Args:
+            rate (float): Requests per second
+            capacity (int, optional): Maximum burst size (default: max(1, rate))
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        """Add the tokens accrued since the last update, caller holds the lock"""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens=1):
+        """
+        Take tokens, blocking until they are available
+
+        Args:
+            tokens (int): Number of tokens to take (default: 1)
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+    def try_acquire(self, tokens=1):
+        """
+        Take tokens only if they are available right now
+
+        Args:
+            tokens (int): Number of tokens to take (default: 1)
+
+        Returns:
+            bool: True if the tokens were taken
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def drain(self):
+        """Empty the bucket, e.g. after the provider reported a rate-limit error"""
+        with self._lock:
+            self._refill()
+            self._tokens = 0.0
+
+def call_with_retry(func, *args, limiter=None, retries=4, backoff=1.0, max_backoff=30.0,
+                    retry_on=(Exception,), on_retry=None, **kwargs):
+    """
+    Call a function under a rate limiter, retrying failures with exponential backoff.
+
+    Every attempt takes a token from the limiter. A RateLimitError also drains
+    the limiter, so the other threads sharing it back off as well.
+
+    Args:
+        func (callable): Function to call
+        *args: Positional arguments for func
+        limiter (TokenBucket, optional): Limiter shared by all callers of the provider
+        retries (int): Number of retries after the first attempt (default: 4)
+        backoff (float): Delay before the first retry in seconds, doubled on every retry (default: 1.0)
+        max_backoff (float): Upper bound of the delay in seconds (default: 30.0)
+        retry_on (tuple): Exception types that are retried (default: all)
+        on_retry (callable, optional): Called as on_retry(attempt, exception) before every retry
+        **kwargs: Keyword arguments for func
+
+    Returns:
+        The return value of func
+
+    Raises:
+        The last exception if every attempt failed
+    """
+    for attempt in range(retries + 1):
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            return func(*args, **kwargs)
+        except retry_on as e:
+            if attempt == retries:
+                raise
+            if isinstance(e, RateLimitError) and limiter is not None:
+                limiter.drain()
+            if on_retry is not None:
+                on_retry(attempt, e)
+            # Equal jitter: threads that failed together spread their retries over the
+            # upper half of the backoff, and still wait at least half of it
+            delay = min(max_backoff, backoff * 2 ** attempt)
+            delay = random.uniform(delay / 2, delay)
+            name = getattr(func, '__name__', type(func).__name__)
+            print(f"Attempt {attempt + 1} of {name} failed ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
@@ -1,33 +1,141 @@
 import yfinance as yf
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
-import pandas_market_calendars as mcal
+from utils.trading_calendar import next_session
+from api.rate_limit import RateLimitError
+from api.cache import get_default_cache
+
+try:
+    from yfinance.exceptions import YFRateLimitError
+except ImportError:  # Older yfinance versions have no dedicated rate-limit error
+    YFRateLimitError = RateLimitError
 
 def get_next_business_day(date_str):
     """Get the next business day after a given date"""
-    # Create NYSE calendar
-    nyse = mcal.get_calendar('NYSE')
+    return next_session(date_str).strftime('%Y-%m-%d')
+
+def to_yf_symbol(ticker):
+    """Map a database ticker to its Yahoo symbol (VIX is ^VIX)"""
+    return '^VIX' if ticker == 'VIX' else ticker
+
+def from_yf_symbol(symbol):
+    """Map a Yahoo symbol back to its database ticker (^VIX is VIX)"""
+    return 'VIX' if symbol == '^VIX' else symbol
+
+def reshape_download(data, tickers):
+    """
+    Reshape a wide yf.download(group_by='ticker') result into the long download_data format.
     
-    # Convert string to datetime
-    if isinstance(date_str, str):
-        date = pd.Timestamp(date_str)
-    else:
-        date = date_str
+    The (date x ticker/field) values are reshaped in one numpy operation, and the
+    date parts are computed once per date instead of once per ticker.
+    
+    Args:
+        data (DataFrame): yf.download result, columns (Yahoo symbol, field) and a date index
+        tickers (list): Database tickers that were requested, in output order
         
-    # Get the next business day
-    next_day = date + timedelta(days=1)
-    
-    # Check if it's a business day, if not get the next one
-    calendar = nyse.schedule(start_date=next_day, end_date=next_day + timedelta(days=5))
-    if calendar.empty:
-        # If no trading days in the next 5 days (unlikely), just use next day
-        return next_day.strftime('%Y-%m-%d')
-    else:
-        # Return the first trading day
-        return calendar.index[0].strftime('%Y-%m-%d')
+    Returns:
+        DataFrame: One row per ticker and date with date, the lower-cased price fields,
+                   year, month, week and ticker columns. Dates without a close are dropped.
+    """
+    if data is None or data.empty:
+        return pd.DataFrame()
+    
+    symbols = [to_yf_symbol(ticker) for ticker in tickers]
+    if not isinstance(data.columns, pd.MultiIndex):
+        # Older yfinance versions return flat columns for a single ticker
+        data = pd.concat({symbols[0]: data}, axis=1)
+    
+    fields = list(dict.fromkeys(data.columns.get_level_values(1)))
+    data = data.reindex(columns=pd.MultiIndex.from_product([symbols, fields]))
+    
+    n_dates, n_tickers, n_fields = len(data.index), len(symbols), len(fields)
+    values = data.to_numpy(dtype='float64').reshape(n_dates, n_tickers, n_fields)
+    values = values.transpose(1, 0, 2).reshape(n_tickers * n_dates, n_fields)
+    
+    df = pd.DataFrame(values, columns=[field.lower() for field in fields])
+    dates = pd.DatetimeIndex(pd.to_datetime(data.index))
+    date_strings = dates.strftime('%Y-%m-%d').to_numpy()
+    df.insert(0, 'date', np.tile(date_strings, n_tickers))
+    df['year'] = np.tile(dates.year.to_numpy(), n_tickers)
+    df['month'] = np.tile(dates.month.to_numpy(), n_tickers)
+    df['week'] = pd.array(np.tile(dates.isocalendar()['week'].to_numpy(), n_tickers), dtype='UInt32')
+    df['ticker'] = np.repeat(np.array([from_yf_symbol(symbol) for symbol in symbols], dtype=object), n_dates)
+    
+    df = df[df['close'].notna()].reset_index(drop=True)
+    if 'volume' in df.columns:
+        df['volume'] = df['volume'].fillna(0).astype('int64')
+    return df
+
+def download_batch(tickers, period="5y", start=None, end=None):
+    """
+    Download a group of tickers in one yf.download call.
+    
+    Args:
+        tickers (list): Database ticker symbols
+        period (str, optional): Time period, used if start and end are not specified
+        start (str, optional): Start date (YYYY-MM-DD)
+        end (str, optional): End date, exclusive (YYYY-MM-DD)
+        
+    Returns:
+        DataFrame: Long format, as returned by reshape_download
+    """
+    symbols = [to_yf_symbol(ticker) for ticker in tickers]
+    date_range = {'start': start, 'end': end} if start and end else {'period': period}
+    try:
+        # Same adjusted prices and actions columns as Ticker.history()
+        data = yf.download(symbols, group_by='ticker', auto_adjust=True, actions=True,
+                           threads=False, progress=False, **date_range)
+    except YFRateLimitError as e:
+        raise RateLimitError(str(e)) from e
+    return reshape_download(data, tickers)
+
+def download_ticker(ticker, period="5y", start=None, end=None):
+    """
+    Download one ticker with Ticker.history().
+    
+    Args:
+        ticker (str): Database ticker symbol
+        period (str, optional): Time period, used if start and end are not specified
+        start (str, optional): Start date (YYYY-MM-DD)
+        end (str, optional): End date, exclusive (YYYY-MM-DD)
+        
+    Returns:
+        DataFrame: Long format with date, the lower-cased price fields, year, month, week and ticker
+    """
+    ticker_obj = yf.Ticker(to_yf_symbol(ticker))
+    
+    # Download historical data
+    try:
+        if start and end:
+            df = ticker_obj.history(start=start, end=end)
+        else:
+            df = ticker_obj.history(period=period)
+    except YFRateLimitError as e:
+        # Surface as the provider-neutral error the rate limiter backs off on
+        raise RateLimitError(str(e)) from e
+    
+    # Reset index to make Date a column
+    df = df.reset_index()
+
+    # Convert all column names to lowercase
+    df.columns = df.columns.str.lower()
+    
+    # Standardize date handling
+    # Convert to datetime object first
+    df['date'] = pd.to_datetime(df['date'])
+    # Extract date components before converting to string
+    df['year'] = df['date'].dt.year
+    df['month'] = df['date'].dt.month
+    df['week'] = df['date'].dt.isocalendar().week
+    # Convert to string format after extracting components
+    df['date'] = df['date'].dt.strftime('%Y-%m-%d')
+    df['ticker'] = ticker
+    
+    print(f"Downloaded {len(df)} rows of data for {ticker}")
+    return df
 
-def download_data(tickers: list[str], period="5y", start=None, end=None, specific_date=None):
+def download_data(tickers: list[str], period="5y", start=None, end=None, specific_date=None, batch_size=None,
+                  cache=None):
     """
     Downloads historical data for the specified tickers using yfinance.
     
@@ -44,6 +152,11 @@ def download_data(tickers: list[str], period="5y", start=None, end=None, specifi
                                        If not specified and start is specified, defaults to today.
         specific_date (str or datetime, optional): If provided, only returns data for this specific date.
                                                 Format: 'YYYY-MM-DD' or datetime object.
+        batch_size (int, optional): Download groups of this many tickers per yf.download call
+                                  instead of one Ticker.history() call per ticker.
+        cache (DiskCache or bool, optional): Serve each ticker from this on-disk cache and only
+                                           download what it is missing. True uses the shared
+                                           cache in data/. Ignores batch_size.
     
     Returns:
         DataFrame: Combined DataFrame containing data for all tickers with a 'ticker' column.
@@ -59,47 +172,26 @@ def download_data(tickers: list[str], period="5y", start=None, end=None, specifi
         # Set start to specific_date and end to next business day
         start = specific_date
         end = get_next_business_day(specific_date)
+    
+    if batch_size and not cache:
+        frames = []
+        for i in range(0, len(tickers), batch_size):
+            batch = tickers[i:i + batch_size]
+            df = download_batch(batch, period=period, start=start, end=end)
+            print(f"Downloaded {len(df)} rows of data for {len(batch)} tickers")
+            frames.append(df)
+        frames = [df for df in frames if not df.empty]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
             
-    for ticker in tickers:
-        # Create Ticker object
-        if ticker == 'VIX':
-            ticker = '^VIX'
-        ticker_obj = yf.Ticker(ticker)
-        
-        # Download historical data
-        if start and end:
-            df = ticker_obj.history(start=start, end=end)
-        else:
-            df = ticker_obj.history(period=period)
-        
-        # Reset index to make Date a column
-        df = df.reset_index()
-
-        # Convert all column names to lowercase
-        df.columns = df.columns.str.lower()
-        
-        # Standardize date handling
-        # Convert to datetime object first
-        df['date'] = pd.to_datetime(df['date'])
-        # Extract date components before converting to string
-        df['year'] = df['date'].dt.year
-        df['month'] = df['date'].dt.month
-        df['week'] = df['date'].dt.isocalendar().week
-        # Convert to string format after extracting components
-        df['date'] = df['date'].dt.strftime('%Y-%m-%d')
-        # Convert ^VIX back to VIX
-        if ticker == '^VIX':
-            df['ticker'] = 'VIX'
-        else:
-            df['ticker'] = ticker
-                
-        # Store in dictionary
-        if ticker == '^VIX':
-            data['VIX'] = df
-        else:
+    if cache:
+        cache = get_default_cache() if cache is True else cache
+        for ticker in tickers:
+            df = cache.get(ticker, download_ticker, start=start, end=end, period=period)
+            print(f"Loaded {len(df)} rows of data for {ticker}")
             data[ticker] = df
-        
-        print(f"Downloaded {len(df)} rows of data for {ticker}")
+    else:
+        for ticker in tickers:
+            data[ticker] = download_ticker(ticker, period=period, start=start, end=end)
     
     # Combine all dataframes into a single DataFrame
     if data:
@@ -23,6 +23,20 @@ def get_backtest_files_for_display():
     
     return files
 
+def get_module_path(file_path):
+    """Convert a strategy file path to its module path.
+    
+    e.g. backtests/backtests/dt-tshaped.py -> backtests.backtests.dt_tshaped
+    
+    Args:
+        file_path (str): Path to the Python file containing the Strategy class
+        
+    Returns:
+        str: Dotted module path
+    """
+    rel_path = os.path.relpath(file_path)
+    return os.path.splitext(rel_path)[0].replace('/', '.').replace('-', '_')
+
 def process_data(trades_file):
     """
     Process the trades file through both processing steps.
@@ -98,9 +112,8 @@ def run_backtest(file_path=None, backtest=False):
             raise ValueError("file_path is required when backtest=True")
             
         try:
-            # Convert file path to module path (e.g. backtests/backtests/dt-tshaped.py -> backtests.backtests.dt_tshaped)
-            rel_path = os.path.relpath(file_path)
-            module_path = os.path.splitext(rel_path)[0].replace('/', '.').replace('-', '_')
+            # Convert file path to module path
+            module_path = get_module_path(file_path)
             
             # Run the strategy file as a module
             result = subprocess.run([sys.executable, '-m', module_path], check=True)
@@ -132,12 +145,13 @@ def run_backtest(file_path=None, backtest=False):
         print(f"Error processing results: {str(e)}")
         return None, None, None
 
-def generate_reports(trades_df):
+def generate_reports(trades_df, benchmark=True):
     """
     Generate reports for different time periods.
     
     Args:
         trades_df (pd.DataFrame): DataFrame containing processed trades
+        benchmark (bool): Download SPY and QQQ for the comparison columns (default: True)
         
     Returns:
         dict: Dictionary containing reports for week, month, and year periods
@@ -146,7 +160,7 @@ def generate_reports(trades_df):
         settings_df = get_backtest_info()
         reports = {}
         for period in ['week', 'month', 'year']:
-            reports[period] = run_report(trades_df, period, settings_df)
+            reports[period] = run_report(trades_df, period, settings_df, benchmark=benchmark)
         return reports
     except Exception as e:
         print(f"Error generating reports: {str(e)}")
@@ -3,13 +3,13 @@ from datetime import datetime, timedelta
 import os
 import sys
 from backtests.utils.backtest_functions import BaseStrategy
-from lumibot.components.vix_helper import VixHelper
 from lumibot.entities import Asset
 from utils.db_utils import DatabaseManager
-from indicators.adv import calculate_indicator as calc_adv
-from indicators.adr import calculate_indicator as calc_adr
-from indicators.sma import calculate_indicator as calc_sma
-import pandas_market_calendars as mcal
+from backtests.utils.universe import build_universe, load_universe_mask
+from backtests.utils.regime import RegimeSeries
+from backtests.utils.vector_backtest import (
+    load_bar_panel, get_regime_gates, run_vector_backtest, size_entries, write_backtest_logs
+)
 
 db = DatabaseManager()
 
@@ -20,6 +20,9 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 backtesting_start = datetime.strptime(os.getenv("BACKTESTING_START"), "%Y-%m-%d")
 backtesting_end = datetime.strptime(os.getenv("BACKTESTING_END"), "%Y-%m-%d")
 
+# Indicators used by the volume and ADR screens
+SCREEN_INDICATORS = {'adv': [30], 'adr': [20]}
+
 class Strategy(BaseStrategy):    
     # Define strategy parameters that can be adjusted by the user
     parameters = {
@@ -41,120 +44,129 @@ class Strategy(BaseStrategy):
     def initialize(self):
         # Set bot to run every day (can be adjusted) 
         self.sleeptime = "1D"
-        # Initialize the VixHelper to work with VIX-related checks
-        self.vix_helper = VixHelper(self)
-        # Get the symbols and update parameters
-        self.parameters["symbols"] = self.get_stocks_df()
+        # Point-in-time universe for the thresholds, built once and reused across runs
+        self.universe_hash = self.build_screen_universe()
+        # Get the symbols and update parameters, unless the data source already screened them
+        if not self.parameters.get("symbols"):
+            self.parameters["symbols"] = db.get_universe_tickers(self.universe_hash)
         self.margin = self.parameters.get("margin")
         self.side = self.parameters.get("side")
         self.risk_per_trade = self.parameters.get("risk_per_trade")
-
-        self.length = (backtesting_end - backtesting_start).days
         
-        # Load benchmark data once and store it
-        print("Loading benchmark data once for the entire backtest...")
-        self.benchmark_df = self.get_benchmark()
-        # Convert the datetime column to a standard string format for easier matching
-        self.benchmark_df['datetime_str'] = pd.to_datetime(self.benchmark_df['datetime']).dt.strftime('%Y-%m-%d')
-        print(f"Loaded benchmark data with {len(self.benchmark_df)} rows")
-        
-        # Initialize NYSE calendar
-        self.nyse = mcal.get_calendar('NYSE')
-
-    def get_previous_business_day(self, date):
-        """Get the previous business day based on NYSE calendar"""
-        # Convert date to pandas Timestamp and handle timezone
-        if not isinstance(date, pd.Timestamp):
-            date = pd.Timestamp(date)
-        
-        # Make date timezone-naive if it has timezone info
-        if date.tzinfo is not None:
-            # Convert to timezone-naive by removing the timezone
-            date = pd.Timestamp(date.year, date.month, date.day, 
-                              date.hour, date.minute, date.second)
-        
-        # Get trading days before the current date
-        schedule = self.nyse.schedule(start_date=date - pd.Timedelta(days=10), end_date=date)
-        trading_days = schedule.index
-        
-        # If the current date is a trading day, get the previous one
-        if date in trading_days:
-            idx = trading_days.get_loc(date)
-            if idx > 0:
-                return trading_days[idx - 1].date()
-        
-        # If the current date is not a trading day, get the most recent one
-        previous_days = trading_days[trading_days < date]
-        if len(previous_days) > 0:
-            return previous_days[-1].date()
-        
-        # Fallback: just return the previous calendar day
-        return (date - pd.Timedelta(days=1)).date()
-
-    def get_stocks_df(self):
-        """Returns a list of stock symbols that meet the volume, ADR and price thresholds."""
-        # Get stock data from database
-        stocks_df = db.get_ohlcv_data("stocks")
-        min_vol = self.parameters.get("volume_threshold")
-        min_adr = self.parameters.get("adr_threshold")
-        min_price = self.parameters.get("price_threshold")
-
-        stocks_df_with_adv = calc_adv(stocks_df, 30) # calculates the average daily volume 30 days
-        
-        # Get tickers with sufficient volume
-        liquid_tickers = stocks_df_with_adv[stocks_df_with_adv["adv"] >= min_vol]["ticker"].unique()
-        
-        # Keep only data for liquid tickers
-        liquid_stocks = stocks_df[stocks_df["ticker"].isin(liquid_tickers)]
-        
-        # Calculate ADR for the filtered tickers
-        liquid_stocks_with_adr = calc_adr(liquid_stocks, 20) # calculates the average daily range 20 days
-        
-        # Get tickers with sufficient ADR
-        moving_tickers = liquid_stocks_with_adr[liquid_stocks_with_adr["adr"] >= min_adr]["ticker"].unique()
-        
-        # Keep only data for moving tickers
-        moving_stocks = stocks_df[stocks_df["ticker"].isin(moving_tickers)]
-        
-        # Filter by price, only keeping tickers that meet price threshold
-        priced_tickers = moving_stocks[moving_stocks["close"] >= min_price]["ticker"].unique()
-        
-        # Keep all rows but only for tickers that meet all conditions
-        filtered_stocks_df = stocks_df[stocks_df["ticker"].isin(priced_tickers)]
-
-        symbols = filtered_stocks_df["ticker"].unique().tolist()
+        # Load the benchmark SMA50 and VIX regime once, indexed by trading date
+        print("Loading benchmark regime once for the entire backtest...")
+        self.load_regime(sma_period=50)
+
+    @classmethod
+    def get_backtest_symbols(cls):
+        """Screen the universe before the backtest so local data can be loaded for it."""
+        return cls.get_stocks_df()
+
+    @classmethod
+    def prepare_shared_data(cls):
+        """Build the universe, and materialize its indicators, in the parent process of a sweep or walk-forward."""
+        return {"universe_hash": cls.build_screen_universe()}
+
+    @classmethod
+    def build_screen_universe(cls):
+        """
+        Build or reuse the daily universe for the strategy thresholds.
+        
+        The universe starts a few days before the backtest so the first
+        iteration can read the previous session. A universe_hash parameter,
+        set by prepare_shared_data, is used as is.
+        
+        Returns:
+            str: Parameter hash of the universe
+        """
+        if cls.parameters.get("universe_hash"):
+            return cls.parameters["universe_hash"]
+
+        start_date = pd.Timestamp(cls.parameters.get("backtesting_start")) - pd.Timedelta(days=10)
+        return build_universe(
+            min_volume=cls.parameters.get("volume_threshold"),
+            min_adr=cls.parameters.get("adr_threshold"),
+            min_price=cls.parameters.get("price_threshold"),
+            adv_period=SCREEN_INDICATORS['adv'][0],
+            adr_period=SCREEN_INDICATORS['adr'][0],
+            start_date=start_date.strftime("%Y-%m-%d"),
+            end_date=cls.parameters.get("backtesting_end"),
+        )
+
+    @classmethod
+    def get_stocks_df(cls):
+        """Returns the stock symbols that pass the volume, ADR and price thresholds on at least one backtest day."""
+        symbols = db.get_universe_tickers(cls.build_screen_universe())
 
         print(f"Number of symbols: {len(symbols)}")
         return symbols
 
-    def get_benchmark(self):
-        """Fetch benchmark from the indexes table in the database."""
-        # Get stock data from database
-        benchmark = self.parameters.get("benchmark")
-        print(f"Fetching benchmark data for {benchmark}...")
-        
-        # Get the data
-        indexes_df = db.get_ohlcv_data("indexes", benchmark)
-        print(f"Retrieved {len(indexes_df)} rows of benchmark data")
-
-        # Calculate SMA and above_sma indicators
-        indexes_df_with_sma = calc_sma(indexes_df, 50) # calculates the simple moving average 50 days
-        indexes_df_with_sma["above_sma"] = indexes_df_with_sma["close"] > indexes_df_with_sma["sma"]
+    @classmethod
+    def run_vector_strategy(cls):
+        """
+        Run the strategy on the vectorized engine.
+        
+        Same rules as on_trading_iteration: flatten when the VIX or the benchmark
+        SMA gate is off, otherwise buy every qualified ticker that is not held
+        with position_pct of the cash.
+        
+        Returns:
+            pd.DataFrame: Trade log, also written to the logs directory
+        """
+        parameters = cls.parameters
+        universe_hash = cls.build_screen_universe()
+        symbols = parameters.get("symbols") or db.get_universe_tickers(universe_hash)
+        
+        panel = load_bar_panel(symbols, parameters.get("backtesting_start"), parameters.get("backtesting_end"))
+        entry_mask = load_universe_mask(universe_hash, panel.dates, panel.tickers)
+        regime = RegimeSeries.load(parameters.get("benchmark"), sma_period=50, end_date=parameters.get("backtesting_end"))
+        gates = get_regime_gates(regime, panel.dates, parameters.get("vix_threshold"))
+        
+        trade_log = run_vector_backtest(panel, entry_mask, gates, parameters, name=cls.__name__)
+        write_backtest_logs(trade_log, cls.__name__, {**parameters, "symbols": list(symbols)})
+        return trade_log
+
+    def get_qualified_tickers(self, current_time):
+        """
+        Get the tickers passing the volume, ADR and price thresholds on the last bar before current_time.
+        
+        Returns:
+            list: (symbol, close) tuples for the qualified tickers
+        """
+        current_date = pd.Timestamp(current_time).strftime("%Y-%m-%d")
+        
+        # Last completed bar, i.e. the previous trading day
+        eligible_df = db.get_universe_day(self.universe_hash, current_date)
+        if eligible_df.empty:
+            print(f"No universe data before {current_date}")
+            return []
+        
+        symbols = set(self.parameters["symbols"])
+        return [
+            (symbol, close) for symbol, close in zip(eligible_df['ticker'], eligible_df['close'])
+            if symbol in symbols
+        ]
 
-        return indexes_df_with_sma
-            
     def on_trading_iteration(self):
         # get params for iteration
         current_time = self.get_datetime()
         print(current_time)
-        # Get previous business day instead of simply subtracting one day
         
         open_positions = self.get_positions()
 
+        # Regime of the previous session, the last completed bar
+        regime = self.get_regime(current_time)
+        if regime is None:
+            print(f"No benchmark data found for the session before {current_time.date()}")
+            return
+
         # filter interactions if vix is high
-        vix_value = self.vix_helper.get_vix_1d_value(current_dt = current_time)
+        vix_value = regime.vix
         print(f"VIX Price: {vix_value}")
-        if vix_value >= 20:
+        if pd.isna(vix_value):
+            print(f"No VIX data found for date {regime.date}")
+            return
+        if vix_value >= self.parameters.get("vix_threshold"):
             print(f"VIX condition not met: VIX = {vix_value} (>= {self.parameters.get('vix_threshold')})")
             if len(open_positions) > 0:
                 self.sell_all()
@@ -163,39 +175,16 @@ class Strategy(BaseStrategy):
             print(f"VIX condition met: VIX = {vix_value} (< {self.parameters.get('vix_threshold')})")
 
         # filter interactions if benchmark is below sma
-        # Convert previous business day to string format for matching
-        previous_day = self.get_previous_business_day(current_time)
-        previous_day_str = previous_day.strftime('%Y-%m-%d')
-        
-        # Use the pre-loaded benchmark data with string comparison
-        matching_rows = self.benchmark_df[self.benchmark_df['datetime_str'] == previous_day_str]
-        
-        if len(matching_rows) == 0:
-            print(f"No benchmark data found for date {previous_day_str}")
-            return
-            
-        # Get the exact matching row
-        row = matching_rows.iloc[0]
-        above_sma = row["above_sma"]
-        sma_50 = row["sma"]
-        close_50 = row["close"]
-
-        if above_sma is None:
+        if pd.isna(regime.sma):
             print("Benchmark SMA is None, skipping.")
             return
-        if not above_sma:
-            print(f"Benchmark is below SMA, benchmark close is {close_50} and sma is {sma_50}, skipping, and closing all positions")
+        if not regime.above_sma:
+            print(f"Benchmark is below SMA, benchmark close is {regime.close} and sma is {regime.sma}, skipping, and closing all positions")
             if len(open_positions) > 0:
                 self.sell_all()
             return
         else:
-            print(f"Benchmark is above SMA, benchmark close is {close_50} and sma is {sma_50}, continuing")
-
-        # Get parameters for filtering
-        min_vol = self.parameters.get("volume_threshold")
-        min_adr = self.parameters.get("adr_threshold")
-        min_price = self.parameters.get("price_threshold")
-        symbols = self.parameters.get("symbols")
+            print(f"Benchmark is above SMA, benchmark close is {regime.close} and sma is {regime.sma}, continuing")
 
         # Get cash and allocation per ticker for entry positions
         cash = self.cash
@@ -203,63 +192,25 @@ class Strategy(BaseStrategy):
         allocation_per_ticker = cash * self.parameters.get("position_pct")
         print(f"Allocation per ticker: ${allocation_per_ticker}")
         
-        # Track qualified tickers for trading
-        qualified_tickers = []
-
-        # Process each ticker in our universe
-        for symbol in symbols:
-            print(f"Analyzing {symbol}")
-            print(f"Current date: {current_time}")
-            
-            # Skip if we already have a position in this ticker
-            if any(position.symbol == symbol for position in open_positions):
-                print(f"Already have position in {symbol}, skipping")
-                continue
-            
-            # Get data for this ticker up to current time
-            bars = self.get_historical_prices(symbol, length=self.length, timestep="1 day", include_after_hours=False)
-            if bars is None or bars.df.empty:
-                print(f"No data found for {symbol}, skipping")
-                continue
-            
-            ticker_df = bars.df
-            
-            if len(ticker_df) < 30:
-                print(f"Not enough data for {symbol}, need at least 30 days")
-                continue
-                
-            volume_data = calc_adv(ticker_df, 30)
-            latest_volume = volume_data.iloc[-1]
-            
-            # Check volume threshold
-            if 'adv' not in latest_volume or latest_volume['adv'] < min_vol:
-                print(f"{symbol} failed volume test: {latest_volume.get('adv', 0)} < {min_vol}")
-                continue
-                
-            # Calculate ADR (Average Daily Range)
-            adr_data = calc_adr(ticker_df, 20)
-            latest_adr = adr_data.iloc[-1]
-            
-            # Check ADR threshold
-            if 'adr' not in latest_adr or latest_adr['adr'] < min_adr:
-                print(f"{symbol} failed ADR test: {latest_adr.get('adr', 0)} < {min_adr}")
-                continue
-                
-            # Check price threshold
-            latest_price = ticker_df.iloc[-1]['close']
-            if latest_price < min_price:
-                print(f"{symbol} failed price test: {latest_price} < {min_price}")
-                continue
-                
-            print(f"{symbol} passed all tests: ADV={latest_volume.get('adv', 0)}, ADR={latest_adr.get('adr', 0)}, Price={latest_price}")
-            qualified_tickers.append((symbol, latest_price))
+        # Screen the whole universe at once on the precomputed indicators
+        held_symbols = {position.symbol for position in open_positions}
+        qualified_tickers = [
+            (symbol, price) for symbol, price in self.get_qualified_tickers(current_time)
+            if symbol not in held_symbols
+        ]
             
         # Log the qualified tickers
         print(f"Qualified tickers: {[t[0] for t in qualified_tickers]}")
         
+        # Size the orders like the vector engine: position_pct of the cash each,
+        # within the cash at the previous close unless trading on margin
+        quantities = size_entries(cash, [price for _, price in qualified_tickers],
+                                  self.parameters.get("position_pct"),
+                                  margin=self.margin or self.side != "buy")
+        
         # Place buy orders for qualified tickers
-        for symbol, price in qualified_tickers:
-            shares = int(allocation_per_ticker / price)
+        for (symbol, price), shares in zip(qualified_tickers, quantities):
+            shares = int(shares)
             if shares <= 0:
                 print(f"Not enough allocation to buy {symbol} at ${price}")
                 continue
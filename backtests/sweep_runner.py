@@ -0,0 +1,359 @@
+import os
+import json
+import hashlib
+import itertools
+import importlib
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+from backtests.backtest_runner import (
+    get_module_path,
+    get_latest_trades_files,
+    process_data,
+    generate_reports
+)
+from backtests.utils.backtest_data_to_db import get_backtest_info
+from backtests.utils.result_writer import ResultWriter
+
+RESULT_FILE = "result.json"
+LEADERBOARD_METRICS = ['nr_trades', 'accuracy', 'avg_return_per_trade', 'total_return']
+# Data sources that run from the local database, whose reports skip the benchmark download
+OFFLINE_DATA_SOURCES = ("local", "vector")
+
+def expand_grid(grid):
+    """
+    Expand a parameter grid into the list of all its combinations.
+
+    Args:
+        grid (dict): Mapping of parameter name to a list of values,
+                     e.g. {"adr_threshold": [3.0, 4.0], "vix_threshold": [20, 25]}
+
+    Returns:
+        list: List of dictionaries, one per combination
+    """
+    keys = sorted(grid.keys())
+    values = [grid[key] if isinstance(grid[key], list) else [grid[key]] for key in keys]
+    return [dict(zip(keys, combination)) for combination in itertools.product(*values)]
+
+def get_run_id(parameters):
+    """
+    Build a deterministic run ID for a set of parameter overrides.
+
+    The same overrides always map to the same ID, which is what allows an
+    interrupted sweep to be resumed.
+
+    Args:
+        parameters (dict): Parameter overrides for the run
+
+    Returns:
+        str: Short hexadecimal run ID
+    """
+    payload = json.dumps(parameters, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()[:10]
+
+def load_result(run_dir):
+    """
+    Load the result file of a previous run.
+
+    Args:
+        run_dir (Path): Output directory of the run
+
+    Returns:
+        dict: The stored result, or None if the file is missing or unreadable
+    """
+    result_file = Path(run_dir) / RESULT_FILE
+    if not result_file.exists():
+        return None
+
+    try:
+        with open(result_file, 'r') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Error reading {result_file}: {e}")
+        return None
+
+def summarize_reports(reports):
+    """
+    Extract the headline metrics from the 'Total' row of the yearly report.
+
+    Args:
+        reports (dict): Reports as returned by generate_reports
+
+    Returns:
+        dict: Metric name to value
+    """
+    report = reports['year']
+    total_row = report[report['period'] == 'Total']
+    if total_row.empty:
+        return {metric: None for metric in LEADERBOARD_METRICS}
+
+    total_row = total_row.iloc[0]
+    return {
+        metric: (None if pd.isna(total_row[metric]) else float(total_row[metric]))
+        for metric in LEADERBOARD_METRICS
+    }
+
+def get_run_class(strategy_class, parameters):
+    """Subclass of the strategy with the overrides applied, with the same name so the log file naming is unchanged"""
+    return type(strategy_class.__name__, (strategy_class,), {
+        'parameters': {**strategy_class.parameters, **parameters}
+    })
+
+def prepare_shared_data(module_path, parameter_sets):
+    """
+    Run the strategy's prepare_shared_data once per parameter set, in the parent process.
+
+    A universe is then built, and its indicators materialized, once before the
+    pool starts rather than in every worker's initialize. A set whose preparation
+    fails gets no shared parameters, so its worker prepares and reports it itself.
+
+    Args:
+        module_path (str): Dotted module path of the strategy file
+        parameter_sets (list): Overrides of each run
+
+    Returns:
+        list: Shared parameters of each run, in the order of parameter_sets
+    """
+    strategy_class = importlib.import_module(module_path).Strategy
+    if not callable(getattr(strategy_class, 'prepare_shared_data', None)):
+        return [{} for _ in parameter_sets]
+
+    shared = []
+    for parameters in parameter_sets:
+        try:
+            shared.append(get_run_class(strategy_class, parameters).prepare_shared_data())
+        except Exception as e:
+            print(f"Error preparing shared data for {parameters}: {e}")
+            shared.append({})
+    return shared
+
+def run_parameter_set(module_path, parameters, run_dir, shared_parameters=None):
+    """
+    Run one strategy configuration and process its results.
+
+    Intended to be executed inside a worker process. The worker switches into
+    the run's own directory so that lumibot's logs, the custom trades file and
+    the settings file of concurrent runs never collide. Runs on an offline data
+    source report without the SPY/QQQ comparison, so they need no network.
+
+    Args:
+        module_path (str): Dotted module path of the strategy file
+        parameters (dict): Overrides applied on top of Strategy.parameters
+        run_dir (str): Output directory for this run
+        shared_parameters (dict, optional): Parameters from prepare_shared_data, applied
+                                            to the run but not recorded in its result
+
+    Returns:
+        dict: Result with run_id, parameters, status and metrics
+    """
+    run_dir = Path(run_dir).resolve()
+    run_dir.mkdir(parents=True, exist_ok=True)
+    project_dir = os.getcwd()
+
+    result = {
+        'run_id': run_dir.name,
+        'parameters': parameters,
+        'status': 'failed',
+    }
+
+    try:
+        # Import before changing directory so module level setup resolves project paths
+        module = importlib.import_module(module_path)
+        strategy_class = module.Strategy
+
+        run_class = get_run_class(strategy_class, {**parameters, **(shared_parameters or {})})
+
+        os.chdir(run_dir)
+        run_class.run_strategy()
+        run_class.rename_custom_logs()
+
+        trades_file = get_latest_trades_files()
+        if not trades_file:
+            raise Exception("Could not find output files after running backtest")
+
+        executions_df, trades_df = process_data(trades_file)
+        if executions_df is None or trades_df is None:
+            raise Exception("Failed to process backtest data")
+
+        offline = run_class.parameters.get("data_source") in OFFLINE_DATA_SOURCES
+        reports = generate_reports(trades_df, benchmark=not offline)
+        if not reports:
+            raise Exception("Failed to generate reports")
+
+        # Keep the processed output next to the raw logs
+        executions_df.to_csv(run_dir / "executions.csv", index=False)
+        trades_df.to_csv(run_dir / "trades.csv", index=False)
+        for period, report in reports.items():
+            report.to_csv(run_dir / f"report_{period}.csv", index=False)
+
+        result.update(summarize_reports(reports))
+        result['status'] = 'completed'
+
+    except Exception as e:
+        print(f"Error in run {run_dir.name}: {str(e)}")
+        result['error'] = str(e)
+
+    finally:
+        os.chdir(project_dir)
+
+    with open(run_dir / RESULT_FILE, 'w') as f:
+        json.dump(result, f, indent=2, default=str)
+
+    return result
+
+def build_leaderboard(results, sort_by='total_return'):
+    """
+    Build a leaderboard table from the results of a sweep.
+
+    Args:
+        results (list): List of result dictionaries
+        sort_by (str): Metric used to rank the runs (default: total_return)
+
+    Returns:
+        pd.DataFrame: One row per completed run with its parameters and metrics
+    """
+    rows = []
+    for result in results:
+        if result.get('status') != 'completed':
+            continue
+        row = {'run_id': result['run_id'], **result['parameters']}
+        row.update({metric: result.get(metric) for metric in LEADERBOARD_METRICS})
+        rows.append(row)
+
+    if not rows:
+        return pd.DataFrame()
+
+    leaderboard = pd.DataFrame(rows)
+    return leaderboard.sort_values(sort_by, ascending=False, na_position='last').reset_index(drop=True)
+
+def submit_run_to_db(writer, run_dir):
+    """
+    Queue the processed results of a completed run on the database writer.
+
+    Args:
+        writer (ResultWriter): Writer shared by the whole sweep
+        run_dir (Path): Output directory of the run
+
+    Returns:
+        Future: Resolves to the database run_id, or None if the results could not be read
+    """
+    settings_df = get_backtest_info(run_dir / "logs")
+    if settings_df is None or settings_df is False:
+        print(f"Run {run_dir.name} has no settings file, not saving it to the database")
+        return None
+
+    executions_df = pd.read_csv(run_dir / "executions.csv")
+    trades_df = pd.read_csv(run_dir / "trades.csv")
+    return writer.submit(settings_df, executions_df, trades_df)
+
+def run_sweep(file_path, grid, output_dir, max_workers=None, base_parameters=None, resume=True, save_to_db=False):
+    """
+    Run every combination of a parameter grid in a process pool.
+
+    Args:
+        file_path (str): Path to the Python file containing the Strategy class
+        grid (dict): Mapping of parameter name to a list of values
+        output_dir (str): Directory holding one sub directory per run
+        max_workers (int, optional): Number of worker processes (default: CPU count)
+        base_parameters (dict, optional): Overrides applied to every run, e.g. {"data_source": "local"}
+        resume (bool): Skip combinations that already completed (default: True)
+        save_to_db (bool): Save newly completed runs to the database (default: False).
+                           Workers never touch the database, the parent queues their
+                           results on a single ResultWriter that commits in batches.
+
+    Returns:
+        pd.DataFrame: Leaderboard of the completed runs
+    """
+    module_path = get_module_path(file_path)
+    output_dir = Path(output_dir).resolve()
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    combinations = [{**(base_parameters or {}), **combination} for combination in expand_grid(grid)]
+    print(f"Sweep has {len(combinations)} combinations")
+
+    results = []
+    pending = []
+    for parameters in combinations:
+        run_dir = output_dir / get_run_id(parameters)
+        previous = load_result(run_dir) if resume else None
+        if previous and previous.get('status') == 'completed':
+            print(f"Skipping completed run {run_dir.name}")
+            results.append(previous)
+        else:
+            pending.append((parameters, run_dir))
+
+    print(f"Running {len(pending)} combinations ({len(results)} already completed)")
+
+    if pending:
+        shared = prepare_shared_data(module_path, [parameters for parameters, _ in pending])
+        writer = ResultWriter() if save_to_db else None
+        saves = {}
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = {
+                    executor.submit(run_parameter_set, module_path, parameters, str(run_dir), shared_parameters): run_dir
+                    for (parameters, run_dir), shared_parameters in zip(pending, shared)
+                }
+                for future in as_completed(futures):
+                    run_dir = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"Worker for run {run_dir.name} crashed: {e}")
+                        continue
+                    print(f"Run {result['run_id']} finished with status {result['status']}")
+                    results.append(result)
+                    if writer and result['status'] == 'completed':
+                        saves[result['run_id']] = submit_run_to_db(writer, Path(run_dir))
+        finally:
+            if writer:
+                writer.close()
+
+        for run_id, save in saves.items():
+            if save is not None and save.exception() is None:
+                print(f"Run {run_id} saved to the database as run_id {save.result()}")
+
+    leaderboard = build_leaderboard(results)
+    if not leaderboard.empty:
+        leaderboard.to_csv(output_dir / "leaderboard.csv", index=False)
+        print(f"Leaderboard saved to {output_dir / 'leaderboard.csv'}")
+    else:
+        print("No completed runs to rank")
+
+    return leaderboard
+
+def load_grid(grid_arg):
+    """Load a parameter grid from a JSON file path or an inline JSON string"""
+    if os.path.exists(grid_arg):
+        with open(grid_arg, 'r') as f:
+            return json.load(f)
+    return json.loads(grid_arg)
+
+if __name__ == "__main__":
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(description='Run a parameter sweep for a strategy')
+    parser.add_argument('--file', type=str, default="backtests/backtests/adr_stocks.py", help='Path to strategy file')
+    parser.add_argument('--grid', type=str, required=True, help='Parameter grid as a JSON file or inline JSON')
+    parser.add_argument('--output', type=str, default="sweeps", help='Output directory for the runs')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes')
+    parser.add_argument('--data-source', type=str, default=None, help='Override the strategy data_source')
+    parser.add_argument('--no-resume', action='store_true', help='Re-run combinations that already completed')
+    parser.add_argument('--save-db', action='store_true', help='Save newly completed runs to the database')
+    args = parser.parse_args()
+
+    base_parameters = {'data_source': args.data_source} if args.data_source else None
+
+    leaderboard = run_sweep(
+        args.file,
+        load_grid(args.grid),
+        args.output,
+        max_workers=args.workers,
+        base_parameters=base_parameters,
+        resume=not args.no_resume,
+        save_to_db=args.save_db
+    )
+
+    if not leaderboard.empty:
+        print("\nLeaderboard:")
+        print(leaderboard.to_string(index=False))
@@ -7,12 +7,54 @@ from pathlib import Path
 # Initialize database manager
 db_manager = DatabaseManager()
 
+def prepare_trades(df):
+    """
+    Map processed trades to the columns of the backtest_trades table.
+    
+    Args:
+        df (pandas.DataFrame): Processed DataFrame with trade_id assignments
+        
+    Returns:
+        pandas.DataFrame: Rows for backtest_trades, with run_id only if df has one
+    """
+    backtest_trades_df = pd.DataFrame({
+        'trade_id': df['trade_id'],
+        'num_executions': df['num_executions'],
+        'symbol': df['symbol'],
+        'start_date': df['start_date'],
+        'start_time': df['start_time'],
+        'end_date': df['end_date'],
+        'end_time': df['end_time'],
+        'duration_hours': df['duration_hours'],
+        'quantity': df['quantity'],
+        'entry_price': df['entry_price'],
+        'stop_price': df['stop_price'],
+        'exit_price': df['exit_price'],
+        'capital_required': df['capital_required'],
+        'exit_type': df['exit_type'],
+        'take_profit_price': df['take_profit_price'],
+        'risk_reward': df['risk_reward'],
+        'is_winner': df['is_winner'],
+        'perc_return': df['perc_return'],
+        'week': df['week'],
+        'month': df['month'],
+        'year': df['year'],
+        'risk_per_trade_perc': df['risk_per_trade_perc'],
+        'day': df['day'],
+        'commission': df['commission'],
+        'direction': df['direction'],
+        'status': df['status']
+    })
+    if 'run_id' in df.columns:
+        backtest_trades_df['run_id'] = df['run_id']
+    return backtest_trades_df
+
 def insert_trades(df):
     """
     Insert processed backtest trades into the backtest_trades table.
     
     Args:
-        df (pandas.DataFrame): Processed DataFrame with trade_id assignments
+        df (pandas.DataFrame): Processed DataFrame with trade_id and run_id assignments
         
     Returns:
         int: Number of records inserted
@@ -21,36 +63,7 @@ def insert_trades(df):
         return 0
     
     try:
-        # Create a copy of the DataFrame and prepare for database insertion
-        backtest_trades_df = pd.DataFrame({
-            'trade_id': df['trade_id'],
-            'num_executions': df['num_executions'],
-            'symbol': df['symbol'],
-            'start_date': df['start_date'],
-            'start_time': df['start_time'],
-            'end_date': df['end_date'],
-            'end_time': df['end_time'],
-            'duration_hours': df['duration_hours'],
-            'quantity': df['quantity'],
-            'entry_price': df['entry_price'],
-            'stop_price': df['stop_price'],
-            'exit_price': df['exit_price'],
-            'capital_required': df['capital_required'],
-            'exit_type': df['exit_type'],
-            'take_profit_price': df['take_profit_price'],
-            'risk_reward': df['risk_reward'],
-            'is_winner': df['is_winner'],
-            'perc_return': df['perc_return'],
-            'week': df['week'],
-            'month': df['month'],
-            'year': df['year'],
-            'run_id': df['run_id'],
-            'risk_per_trade_perc': df['risk_per_trade_perc'],
-            'day': df['day'],
-            'commission': df['commission'],
-            'direction': df['direction'],
-            'status': df['status']
-        })
+        backtest_trades_df = prepare_trades(df)
         
         # Insert the DataFrame into the database
         records_inserted = db_manager.insert_dataframe(backtest_trades_df, 'backtest_trades')
@@ -62,12 +75,43 @@ def insert_trades(df):
         print(f"Error inserting backtest trades into database: {e}")
         raise
 
+def prepare_executions(df):
+    """
+    Map processed executions to the columns of the backtest_executions table.
+    
+    Args:
+        df (pandas.DataFrame): Processed DataFrame with trade_id assignments
+        
+    Returns:
+        pandas.DataFrame: Rows for backtest_executions, with run_id only if df has one
+    """
+    commission = 0  # Define commission once
+    backtest_executions_df = pd.DataFrame({
+        'execution_timestamp': df['execution_timestamp'],
+        'date': df['date'],
+        'time_of_day': df['time_of_day'],
+        'order_id': df['order_id'],
+        'symbol': df['symbol'],
+        'side': df['side'],
+        'quantity': df['quantity'],
+        'price': df['price'],
+        'trade_id': df['trade_id'],
+        'is_entry': df['is_entry'].astype(int),
+        'is_exit': df['is_exit'].astype(int),
+        'commission': commission,
+        'order_type': df['type'],
+        'net_cash_with_billable': df['quantity'] * df['price'] + commission
+    })
+    if 'run_id' in df.columns:
+        backtest_executions_df['run_id'] = df['run_id']
+    return backtest_executions_df
+
 def insert_executions(df):
     """
     Insert processed backtest executions into the backtest_executions table.
     
     Args:
-        df (pandas.DataFrame): Processed DataFrame with trade_id assignments
+        df (pandas.DataFrame): Processed DataFrame with trade_id and run_id assignments
         
     Returns:
         int: Number of records inserted
@@ -76,25 +120,7 @@ def insert_executions(df):
         return 0
     
     try:
-        # Create a copy of the DataFrame and prepare for database insertion
-        commission = 0  # Define commission once
-        backtest_executions_df = pd.DataFrame({
-            'execution_timestamp': df['execution_timestamp'],
-            'date': df['date'],
-            'time_of_day': df['time_of_day'],
-            'order_id': df['order_id'],
-            'symbol': df['symbol'],
-            'side': df['side'],
-            'quantity': df['quantity'],
-            'price': df['price'],
-            'trade_id': df['trade_id'],
-            'run_id': df['run_id'],
-            'is_entry': df['is_entry'].astype(int),
-            'is_exit': df['is_exit'].astype(int),
-            'commission': commission,
-            'order_type': df['type'],
-            'net_cash_with_billable': df['quantity'] * df['price'] + commission
-        })
+        backtest_executions_df = prepare_executions(df)
         
         # Insert the DataFrame into the database
         records_inserted = db_manager.insert_dataframe(backtest_executions_df, 'backtest_executions')
@@ -106,12 +132,13 @@ def insert_executions(df):
         print(f"Error inserting backtest executions into database: {e}")
         raise
 
-def get_backtest_info():
+def get_backtest_info(logs_dir='logs'):
     """
-    Create backtest info from a JSON settings file.
+    Create backtest info from the latest JSON settings file.
     
     Args:
-        json_path (str): Path to the JSON settings file (format: Strategy_YYYY-MM-DD_HH-MM_XXXXX_settings.json)
+        logs_dir (str): Directory holding the settings files
+                        (format: Strategy_YYYY-MM-DD_HH-MM_XXXXX_settings.json, default: 'logs')
         
     Returns:
         dict: Dictionary containing the required fields from parameters
@@ -129,7 +156,7 @@ def get_backtest_info():
               - day_trading
               - sleeptime
     """
-    settings_file = get_latest_settings_file()
+    settings_file = get_latest_settings_file(logs_dir)
     if not settings_file:
         print("Error: Could not find settings file")
         return False
@@ -169,6 +196,24 @@ def get_backtest_info():
         print(f"Error reading JSON file: {e}")
         return None
 
+def build_run_results(settings_df, executions_df, trades_df):
+    """
+    Bundle one backtest's rows for DatabaseManager.insert_run_results.
+    
+    Args:
+        settings_df (pd.DataFrame): Backtest info, as returned by get_backtest_info
+        executions_df (pd.DataFrame): Processed executions
+        trades_df (pd.DataFrame): Processed trades
+        
+    Returns:
+        tuple: (settings_df, children) where children maps table name to rows without run_id
+    """
+    children = {
+        'backtest_executions': prepare_executions(executions_df.drop(columns='run_id', errors='ignore')),
+        'backtest_trades': prepare_trades(trades_df.drop(columns='run_id', errors='ignore')),
+    }
+    return settings_df, children
+
 def insert_backtest_info(df):
     """
     Insert backtest info into the backtest_runs table.
@@ -181,57 +226,61 @@ def insert_backtest_info(df):
     """
 
     try:
-        inserted = db_manager.insert_dataframe(df, 'backtest_runs')
-        if inserted > 0:  # Check if any records were actually inserted
-            run_id = db_manager.get_max_id("backtest_runs","run_id")
-            return run_id
+        # The run_id comes back from the INSERT itself, so concurrent runs cannot swap IDs
+        return db_manager.insert_run_results([(df, {})], 'backtest_runs', 'run_id')[0]
     except Exception as e:
         print(f"Error saving backtest info: {e}")
         return None
     
-def insert_to_db(executions_df, trades_df):
+def insert_to_db(executions_df, trades_df, logs_dir='logs'):
     """
-    Insert the processed DataFrame into the database.
+    Insert the processed backtest into the database.
+    
+    The run, its executions and its trades are written in one transaction,
+    so a failed run leaves nothing behind and parallel runs never mix IDs.
     
     Args:
-        df (pd.DataFrame): DataFrame containing the backtest executions
-        json_path (str): Path to the JSON settings file
+        executions_df (pd.DataFrame): Processed backtest executions
+        trades_df (pd.DataFrame): Processed backtest trades
+        logs_dir (str): Directory holding the run's settings file (default: 'logs')
         
     Returns:
         bool: True if successful, False otherwise
     """
     
     try:
-        # First save backtest info and get run_id
-        settings_df = get_backtest_info()
-        run_id = insert_backtest_info(settings_df)
-        if run_id is None:
+        settings_df = get_backtest_info(logs_dir)
+        if settings_df is None or settings_df is False:
             print("Error: Could not save backtest info")
             return False
-            
-        # Add run_id to DataFrame
+        
+        run_id = db_manager.insert_run_results(
+            [build_run_results(settings_df, executions_df, trades_df)], 'backtest_runs', 'run_id'
+        )[0]
+        
+        # Callers read the run_id back from the DataFrames
         executions_df['run_id'] = run_id
         trades_df['run_id'] = run_id
         
-        # Insert executions using the dedicated function
-        executions_inserted = insert_executions(executions_df)
-        trades_inserted = insert_trades(trades_df)
-        
-        return executions_inserted > 0 and trades_inserted > 0
+        print(f"Saved backtest run {run_id} with {len(executions_df)} executions and {len(trades_df)} trades")
+        return len(executions_df) > 0 and len(trades_df) > 0
         
     except Exception as e:
         print(f"Error inserting data into database: {str(e)}")
         return False
     
-def get_latest_settings_file():
+def get_latest_settings_file(logs_dir='logs'):
     """
     Find the most recently created settings.json file in the logs directory.
     
+    Args:
+        logs_dir (str): Directory to search (default: 'logs')
+        
     Returns:
         str: settings_file path. None if not found.
     """
     try:
-        logs_dir = Path('logs')
+        logs_dir = Path(logs_dir)
         if not logs_dir.exists():
             print("Logs directory not found")
             return None
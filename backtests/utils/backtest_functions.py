@@ -12,6 +12,9 @@ from lumibot.data_sources.pandas_data import PandasData
 
 
 from backtests.utils.backtest_data_to_db import get_latest_settings_file
+from backtests.utils.local_data import get_local_pandas_data
+from backtests.utils.regime import RegimeSeries
+from backtests.utils.trade_log import TradeLogWriter
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
@@ -21,6 +24,16 @@ class BaseStrategy(Strategy):
     Base Strategy class containing common helper methods for trading strategies.
     """
 
+    def _get_trade_log_writer(self):
+        """Get the fill writer of this run, creating it on the first fill"""
+        writer = getattr(self, '_trade_log_writer', None)
+        if writer is None:
+            timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M")
+            filename = Path("logs") / f"{self.name}_{timestamp}_{'id'}_custom_trades.csv"
+            writer = TradeLogWriter(filename)
+            self._trade_log_writer = writer
+        return writer
+
     def _save_trades_at_end(self):
         """Save trades to CSV when reaching the end of backtest"""
         current_time = self.get_datetime()
@@ -29,26 +42,31 @@ class BaseStrategy(Strategy):
         next_day = current_time + pd.Timedelta(days=1)
 
         if next_day.date() == backtesting_end.date() or current_time.date() == backtesting_end.date():
-            if hasattr(self.vars, 'trade_log') and self.vars.trade_log:
+            writer = getattr(self, '_trade_log_writer', None)
+            if writer is not None and len(writer) > 0:
                 timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M")
-                df = pd.DataFrame(self.vars.trade_log)
-                
-                # Ensure logs directory exists
-                logs_dir = Path("logs")
-                logs_dir.mkdir(exist_ok=True)
                 
-                # Save file in logs directory with same identifier
-                filename = logs_dir / f"{self.name}_{timestamp}_{'id'}_custom_trades.csv"
-                df.to_csv(filename, index=False)
+                # Fills were streamed to disk during the run, move the file to the
+                # end-of-run timestamp that rename_custom_logs matches on
+                filename = Path("logs") / f"{self.name}_{timestamp}_{'id'}_custom_trades.csv"
+                writer.move(filename)
                 print(f"Custom trades saved to {filename}")
             else:
                 print("No trade log to save.")
 
+    def on_bot_crash(self, error):
+        """Write the buffered fills before lumibot handles the crash"""
+        writer = getattr(self, '_trade_log_writer', None)
+        if writer is not None:
+            writer.flush()
+            print(f"Partial trade log saved to {writer.path}")
+        super().on_bot_crash(error)
+
     def _on_filled_order(self, position, order, price, quantity, multiplier):
         """
         Process filled orders and log trade information.
         
-        This method extracts information from the order, logs it to the trade_log,
+        This method extracts information from the order, logs it to the trade log file,
         and performs any necessary post-fill actions.
         
         Args:
@@ -58,10 +76,6 @@ class BaseStrategy(Strategy):
             quantity: The fill quantity
             multiplier: The multiplier applied to the order
         """
-        # Initialize trade_log if it doesn't exist
-        if not hasattr(self.vars, 'trade_log'):
-            self.vars.trade_log = []
-            
         # Extract stop loss and take profit from order parameters
         stop_loss = None
         take_profit = None
@@ -85,8 +99,8 @@ class BaseStrategy(Strategy):
             "risk_per_trade": self.risk_per_trade,
         }
 
-        # Append to trade log
-        self.vars.trade_log.append(trade_info)
+        # Append to the trade log, written to disk in batches
+        self._get_trade_log_writer().append(trade_info)
         
     def _create_and_submit_entry_order(self, symbol, quantity, stop_loss_price=None, take_profit_price=None, type="market"):
         """
@@ -126,6 +140,79 @@ class BaseStrategy(Strategy):
         )
         self.submit_order(entry_order)
 
+    def load_regime(self, benchmark=None, sma_period=50, vix_ticker="VIX"):
+        """
+        Load the benchmark and VIX regime series once for the whole backtest.
+        
+        Args:
+            benchmark (str, optional): Benchmark ticker (default: the "benchmark" parameter)
+            sma_period (int): Benchmark SMA window length (default: 50)
+            vix_ticker (str): VIX ticker in the indexes table (default: 'VIX')
+            
+        Returns:
+            RegimeSeries: The loaded series, also stored in self.regime
+        """
+        self.regime = RegimeSeries.load(
+            benchmark or self.parameters.get("benchmark"),
+            sma_period=sma_period,
+            vix_ticker=vix_ticker,
+            end_date=self.parameters.get("backtesting_end")
+        )
+        return self.regime
+
+    def get_regime(self, current_time=None):
+        """
+        Get the regime of the last completed session, loaded by load_regime.
+        
+        Args:
+            current_time (datetime, optional): Current time (default: the strategy time)
+            
+        Returns:
+            Regime: close, sma, above_sma and vix of the previous session, or None if missing
+        """
+        return self.regime.get_previous(current_time or self.get_datetime())
+
+    @classmethod
+    def get_backtest_symbols(cls):
+        """
+        Get the symbols the strategy trades, before the backtest starts.
+        
+        Used by data sources that need to load their data up front. Strategies
+        that build their universe in initialize should override this.
+        
+        Returns:
+            list: Ticker symbols
+        """
+        return list(cls.parameters.get("symbols") or [])
+
+    @classmethod
+    def prepare_shared_data(cls):
+        """
+        Prepare the data a run reads, before its worker process is started.
+        
+        The sweep and walk-forward runners call this in the parent process,
+        so work like building a universe is done once there instead of in
+        every worker. Strategies with such work should override this.
+        
+        Returns:
+            dict: Parameters added to the run, e.g. the hash of a prepared universe
+        """
+        return {}
+
+    @classmethod
+    def supports_vector_engine(cls):
+        """
+        Whether the strategy can run on the vectorized daily-bar engine (data_source "vector").
+        
+        Strategies that can express their rules as a daily screen and regime gates
+        define a run_vector_strategy classmethod that builds the engine inputs,
+        writes the trade log and returns it as a DataFrame.
+        
+        Returns:
+            bool: True if the strategy defines run_vector_strategy
+        """
+        return callable(getattr(cls, 'run_vector_strategy', None))
+
     @classmethod
     def run_strategy(cls):
         """
@@ -148,6 +235,10 @@ class BaseStrategy(Strategy):
 
         if not data_source:
             raise ValueError("Missing required parameters: data_source must be set in parameters")
+
+        if data_source == "vector" and not cls.supports_vector_engine():
+            raise ValueError(f"{cls.__name__} does not implement run_vector_strategy, "
+                             f"use data_source 'local' or 'polygon' instead of 'vector'")
         
         # Validate required parameters
         if not backtesting_start or not backtesting_end:
@@ -176,6 +267,35 @@ class BaseStrategy(Strategy):
                 polygon_api_key=polygon_api_key,
             ) 
         
+        elif data_source == "local":
+            # Symbols must be known up front to load their bars from the database
+            symbols = cls.get_backtest_symbols()
+            benchmark = parameters.get("benchmark")
+            tickers = symbols + [benchmark] if benchmark else symbols
+            quote_asset = Asset("USD", asset_type=Asset.AssetType.FOREX)
+
+            pandas_data = get_local_pandas_data(tickers, backtesting_end, quote_asset=quote_asset)
+            if not pandas_data:
+                raise ValueError("No local data found for the strategy symbols")
+
+            # No benchmark or tearsheet, both are downloaded from the network
+            return cls.run_backtest(
+                PandasDataBacktesting,
+                backtesting_start,
+                backtesting_end,
+                parameters={**parameters, "symbols": symbols},
+                pandas_data=pandas_data,
+                benchmark_asset=None,
+                quote_asset=quote_asset,
+                show_plot=False,
+                save_tearsheet=False,
+                show_tearsheet=False,
+            )
+
+        elif data_source == "vector":
+            # Array-based simulation on the local database, without the lumibot event loop
+            return cls.run_vector_strategy()
+
         else:
             raise ValueError("Invalid data source")
 
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+from lumibot.entities import Asset, Data
+from utils.db_utils import DatabaseManager
+
+# Initialize database manager
+db_manager = DatabaseManager()
+
+# Data objects already built in this process, keyed by (tickers, end date)
+_pandas_data_cache = {}
+
+def build_pandas_data(ohlcv_df, quote_asset):
+    """
+    Build lumibot Data objects from a long OHLCV DataFrame.
+
+    Args:
+        ohlcv_df (pd.DataFrame): Output of DatabaseManager.get_ohlcv_panel, sorted by ticker and datetime
+        quote_asset (Asset): Quote asset for every Data object
+
+    Returns:
+        dict: Mapping of Asset to Data, as expected by PandasDataBacktesting
+    """
+    pandas_data = {}
+    if ohlcv_df.empty:
+        return pandas_data
+
+    # Rows are sorted by ticker, so each ticker is one contiguous slice
+    tickers = ohlcv_df['ticker'].to_numpy()
+    starts = np.flatnonzero(np.r_[True, tickers[1:] != tickers[:-1]])
+    ends = np.r_[starts[1:], len(tickers)]
+
+    index = pd.DatetimeIndex(ohlcv_df['datetime'].to_numpy(), name='datetime')
+    values = {
+        column: ohlcv_df[column].to_numpy(dtype='float64')
+        for column in ['open', 'high', 'low', 'close', 'volume']
+    }
+
+    for start, end in zip(starts, ends):
+        asset = Asset(tickers[start], asset_type=Asset.AssetType.STOCK)
+        df = pd.DataFrame(
+            {column: array[start:end] for column, array in values.items()},
+            index=index[start:end]
+        )
+        pandas_data[asset] = Data(asset, df, timestep="day", quote=quote_asset)
+
+    return pandas_data
+
+def get_local_pandas_data(tickers, backtesting_end, quote_asset=None):
+    """
+    Load daily bars for the given tickers from the database as lumibot Data objects.
+
+    All history up to backtesting_end is loaded so indicators have their warm-up
+    bars. The result is cached for the lifetime of the process, so repeated runs
+    over the same tickers (e.g. in a parameter sweep worker) skip the database.
+
+    Args:
+        tickers (list): Ticker symbols, from either the stocks or indexes table
+        backtesting_end (datetime or str): Last date to load
+        quote_asset (Asset, optional): Quote asset (default: USD)
+
+    Returns:
+        dict: Mapping of Asset to Data
+    """
+    if quote_asset is None:
+        quote_asset = Asset("USD", asset_type=Asset.AssetType.FOREX)
+
+    end_date = pd.Timestamp(backtesting_end).strftime('%Y-%m-%d')
+    cache_key = (tuple(sorted(set(tickers))), end_date)
+
+    if cache_key in _pandas_data_cache:
+        print(f"Reusing cached local data for {len(cache_key[0])} tickers")
+        return _pandas_data_cache[cache_key]
+
+    ohlcv_df = db_manager.get_ohlcv_panel(list(cache_key[0]), end_date=end_date)
+    pandas_data = build_pandas_data(ohlcv_df, quote_asset)
+
+    missing = set(cache_key[0]) - {asset.symbol for asset in pandas_data}
+    if missing:
+        print(f"No local data found for {len(missing)} tickers: {sorted(missing)[:10]}")
+
+    _pandas_data_cache[cache_key] = pandas_data
+    return pandas_data
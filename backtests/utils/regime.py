@@ -0,0 +1,100 @@
+from collections import namedtuple
+import numpy as np
+from indicators.store import load_indicator_frame
+from utils.trading_calendar import previous_session
+
+# Market regime on one trading date
+Regime = namedtuple('Regime', ['date', 'close', 'sma', 'above_sma', 'vix'])
+
+class RegimeSeries:
+    """
+    Benchmark close, SMA, above_sma flag and VIX close for every trading date.
+
+    The series is built once from indexes_ohlcv_daily and each date maps to its
+    precomputed Regime, so a lookup is a dictionary access instead of a filter
+    over the benchmark history.
+    """
+
+    def __init__(self, dates, close, sma, vix):
+        """
+        Initialize from aligned arrays
+
+        Args:
+            dates (np.ndarray): Trading dates as datetime64[D], sorted
+            close (np.ndarray): Benchmark closes
+            sma (np.ndarray): Benchmark SMA, NaN during warm-up
+            vix (np.ndarray): VIX closes, NaN where missing
+        """
+        self.dates = np.asarray(dates, dtype='datetime64[D]')
+        self.close = np.asarray(close, dtype='float64')
+        self.sma = np.asarray(sma, dtype='float64')
+        self.vix = np.asarray(vix, dtype='float64')
+        self.above_sma = self.close > self.sma
+
+        days = self.dates.tolist()
+        self._regimes = {
+            day: Regime(day, *values)
+            for day, values in zip(days, zip(self.close.tolist(), self.sma.tolist(),
+                                             self.above_sma.tolist(), self.vix.tolist()))
+        }
+
+    @classmethod
+    def load(cls, benchmark, sma_period=50, vix_ticker="VIX", end_date=None):
+        """
+        Load the regime series from the indexes tables.
+
+        Args:
+            benchmark (str): Benchmark ticker in the indexes table, e.g. 'QQQ'
+            sma_period (int): SMA window length (default: 50)
+            vix_ticker (str): VIX ticker in the indexes table (default: 'VIX')
+            end_date (str, optional): Last date to load, in YYYY-MM-DD format
+
+        Returns:
+            RegimeSeries: The regime for every benchmark date
+        """
+        sma_column = f"sma_{sma_period}"
+        indexes_df = load_indicator_frame(
+            "indexes", {'sma': [sma_period]}, tickers=[benchmark, vix_ticker], end_date=end_date
+        )
+
+        benchmark_df = indexes_df.loc[indexes_df['ticker'] == benchmark, ['datetime', 'close', sma_column]]
+        vix_df = indexes_df.loc[indexes_df['ticker'] == vix_ticker, ['datetime', 'close']]
+        regime_df = benchmark_df.merge(vix_df.rename(columns={'close': 'vix'}), on='datetime', how='left')
+
+        if vix_df.empty:
+            print(f"No {vix_ticker} data found in the indexes table")
+        print(f"Loaded regime series for {benchmark} with {len(regime_df)} dates")
+
+        return cls(
+            regime_df['datetime'].to_numpy().astype('datetime64[D]'),
+            regime_df['close'].to_numpy(),
+            regime_df[sma_column].to_numpy(),
+            regime_df['vix'].to_numpy(),
+        )
+
+    def __len__(self):
+        return len(self.dates)
+
+    def get(self, date):
+        """
+        Get the regime on a trading date.
+
+        Args:
+            date (datetime.date): Trading date
+
+        Returns:
+            Regime: The regime, or None if the date is not in the series
+        """
+        return self._regimes.get(date)
+
+    def get_previous(self, current_time):
+        """
+        Get the regime on the session before current_time, i.e. the last completed bar.
+
+        Args:
+            current_time (datetime, pd.Timestamp or str): Current simulation time
+
+        Returns:
+            Regime: The regime, or None if the session is not in the series
+        """
+        return self._regimes.get(previous_session(current_time))
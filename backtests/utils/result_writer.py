@@ -0,0 +1,117 @@
+import queue
+import threading
+from concurrent.futures import Future
+from utils.db_utils import DatabaseManager
+from backtests.utils.backtest_data_to_db import build_run_results
+
+# Initialize database manager
+db_manager = DatabaseManager()
+
+class ResultWriter:
+    """
+    Single database writer for backtest results produced by many workers.
+
+    Workers (or the parent process collecting their results) submit runs to a
+    queue. One background thread drains it and writes up to batch_size runs per
+    transaction, so SQLite only ever sees one writer and commits are amortized
+    over several runs. Each run gets its own savepoint, so a run that fails to
+    insert is rolled back alone. Each submit returns a Future that resolves to
+    the run_id, or raises the run's insert error.
+    """
+
+    def __init__(self, batch_size=20, flush_interval=1.0, manager=None):
+        """
+        Initialize the writer and start its thread
+
+        Args:
+            batch_size (int): Maximum number of runs committed together (default: 20)
+            flush_interval (float): Seconds to wait for more runs before committing a partial batch (default: 1.0)
+            manager (DatabaseManager, optional): Database to write to (default: the module's db_manager)
+        """
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.manager = manager or db_manager
+        self.runs_written = 0
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="result-writer", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def submit(self, settings_df, executions_df, trades_df):
+        """
+        Queue one backtest for writing
+
+        Args:
+            settings_df (pd.DataFrame): Backtest info, as returned by get_backtest_info
+            executions_df (pd.DataFrame): Processed executions
+            trades_df (pd.DataFrame): Processed trades
+
+        Returns:
+            Future: Resolves to the run_id once the batch holding the run is committed
+        """
+        if self._closed:
+            raise RuntimeError("ResultWriter is closed")
+
+        future = Future()
+        self._queue.put((build_run_results(settings_df, executions_df, trades_df), future))
+        return future
+
+    def close(self):
+        """Write everything still queued and stop the thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        """Drain the queue in batches until close is called"""
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        """Commit a batch in one transaction, each run in its own savepoint, and resolve its futures"""
+        try:
+            run_ids = self.manager.insert_run_results(
+                [results for results, _ in batch], 'backtest_runs', 'run_id', isolate_runs=True
+            )
+        except Exception as e:
+            print(f"Error writing {len(batch)} backtest runs: {e}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        # A failed run was rolled back alone, only its future fails
+        written = [run_id for run_id in run_ids if not isinstance(run_id, Exception)]
+        self.runs_written += len(written)
+        if written:
+            print(f"Saved {len(written)} backtest runs (run_id {written[0]} to {written[-1]})")
+        if len(written) < len(batch):
+            print(f"{len(batch) - len(written)} backtest runs of the batch failed and were not saved")
+        for (_, future), run_id in zip(batch, run_ids):
+            if isinstance(run_id, Exception):
+                future.set_exception(run_id)
+            else:
+                future.set_result(run_id)
@@ -0,0 +1,109 @@
+import csv
+import os
+from pathlib import Path
+import pandas as pd
+
+# Columns of the custom trades CSV, in the order written by BaseStrategy._on_filled_order
+TRADE_LOG_COLUMNS = [
+    'name', 'order_id', 'symbol', 'price', 'quantity', 'side', 'timestamp',
+    'stop_loss', 'take_profit', 'status', 'type', 'risk_per_trade'
+]
+
+class TradeLogWriter:
+    """
+    Append-only CSV writer for fills with a bounded in-memory buffer.
+
+    Fills are buffered as one list per column and appended to the CSV file
+    every buffer_size rows, with an fsync, so memory stays flat during long
+    runs and everything up to the last flush survives a crash.
+    """
+
+    def __init__(self, path, columns=None, buffer_size=500):
+        """
+        Initialize the writer, the file is created on the first flush
+
+        Args:
+            path (str or Path): CSV file to append to
+            columns (list, optional): Column names (default: TRADE_LOG_COLUMNS)
+            buffer_size (int): Number of rows kept in memory before they are written
+        """
+        self.path = Path(path)
+        self.columns = list(columns or TRADE_LOG_COLUMNS)
+        self.buffer_size = buffer_size
+        self.rows_written = 0
+        self._buffer = {column: [] for column in self.columns}
+        self._buffered = 0
+
+    def __len__(self):
+        """Total number of rows, written or buffered"""
+        return self.rows_written + self._buffered
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+    def append(self, row):
+        """
+        Add a fill, flushing the buffer when it is full
+
+        Args:
+            row (dict): Values by column name, missing columns are left empty
+        """
+        for column in self.columns:
+            self._buffer[column].append(row.get(column))
+        self._buffered += 1
+
+        if self._buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Append the buffered rows to the file and fsync it
+
+        Returns:
+            int: Number of rows written
+        """
+        if self._buffered == 0:
+            return 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        write_header = not self.path.exists() or self.path.stat().st_size == 0
+
+        with open(self.path, 'a', newline='') as f:
+            writer = csv.writer(f)
+            if write_header:
+                writer.writerow(self.columns)
+            writer.writerows(
+                ['' if value is None else value for value in row]
+                for row in zip(*(self._buffer[column] for column in self.columns))
+            )
+            f.flush()
+            os.fsync(f.fileno())
+
+        written = self._buffered
+        self.rows_written += written
+        self._buffer = {column: [] for column in self.columns}
+        self._buffered = 0
+        return written
+
+    def move(self, path):
+        """
+        Flush and move the file to a new path, later rows are appended there
+
+        Args:
+            path (str or Path): New file path
+        """
+        self.flush()
+        path = Path(path)
+        if self.path.exists():
+            os.replace(self.path, path)
+        self.path = path
+
+    def to_dataframe(self):
+        """Read back every row, written or buffered"""
+        self.flush()
+        if not self.path.exists():
+            return pd.DataFrame(columns=self.columns)
+        return pd.read_csv(self.path)
@@ -0,0 +1,99 @@
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+from utils.db_utils import DatabaseManager
+from indicators.store import materialize_indicators
+
+# Initialize database manager
+db_manager = DatabaseManager()
+
+def get_universe_hash(parameters):
+    """
+    Build a deterministic hash for a screening threshold set.
+
+    Args:
+        parameters (dict): Screening parameters, as built by build_universe
+
+    Returns:
+        str: Short hexadecimal hash
+    """
+    payload = json.dumps(parameters, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+def build_universe(min_volume, min_adr, min_price, adv_period=30, adr_period=20,
+                   start_date=None, end_date=None, rebuild=False):
+    """
+    Build the point-in-time daily universe for a threshold set, or reuse it if it exists.
+
+    The ADV and ADR values come from the materialized indicator store, which is
+    refreshed incrementally first. A sweep over thresholds therefore computes
+    the indicators once and only re-applies the thresholds per threshold set.
+
+    The hash includes the store's last date, value count and checksum inside
+    the date range, so a universe is rebuilt once bars are ingested, backfilled
+    or rewritten for its range, and later bars do not invalidate a universe
+    with an end_date.
+
+    Args:
+        min_volume (float): Minimum average daily volume
+        min_adr (float): Minimum average daily range, in percent
+        min_price (float): Minimum close
+        adv_period (int): ADV window length (default: 30)
+        adr_period (int): ADR window length (default: 20)
+        start_date (str, optional): First date of the universe, in YYYY-MM-DD format
+        end_date (str, optional): Last date of the universe, in YYYY-MM-DD format
+        rebuild (bool): Rebuild even if the universe already exists
+
+    Returns:
+        str: Parameter hash identifying the universe in universe_daily
+    """
+    parameters = {
+        'min_volume': min_volume,
+        'min_adr': min_adr,
+        'min_price': min_price,
+        'adv_period': adv_period,
+        'adr_period': adr_period,
+        'start_date': start_date,
+        'end_date': end_date,
+    }
+    materialize_indicators("stocks", {'adv': [adv_period], 'adr': [adr_period]})
+    parameters['data_version'] = db_manager.get_indicator_version(
+        "stocks", [('adv', adv_period), ('adr', adr_period)], start_date=start_date, end_date=end_date
+    )
+    params_hash = get_universe_hash(parameters)
+
+    if not rebuild and db_manager.universe_exists(params_hash):
+        print(f"Reusing daily universe {params_hash}")
+        return params_hash
+
+    row_count = db_manager.build_universe_daily(params_hash, parameters)
+    print(f"Built daily universe {params_hash} with {row_count} rows")
+    return params_hash
+
+def load_universe_mask(params_hash, dates, tickers):
+    """
+    Load a universe as a boolean (dates x tickers) array.
+
+    Args:
+        params_hash (str): Hash identifying the threshold set
+        dates (np.ndarray): Dates of the rows, as datetime64[D]
+        tickers (np.ndarray): Tickers of the columns
+
+    Returns:
+        np.ndarray: True where the ticker passes the screen on that date
+    """
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    passes_df = db_manager.get_universe_passes(params_hash, start_date=str(dates[0]), end_date=str(dates[-1]))
+
+    mask = np.zeros((len(dates), len(tickers)), dtype=bool)
+    if passes_df.empty:
+        return mask
+
+    pass_dates = passes_df['datetime'].to_numpy().astype('datetime64[D]')
+    rows = np.minimum(np.searchsorted(dates, pass_dates), len(dates) - 1)
+    columns = pd.Index(tickers).get_indexer(passes_df['ticker'])
+    # Drop tickers outside the panel and dates that are not panel sessions
+    found = (columns >= 0) & (dates[rows] == pass_dates)
+    mask[rows[found], columns[found]] = True
+    return mask
@@ -0,0 +1,322 @@
+import json
+import uuid
+from collections import namedtuple
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from utils.db_utils import DatabaseManager
+from utils.trading_calendar import previous_session, sessions_in_range
+from backtests.utils.trade_log import TRADE_LOG_COLUMNS
+
+# Initialize database manager
+db_manager = DatabaseManager()
+
+DEFAULT_BUDGET = 100000
+
+# Fill times: orders from the daily iteration fill at the open, bracket legs during the session
+EXCHANGE_TIMEZONE = 'America/New_York'
+MARKET_OPEN = pd.Timedelta(hours=9, minutes=30)
+MARKET_CLOSE = pd.Timedelta(hours=16)
+
+# Regime gate values, one per date
+GATE_SKIP = -1     # No regime data: do nothing, as the strategy returns early
+GATE_FLATTEN = 0   # Regime is off: close every position
+GATE_TRADE = 1     # Regime is on: open new positions
+
+# Daily bars aligned on trading sessions, arrays are (dates x tickers) with NaN for missing bars
+BarPanel = namedtuple('BarPanel', ['dates', 'tickers', 'open', 'high', 'low', 'close'])
+
+def load_bar_panel(tickers, start_date, end_date):
+    """
+    Load daily bars for a universe as (dates x tickers) arrays.
+
+    The panel starts on the session before start_date, so signals for the
+    first day can be read from the previous bar.
+
+    Args:
+        tickers (list): Ticker symbols
+        start_date (str): First trading day, in YYYY-MM-DD format
+        end_date (str): Last date, in YYYY-MM-DD format
+
+    Returns:
+        BarPanel: Panel with one row per session
+    """
+    first_date = previous_session(start_date)
+    dates = sessions_in_range(first_date, end_date)
+
+    ohlcv_df = db_manager.get_ohlcv_panel(list(tickers), start_date=str(first_date), end_date=end_date)
+    tickers = np.array(sorted(set(tickers)), dtype=object)
+    index = pd.DatetimeIndex(dates)
+
+    arrays = {}
+    for column in ['open', 'high', 'low', 'close']:
+        pivot = ohlcv_df.pivot(index='datetime', columns='ticker', values=column) if not ohlcv_df.empty else pd.DataFrame()
+        arrays[column] = pivot.reindex(index=index, columns=tickers).to_numpy(dtype='float64')
+
+    print(f"Loaded bar panel with {len(dates)} sessions and {len(tickers)} tickers")
+    return BarPanel(dates, tickers, arrays['open'], arrays['high'], arrays['low'], arrays['close'])
+
+def get_fill_timestamps(dates, offset):
+    """Exchange-local fill timestamps, formatted like the lumibot datetimes in the trade log"""
+    times = (pd.DatetimeIndex(dates) + offset).tz_localize(EXCHANGE_TIMEZONE)
+    return [str(time) for time in times]
+
+def size_entries(cash, prices, position_pct, margin=False):
+    """
+    Shares to buy for each entry of a day, as the screening strategies size them.
+
+    Every entry gets position_pct of the cash at the start of the day, in whole
+    shares at its reference price. Unless margin is set, the entries are then
+    sized down in the given order, so their total cost at the reference prices
+    stays within the cash. Both engines size with this function, so their fills
+    only differ by the gap between the reference price and the fill price.
+
+    Args:
+        cash (float): Cash at the start of the day
+        prices (array-like): Reference price of each entry, e.g. the previous close
+        position_pct (float): Share of the cash allocated to each entry
+        margin (bool): Let the entries cost more than the cash (default: False)
+
+    Returns:
+        np.ndarray: Whole shares of each entry, 0 where none can be bought
+    """
+    prices = np.asarray(prices, dtype='float64')
+    valid = prices > 0
+    shares = np.zeros(len(prices))
+    shares[valid] = np.maximum(np.floor(cash * position_pct / prices[valid]), 0)
+    if margin or np.sum(shares * np.where(valid, prices, 0.0)) <= cash:
+        return shares
+
+    remaining = cash
+    for i in np.flatnonzero(valid):
+        shares[i] = min(shares[i], np.floor(max(remaining, 0.0) / prices[i]))
+        remaining -= shares[i] * prices[i]
+    return shares
+
+def run_vector_backtest(panel, entry_mask, gates, parameters, name="Strategy"):
+    """
+    Simulate a daily screening strategy over a bar panel.
+
+    Each trading day t, from the session after backtesting_start through
+    backtesting_end, uses only information up to the previous session t-1:
+    - gates[t-1] == GATE_FLATTEN closes every position at the open of t
+    - gates[t-1] == GATE_TRADE buys every ticker of entry_mask[t-1] that is not held,
+      at the open of t, with int(cash * position_pct / close[t-1]) shares
+    - gates[t-1] == GATE_SKIP does nothing
+    Bracket legs (stop_loss_pct / take_profit_pct, relative to close[t-1]) are checked
+    against the high and low of every day a position is held, including the entry day.
+    If both legs are hit on the same bar the stop is assumed to fill first, and a bar
+    opening beyond a leg fills at the open.
+
+    Entries are sized by size_entries from the cash at the start of the day,
+    like BaseStrategy subclasses reading self.cash in on_trading_iteration. Unless
+    margin is set, long entries are sized down in ticker order to the cash at the
+    previous close, so only a gap up between that close and the open can take the
+    cash below zero. Exits on a day without a bar are filled at the next available
+    open, and entries on a day without a bar are skipped.
+
+    Args:
+        panel (BarPanel): Daily bars, as returned by load_bar_panel
+        entry_mask (np.ndarray): Boolean (dates x tickers) array, True where a ticker qualifies on that day
+        gates (np.ndarray): Integer array with one GATE_* value per panel date
+        parameters (dict): Strategy parameters. Used keys: backtesting_start, backtesting_end,
+                           side, position_pct, budget, margin, stop_loss_pct, take_profit_pct, risk_per_trade
+        name (str): Strategy name written in the trade log
+
+    Returns:
+        pd.DataFrame: Trade log with TRADE_LOG_COLUMNS, one row per fill
+    """
+    direction = 1 if parameters.get("side", "buy") == "buy" else -1
+    entry_side, exit_side = ("buy", "sell") if direction == 1 else ("sell", "buy")
+    position_pct = parameters.get("position_pct")
+    check_buying_power = direction == 1 and not parameters.get("margin")
+    stop_loss_pct = parameters.get("stop_loss_pct")
+    take_profit_pct = parameters.get("take_profit_pct")
+    entry_type = "bracket" if stop_loss_pct or take_profit_pct else "market"
+
+    dates = pd.DatetimeIndex(panel.dates)
+    start = pd.Timestamp(parameters.get("backtesting_start"))
+    end = pd.Timestamp(parameters.get("backtesting_end"))
+    # Like lumibot, orders go in on the sessions after the start date through the
+    # end date, each on the signals of the session before
+    trading_days = np.flatnonzero((dates > start) & (dates <= end))
+    trading_days = trading_days[trading_days > 0]
+
+    open_times = get_fill_timestamps(panel.dates, MARKET_OPEN)
+    close_times = get_fill_timestamps(panel.dates, MARKET_CLOSE)
+
+    n_tickers = len(panel.tickers)
+    shares = np.zeros(n_tickers)
+    stop_prices = np.full(n_tickers, np.nan)
+    take_profit_prices = np.full(n_tickers, np.nan)
+    pending_exit = np.zeros(n_tickers, dtype=bool)
+    cash = float(parameters.get("budget") or DEFAULT_BUDGET)
+
+    # Fills are collected as column chunks and assembled once at the end
+    fills = {'day': [], 'ticker': [], 'price': [], 'quantity': [], 'side': [],
+             'time': [], 'stop_loss': [], 'take_profit': [], 'type': []}
+
+    def record(day, tickers, prices, quantities, side, times, order_type, stop_loss, take_profit):
+        nonlocal cash
+        count = len(tickers)
+        fills['day'].append(np.full(count, day))
+        fills['ticker'].append(tickers)
+        fills['price'].append(prices)
+        fills['quantity'].append(quantities)
+        fills['side'].append(np.full(count, side, dtype=object))
+        fills['time'].append(np.full(count, times, dtype=object))
+        fills['stop_loss'].append(stop_loss)
+        fills['take_profit'].append(take_profit)
+        fills['type'].append(np.full(count, order_type, dtype=object))
+        signed = quantities if side == "buy" else -quantities
+        cash -= float(np.sum(signed * prices))
+
+    def close_positions(day, tickers, prices, times, order_type):
+        no_levels = np.full(len(tickers), np.nan)
+        record(day, tickers, prices, shares[tickers].copy(), exit_side, times, order_type, no_levels, no_levels)
+        shares[tickers] = 0
+        stop_prices[tickers] = np.nan
+        take_profit_prices[tickers] = np.nan
+        pending_exit[tickers] = False
+
+    for day in trading_days:
+        signal_day = day - 1
+        open_ = panel.open[day]
+        has_bar = ~np.isnan(open_)
+        held = shares > 0
+
+        # Exits left over from a day without a bar
+        to_close = np.flatnonzero(pending_exit & held & has_bar)
+        if len(to_close):
+            close_positions(day, to_close, open_[to_close], open_times[day], "market")
+            held = shares > 0
+
+        gate = gates[signal_day]
+        if gate == GATE_FLATTEN and held.any():
+            to_close = np.flatnonzero(held & has_bar)
+            close_positions(day, to_close, open_[to_close], open_times[day], "market")
+            pending_exit |= held & ~has_bar
+
+        elif gate == GATE_TRADE:
+            reference = panel.close[signal_day]
+            candidates = np.flatnonzero(entry_mask[signal_day] & ~held & ~pending_exit & has_bar & (reference > 0))
+            quantities = np.zeros(n_tickers)
+            quantities[candidates] = size_entries(cash, reference[candidates], position_pct,
+                                                  margin=not check_buying_power)
+            candidates = candidates[quantities[candidates] > 0]
+            if len(candidates):
+                if stop_loss_pct:
+                    stop_prices[candidates] = reference[candidates] * (1 - direction * stop_loss_pct)
+                if take_profit_pct:
+                    take_profit_prices[candidates] = reference[candidates] * (1 + direction * take_profit_pct)
+                shares[candidates] = quantities[candidates]
+                record(day, candidates, open_[candidates], quantities[candidates], entry_side, open_times[day],
+                       entry_type, stop_prices[candidates].copy(), take_profit_prices[candidates].copy())
+
+        # Bracket legs, on every bar a position is held
+        held = (shares > 0) & has_bar & ~pending_exit
+        if entry_type == "bracket" and held.any():
+            high, low = panel.high[day], panel.low[day]
+            if direction == 1:
+                stop_hit = held & (low <= stop_prices)
+                take_profit_hit = held & ~stop_hit & (high >= take_profit_prices)
+                stop_fill = np.minimum(open_, stop_prices)
+                take_profit_fill = np.maximum(open_, take_profit_prices)
+            else:
+                stop_hit = held & (high >= stop_prices)
+                take_profit_hit = held & ~stop_hit & (low <= take_profit_prices)
+                stop_fill = np.maximum(open_, stop_prices)
+                take_profit_fill = np.minimum(open_, take_profit_prices)
+
+            for hit, fill_prices, order_type in ((stop_hit, stop_fill, "stop"), (take_profit_hit, take_profit_fill, "limit")):
+                tickers = np.flatnonzero(hit)
+                if len(tickers):
+                    close_positions(day, tickers, fill_prices[tickers], close_times[day], order_type)
+
+    if not fills['day']:
+        print("Vector backtest produced no fills")
+        return pd.DataFrame(columns=TRADE_LOG_COLUMNS)
+
+    columns = {key: np.concatenate(chunks) for key, chunks in fills.items()}
+    count = len(columns['day'])
+    trade_log = pd.DataFrame({
+        'name': name,
+        'order_id': [f"vector-{i:08d}" for i in range(count)],
+        'symbol': panel.tickers[columns['ticker']],
+        'price': columns['price'],
+        'quantity': columns['quantity'].astype(np.int64),
+        'side': columns['side'],
+        'timestamp': columns['time'],
+        'stop_loss': columns['stop_loss'],
+        'take_profit': columns['take_profit'],
+        'status': 'fill',
+        'type': columns['type'],
+        'risk_per_trade': parameters.get("risk_per_trade"),
+    }, columns=TRADE_LOG_COLUMNS)
+
+    print(f"Vector backtest produced {count} fills over {len(trading_days)} sessions, final cash ${cash:,.2f}")
+    return trade_log
+
+def write_backtest_logs(trade_log, name, parameters, logs_dir="logs"):
+    """
+    Write the trade log and settings files the results pipeline reads.
+
+    The files follow the lumibot naming scheme with the identifier already in
+    place, so get_latest_trades_files, process_data and get_backtest_info pick
+    them up like the output of a lumibot run.
+
+    Args:
+        trade_log (pd.DataFrame): Trade log, as returned by run_vector_backtest
+        name (str): Strategy name
+        parameters (dict): Strategy parameters, stored in the settings file
+        logs_dir (str): Logs directory (default: 'logs')
+
+    Returns:
+        tuple: (trades_file, settings_file) paths
+    """
+    logs_path = Path(logs_dir)
+    logs_path.mkdir(exist_ok=True)
+
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M")
+    identifier = uuid.uuid4().hex[:6]
+    prefix = logs_path / f"{name}_{timestamp}_{identifier}"
+
+    settings_file = f"{prefix}_settings.json"
+    with open(settings_file, 'w') as f:
+        json.dump({'name': name, 'engine': 'vector', 'parameters': parameters}, f, indent=2, default=str)
+
+    trades_file = f"{prefix}_custom_trades.csv"
+    trade_log.to_csv(trades_file, index=False)
+    print(f"Custom trades saved to {trades_file}")
+
+    return trades_file, settings_file
+
+def get_regime_gates(regime, dates, vix_threshold):
+    """
+    Evaluate the VIX and benchmark SMA gates of a RegimeSeries on every date.
+
+    Mirrors the checks of the screening strategies: a missing regime, VIX or
+    SMA skips the day, a VIX at or above the threshold or a benchmark below its
+    SMA flattens, and anything else allows new entries.
+
+    Args:
+        regime (RegimeSeries): Benchmark and VIX regime
+        dates (np.ndarray): Dates to evaluate, as datetime64[D]
+        vix_threshold (float): VIX level at or above which positions are closed
+
+    Returns:
+        np.ndarray: int8 array of GATE_* values, one per date
+    """
+    gates = np.full(len(dates), GATE_SKIP, dtype=np.int8)
+    for i, day in enumerate(np.asarray(dates, dtype='datetime64[D]').tolist()):
+        row = regime.get(day)
+        if row is None or np.isnan(row.vix):
+            continue
+        if row.vix >= vix_threshold:
+            gates[i] = GATE_FLATTEN
+        elif np.isnan(row.sma):
+            continue
+        else:
+            gates[i] = GATE_TRADE if row.above_sma else GATE_FLATTEN
+    return gates
@@ -0,0 +1,252 @@
+import os
+import json
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from backtests.backtest_runner import get_module_path
+from backtests.sweep_runner import run_parameter_set, load_result, prepare_shared_data
+from analytics.trade_results import (
+    calculate_nr_of_trades,
+    calculate_accuracy,
+    calculate_average_return_per_trade,
+    calculate_total_return
+)
+from utils.trading_calendar import sessions_in_range, next_session
+
+WINDOWS_FILE = "windows.json"
+
+def split_windows(start_date, end_date, n_windows, overlap=0):
+    """
+    Split a backtest range into consecutive walk-forward windows of trading sessions.
+
+    Each window scores the trades entered between its start and end. Its run
+    starts `overlap` sessions earlier so indicators and positions are warmed up,
+    and trades entered during that overlap belong to the previous window.
+
+    Args:
+        start_date (str): First trading day, in YYYY-MM-DD format
+        end_date (str): Backtest end date, not traded (as in run_strategy), in YYYY-MM-DD format
+        n_windows (int): Number of windows
+        overlap (int): Number of warm-up sessions before each window (default: 0)
+
+    Returns:
+        list: One dictionary per window with window, start, end (scored sessions)
+              and backtesting_start, backtesting_end (run range)
+    """
+    sessions = sessions_in_range(start_date, end_date)
+    sessions = sessions[sessions < np.datetime64(end_date, 'D')]
+    if len(sessions) < n_windows:
+        raise ValueError(f"Cannot split {len(sessions)} sessions into {n_windows} windows")
+
+    windows = []
+    positions = np.array_split(np.arange(len(sessions)), n_windows)
+    for window, window_positions in enumerate(positions):
+        first, last = window_positions[0], window_positions[-1]
+        is_last = window == n_windows - 1
+        windows.append({
+            'window': window,
+            'start': str(sessions[first]),
+            'end': str(sessions[last]),
+            'backtesting_start': str(sessions[max(first - overlap, 0)]),
+            'backtesting_end': end_date if is_last else str(next_session(sessions[last])),
+        })
+    return windows
+
+def stitch_windows(windows, output_dir):
+    """
+    Combine the processed trades and executions of every window.
+
+    Only trades entered inside a window's scored range are kept, so trades
+    entered during an overlap are not counted twice. Trade IDs are renumbered
+    in entry order across all windows, and each trade keeps its window and
+    original window_trade_id.
+
+    Args:
+        windows (list): Windows, as returned by split_windows
+        output_dir (Path): Directory holding one sub directory per window
+
+    Returns:
+        tuple: (executions_df, trades_df) for the whole range
+    """
+    trades_frames = []
+    executions_frames = []
+    for window in windows:
+        run_dir = Path(output_dir) / get_window_dir(window)
+        trades_file = run_dir / "trades.csv"
+        executions_file = run_dir / "executions.csv"
+        if not trades_file.exists() or not executions_file.exists():
+            print(f"Window {window['window']} has no processed results, skipping")
+            continue
+
+        trades_df = pd.read_csv(trades_file)
+        in_window = (trades_df['start_date'] >= window['start']) & (trades_df['start_date'] <= window['end'])
+        trades_df = trades_df[in_window].copy()
+        trades_df['window'] = window['window']
+        trades_frames.append(trades_df)
+
+        executions_df = pd.read_csv(executions_file)
+        executions_df['window'] = window['window']
+        executions_frames.append(executions_df)
+
+    if not trades_frames:
+        return pd.DataFrame(), pd.DataFrame()
+
+    trades_df = pd.concat(trades_frames, ignore_index=True)
+    trades_df = trades_df.rename(columns={'trade_id': 'window_trade_id'})
+    trades_df = trades_df.sort_values(['start_date', 'start_time', 'window', 'window_trade_id']).reset_index(drop=True)
+    trades_df.insert(0, 'trade_id', np.arange(1, len(trades_df) + 1))
+
+    # Executions follow their trade's new ID, executions of dropped trades are removed
+    executions_df = pd.concat(executions_frames, ignore_index=True)
+    executions_df = executions_df.rename(columns={'trade_id': 'window_trade_id'})
+    executions_df = executions_df.merge(
+        trades_df[['window', 'window_trade_id', 'trade_id']], on=['window', 'window_trade_id'], how='inner'
+    )
+    executions_df = executions_df.sort_values(['trade_id', 'execution_timestamp']).reset_index(drop=True)
+
+    return executions_df, trades_df
+
+def build_stability_report(trades_df, windows):
+    """
+    Compare the headline metrics of every window.
+
+    Args:
+        trades_df (pd.DataFrame): Stitched trades, as returned by stitch_windows
+        windows (list): Windows, as returned by split_windows
+
+    Returns:
+        pd.DataFrame: One row per window plus a 'Total' row, with the scored range,
+                      nr_trades, accuracy, avg_return_per_trade and total_return
+    """
+    report = pd.DataFrame({
+        'period': [window['window'] for window in windows],
+        'start': [window['start'] for window in windows],
+        'end': [window['end'] for window in windows],
+    })
+    report = pd.concat([report, pd.DataFrame([{'period': 'Total', 'start': windows[0]['start'], 'end': windows[-1]['end']}])],
+                       ignore_index=True)
+    if trades_df.empty:
+        return report
+
+    df = trades_df.assign(period=trades_df['window'])
+    metrics = pd.DataFrame({
+        'nr_trades': calculate_nr_of_trades(df),
+        'accuracy': calculate_accuracy(df),
+        'avg_return_per_trade': calculate_average_return_per_trade(df),
+        'total_return': calculate_total_return(df),
+    })
+    report = report.merge(metrics, left_on='period', right_index=True, how='left')
+    report['nr_trades'] = report['nr_trades'].fillna(0).astype(int)
+    return report
+
+def get_window_dir(window):
+    """Output directory name of a window"""
+    return f"window_{window['window']:02d}"
+
+def run_walk_forward(file_path, start_date, end_date, n_windows, output_dir, overlap=0,
+                     max_workers=None, base_parameters=None, resume=True):
+    """
+    Run a strategy over consecutive date windows in a process pool and stitch the results.
+
+    Args:
+        file_path (str): Path to the Python file containing the Strategy class
+        start_date (str): First trading day, in YYYY-MM-DD format
+        end_date (str): Backtest end date, in YYYY-MM-DD format
+        n_windows (int): Number of windows
+        output_dir (str): Directory holding one sub directory per window
+        overlap (int): Number of warm-up sessions before each window (default: 0)
+        max_workers (int, optional): Number of worker processes (default: CPU count)
+        base_parameters (dict, optional): Overrides applied to every window, e.g. {"data_source": "local"}
+        resume (bool): Skip windows that already completed with the same parameters (default: True)
+
+    Returns:
+        tuple: (executions_df, trades_df, stability_report)
+    """
+    module_path = get_module_path(file_path)
+    output_dir = Path(output_dir).resolve()
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    windows = split_windows(start_date, end_date, n_windows, overlap)
+    with open(output_dir / WINDOWS_FILE, 'w') as f:
+        json.dump(windows, f, indent=2)
+    print(f"Walk-forward has {len(windows)} windows with {overlap} overlap sessions")
+
+    pending = []
+    for window in windows:
+        parameters = {
+            **(base_parameters or {}),
+            'backtesting_start': window['backtesting_start'],
+            'backtesting_end': window['backtesting_end'],
+        }
+        run_dir = output_dir / get_window_dir(window)
+        previous = load_result(run_dir) if resume else None
+        if previous and previous.get('status') == 'completed' and previous.get('parameters') == parameters:
+            print(f"Skipping completed window {window['window']}")
+        else:
+            pending.append((window, parameters, run_dir))
+
+    if pending:
+        # Each window's universe is built once here, not in its worker
+        shared = prepare_shared_data(module_path, [parameters for _, parameters, _ in pending])
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(run_parameter_set, module_path, parameters, str(run_dir), shared_parameters): window
+                for (window, parameters, run_dir), shared_parameters in zip(pending, shared)
+            }
+            for future in as_completed(futures):
+                window = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"Worker for window {window['window']} crashed: {e}")
+                    continue
+                print(f"Window {window['window']} ({window['start']} to {window['end']}) finished with status {result['status']}")
+
+    executions_df, trades_df = stitch_windows(windows, output_dir)
+    report = build_stability_report(trades_df, windows)
+
+    if not trades_df.empty:
+        executions_df.to_csv(output_dir / "executions.csv", index=False)
+        trades_df.to_csv(output_dir / "trades.csv", index=False)
+        print(f"Stitched {len(trades_df)} trades from {trades_df['window'].nunique()} windows")
+    else:
+        print("No trades to stitch")
+    report.to_csv(output_dir / "stability_report.csv", index=False)
+
+    return executions_df, trades_df, report
+
+if __name__ == "__main__":
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(description='Run a walk-forward backtest for a strategy')
+    parser.add_argument('--file', type=str, default="backtests/backtests/adr_stocks.py", help='Path to strategy file')
+    parser.add_argument('--start', type=str, default=os.getenv("BACKTESTING_START"), help='First trading day (YYYY-MM-DD)')
+    parser.add_argument('--end', type=str, default=os.getenv("BACKTESTING_END"), help='Backtest end date (YYYY-MM-DD)')
+    parser.add_argument('--windows', type=int, required=True, help='Number of windows')
+    parser.add_argument('--overlap', type=int, default=0, help='Warm-up sessions before each window')
+    parser.add_argument('--output', type=str, default="walk_forward", help='Output directory for the windows')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes')
+    parser.add_argument('--data-source', type=str, default=None, help='Override the strategy data_source')
+    parser.add_argument('--no-resume', action='store_true', help='Re-run windows that already completed')
+    args = parser.parse_args()
+
+    if not args.start or not args.end:
+        parser.error("--start and --end are required when BACKTESTING_START/BACKTESTING_END are not set")
+
+    base_parameters = {'data_source': args.data_source} if args.data_source else None
+
+    executions_df, trades_df, report = run_walk_forward(
+        args.file,
+        args.start,
+        args.end,
+        args.windows,
+        args.output,
+        overlap=args.overlap,
+        max_workers=args.workers,
+        base_parameters=base_parameters,
+        resume=not args.no_resume
+    )
+
+    print("\nStability report:")
+    print(report.to_string(index=False))
@@ -0,0 +1,187 @@
+import argparse
+from datetime import date
+import numpy as np
+import pandas as pd
+from utils.db_utils import DatabaseManager
+from utils.trading_calendar import get_sessions, previous_session
+from enriching.yf_enrichment import download_and_store, get_specific_tickers
+
+db = DatabaseManager()
+
+PLAN_COLUMNS = ['ticker', 'asset_id', 'start', 'end', 'missing_sessions']
+
+def merge_gaps(asset_ids, gap_starts, gap_ends, merge_gap=0):
+    """
+    Collapse the gaps of each asset into as few ranges as possible.
+
+    Gaps of the same asset separated by at most merge_gap stored sessions are
+    merged, since one request re-fetching a few stored bars is cheaper than two.
+
+    Args:
+        asset_ids (np.ndarray): Asset of every gap
+        gap_starts (np.ndarray): First missing session index of every gap
+        gap_ends (np.ndarray): Last missing session index of every gap (inclusive)
+        merge_gap (int): Maximum number of stored sessions between merged gaps (default: 0)
+
+    Returns:
+        tuple: (asset_ids, range_starts, range_ends, missing) arrays, one entry per range,
+               where missing is the number of missing sessions inside the range
+    """
+    if len(asset_ids) == 0:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, empty, empty
+
+    order = np.lexsort((gap_starts, asset_ids))
+    asset_ids, gap_starts, gap_ends = asset_ids[order], gap_starts[order], gap_ends[order]
+
+    # A new range starts at every asset change and every stored stretch longer than merge_gap
+    new_range = np.ones(len(asset_ids), dtype=bool)
+    new_range[1:] = (asset_ids[1:] != asset_ids[:-1]) | (gap_starts[1:] - gap_ends[:-1] - 1 > merge_gap)
+    range_first = np.flatnonzero(new_range)
+
+    missing = np.add.reduceat(gap_ends - gap_starts + 1, range_first)
+    return (asset_ids[range_first], gap_starts[range_first],
+            np.maximum.reduceat(gap_ends, range_first), missing)
+
+def plan_backfill(table_name, start_date=None, end_date=None, ticker_list=None, merge_gap=5, manager=None):
+    """
+    Plan the downloads that fill every missing session in an OHLCV table.
+
+    An asset is expected to have a bar on every session from its first stored bar
+    (or start_date, if earlier) through end_date. Assets without any bars are
+    only planned when start_date is given. Assets marked inactive (active = 0,
+    delisted) are only expected to be complete up to their last stored bar.
+
+    Args:
+        table_name (str): Base table name ('stocks' or 'indexes')
+        start_date (str, optional): First session every asset should have (YYYY-MM-DD)
+        end_date (str, optional): Last session every asset should have (YYYY-MM-DD),
+                                  default the last completed session
+        ticker_list (list, optional): Only plan these tickers (default: all in the table)
+        merge_gap (int): Merge gaps separated by at most this many stored sessions (default: 5)
+        manager (DatabaseManager, optional): Database to use (default: the module's db)
+
+    Returns:
+        pd.DataFrame: One row per download with ticker, asset_id, start, end (exclusive,
+                      as download_data expects) and missing_sessions
+    """
+    manager = manager or db
+    assets_df = manager.get_table_data(table_name)
+    if ticker_list is not None:
+        assets_df = assets_df[assets_df['ticker'].isin(get_specific_tickers(assets_df, ticker_list))]
+
+    sessions = get_sessions()
+    end_date = end_date or previous_session(date.today())
+    end_idx = np.searchsorted(sessions, np.datetime64(end_date, 'D'), side='right') - 1
+    start_idx = np.searchsorted(sessions, np.datetime64(start_date, 'D')) if start_date else None
+
+    gaps_df, bounds_df = manager.get_ohlcv_session_gaps(
+        table_name, sessions, asset_ids=None if ticker_list is None else assets_df['id'].tolist()
+    )
+    asset_ids = [gaps_df['asset_id'].to_numpy(np.int64)]
+    gap_starts = [gaps_df['gap_start'].to_numpy(np.int64)]
+    gap_ends = [gaps_df['gap_end'].to_numpy(np.int64)]
+
+    # Delisted assets have no bars to download after their last stored one
+    inactive_ids = np.array([], dtype=np.int64)
+    if 'active' in assets_df.columns:
+        active = pd.to_numeric(assets_df['active'], errors='coerce')
+        inactive_ids = assets_df.loc[active == 0, 'id'].to_numpy(np.int64)
+
+    # Missing sessions after the last stored bar
+    first_idx = bounds_df['first_idx'].to_numpy(np.int64)
+    last_idx = bounds_df['last_idx'].to_numpy(np.int64)
+    bounded_ids = bounds_df['asset_id'].to_numpy(np.int64)
+    tail = (last_idx < end_idx) & ~np.isin(bounded_ids, inactive_ids)
+    asset_ids.append(bounded_ids[tail])
+    gap_starts.append(last_idx[tail] + 1)
+    gap_ends.append(np.full(tail.sum(), end_idx, dtype=np.int64))
+
+    if start_idx is not None:
+        # Missing sessions before the first stored bar
+        head = first_idx > start_idx
+        asset_ids.append(bounded_ids[head])
+        gap_starts.append(np.full(head.sum(), start_idx, dtype=np.int64))
+        gap_ends.append(np.minimum(first_idx[head] - 1, end_idx))
+
+        # Listed assets without any bars
+        empty_ids = np.setdiff1d(assets_df['id'].to_numpy(np.int64), np.union1d(bounded_ids, inactive_ids))
+        asset_ids.append(empty_ids)
+        gap_starts.append(np.full(len(empty_ids), start_idx, dtype=np.int64))
+        gap_ends.append(np.full(len(empty_ids), end_idx, dtype=np.int64))
+
+    asset_ids, gap_starts, gap_ends = (np.concatenate(parts) for parts in (asset_ids, gap_starts, gap_ends))
+    # Gaps entirely after end_date or before start_date are not requested
+    in_range = gap_starts <= end_idx
+    if start_idx is not None:
+        in_range &= gap_ends >= start_idx
+        gap_starts = np.maximum(gap_starts, start_idx)
+    gap_ends = np.minimum(gap_ends, end_idx)
+    range_ids, range_starts, range_ends, missing = merge_gaps(
+        asset_ids[in_range], gap_starts[in_range], gap_ends[in_range], merge_gap
+    )
+
+    id_to_ticker = dict(zip(assets_df['id'], assets_df['ticker']))
+    plan = pd.DataFrame({
+        'ticker': [id_to_ticker.get(asset_id) for asset_id in range_ids],
+        'asset_id': range_ids,
+        'start': np.datetime_as_string(sessions[range_starts]),
+        # download_data end dates are exclusive
+        'end': np.datetime_as_string(sessions[range_ends] + 1),
+        'missing_sessions': missing,
+    }, columns=PLAN_COLUMNS)
+    return plan.dropna(subset=['ticker']).reset_index(drop=True)
+
+def run_backfill(table_name, start_date=None, end_date=None, ticker_list=None, merge_gap=5, dry_run=False,
+                 manager=None, **download_kwargs):
+    """
+    Plan the missing sessions of an OHLCV table and download only those ranges.
+
+    Args:
+        table_name (str): Base table name ('stocks' or 'indexes')
+        start_date, end_date, ticker_list, merge_gap: As in plan_backfill
+        dry_run (bool): Only print the plan (default: False)
+        manager (DatabaseManager, optional): Database to use (default: the module's db)
+        **download_kwargs: Passed to download_and_store, e.g. max_workers, rate or downloader
+
+    Returns:
+        tuple: (plan DataFrame, download_and_store result or None for a dry run)
+    """
+    manager = manager or db
+    manager.ensure_ohlcv_unique_index(table_name)
+    plan = plan_backfill(table_name, start_date, end_date, ticker_list, merge_gap, manager)
+    print(f"Backfill plan: {len(plan)} ranges for {plan['ticker'].nunique()} tickers, "
+          f"{int(plan['missing_sessions'].sum())} missing sessions")
+
+    if dry_run or plan.empty:
+        return plan, None
+
+    assets_df = manager.get_table_data(table_name)
+    batches = [([row.ticker], {'start': row.start, 'end': row.end}) for row in plan.itertuples(index=False)]
+    result = download_and_store(table_name, assets_df, batches, manager=manager, **download_kwargs)
+    return plan, result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Download only the sessions missing from an OHLCV table')
+    parser.add_argument('--table', type=str, default='stocks', help="Base table name ('stocks' or 'indexes')")
+    parser.add_argument('--start', type=str, default=None, help='First session every asset should have (YYYY-MM-DD)')
+    parser.add_argument('--end', type=str, default=None, help='Last session every asset should have (YYYY-MM-DD)')
+    parser.add_argument('--tickers', type=str, nargs='*', default=None, help='Only backfill these tickers')
+    parser.add_argument('--merge-gap', type=int, default=5, help='Merge gaps separated by at most this many sessions')
+    parser.add_argument('--workers', type=int, default=8, help='Number of download threads')
+    parser.add_argument('--rate', type=float, default=2.0, help='Requests per second')
+    parser.add_argument('--dry-run', action='store_true', help='Only print the plan')
+    args = parser.parse_args()
+
+    plan, result = run_backfill(
+        args.table,
+        start_date=args.start,
+        end_date=args.end,
+        ticker_list=args.tickers,
+        merge_gap=args.merge_gap,
+        dry_run=args.dry_run,
+        max_workers=args.workers,
+        rate=args.rate
+    )
+    if args.dry_run:
+        print(plan.to_string(index=False))
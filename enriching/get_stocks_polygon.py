@@ -1,57 +1,380 @@
 import requests
 import os
+import json
+import hashlib
+import queue
+import argparse
+import threading
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 from utils.db_utils import DatabaseManager
+from enriching.journal import JobJournal
 
-def get_polygon_tickers_data(**kwargs):
+POLYGON_TICKERS_URL = "https://api.polygon.io/v3/reference/tickers"
+
+# Fields whose change rewrites a stored ticker, last_updated_utc alone does not
+REFERENCE_FIELDS = [
+    'ticker', 'name', 'market', 'locale', 'primary_exchange', 'type', 'active',
+    'currency_name', 'cik', 'composite_figi', 'share_class_figi'
+]
+
+def create_session(retries=5, backoff=1.0):
+    """
+    Create an HTTP session that keeps its connection alive between pages.
+
+    Throttled (429) and server error responses are retried with exponential
+    backoff, honouring the Retry-After header when the API sends one.
+
+    Args:
+        retries (int): Maximum retries per request (default: 5)
+        backoff (float): Backoff factor in seconds, doubled on every retry (default: 1.0)
+
+    Returns:
+        requests.Session: Session with the retry policy mounted
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['GET']),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    session = requests.Session()
+    adapter = HTTPAdapter(max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def iter_polygon_ticker_pages(base_url=POLYGON_TICKERS_URL, api_key=None, session=None, start_url=None,
+                              timeout=30, **kwargs):
+    """
+    Page through the Polygon tickers endpoint, one request per page.
+
+    Args:
+        base_url (str): Tickers endpoint, e.g. a local stand-in for tests (default: Polygon's)
+        api_key (str, optional): Polygon API key (default: POLYGON_API_KEY from the environment)
+        session (requests.Session, optional): Session to reuse (default: a new create_session())
+        start_url (str, optional): next_url cursor to continue from instead of the first page
+        timeout (float): Seconds to wait for each response (default: 30)
+        **kwargs: Optional query parameters for the Polygon API
+                 e.g., market='stocks', type='CS'
+
+    Yields:
+        tuple: (results, next_url, retries) for every page, where results is the
+               page's list of dictionaries and next_url is None on the last page
+    """
+    if api_key is None:
+        load_dotenv()
+        api_key = os.getenv("POLYGON_API_KEY")
+    session = session or create_session()
+
+    if start_url:
+        url, params = start_url, {"apiKey": api_key}
+    else:
+        url, params = base_url, {"apiKey": api_key, "limit": 1000, **kwargs}
+
+    while url:
+        response = session.get(url, params=params, timeout=timeout)
+        response.raise_for_status()
+        retry_state = getattr(response.raw, 'retries', None)
+        retries = len(retry_state.history) if retry_state is not None else 0
+        data = response.json()
+        url = data.get("next_url")
+        # next_url already carries the filters and cursor, only the key is added
+        params = {"apiKey": api_key}
+        yield data.get("results", []), url, retries
+
+def get_ticker_ranges(partitions, boundaries=None):
+    """
+    Split the ticker space into disjoint ranges.
+
+    Args:
+        partitions (int): Number of ranges, used when no boundaries are given
+        boundaries (list, optional): Tickers where a new range starts, e.g. ['F', 'M', 'S']
+                                     (default: two-letter prefixes spread evenly over A-Z)
+
+    Returns:
+        list: (gte, lt) pairs in ticker order, where None leaves that side open
+    """
+    if boundaries is None:
+        prefixes = 26 * 26
+        boundaries = []
+        for k in range(1, partitions):
+            idx = k * prefixes // partitions
+            boundaries.append(chr(ord('A') + idx // 26) + chr(ord('A') + idx % 26))
+    bounds = [None, *sorted(set(boundaries)), None]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def _fetch_ticker_range(base_url, api_key, ticker_range, **kwargs):
+    """Walk every page of one ticker range on its own session"""
+    gte, lt = ticker_range
+    range_params = {}
+    if gte is not None:
+        range_params["ticker.gte"] = gte
+    if lt is not None:
+        range_params["ticker.lt"] = lt
+
+    results = []
+    pages = 0
+    with create_session() as session:
+        for page_results, _, _ in iter_polygon_ticker_pages(base_url, api_key, session=session, **range_params, **kwargs):
+            results.extend(page_results)
+            pages += 1
+    print(f"Fetched {len(results)} results in {pages} pages for tickers {gte or ''}..{lt or ''}")
+    return results
+
+def get_polygon_tickers_data(base_url=POLYGON_TICKERS_URL, partitions=1, boundaries=None, max_workers=None, **kwargs):
     """
     Get stock data from Polygon API with optional filters.
-    
+
+    Pages of one request have to be fetched one after the other through next_url.
+    With partitions, the request is split into disjoint ticker ranges
+    (ticker.gte/ticker.lt) whose pages are walked concurrently. The ranges are
+    merged in ticker order, so with sort='ticker' the result is the same list a
+    single request returns and clean_up_data keeps the same records.
+
+    Collects every page in memory, use ingest_polygon_tickers to write pages
+    to the database as they arrive.
+
     Args:
+        base_url (str): Tickers endpoint (default: Polygon's)
+        partitions (int): Number of ticker ranges fetched concurrently (default: 1)
+        boundaries (list, optional): Tickers where a new range starts, as in get_ticker_ranges
+        max_workers (int, optional): Concurrent ranges (default: one thread per range)
         **kwargs: Optional query parameters for the Polygon API
                  e.g., market_cap_gt=1000000000, sector='Technology'
 
     Returns:
         list: A list of dictionaries containing stock data
     """
-    load_dotenv()
-    polygon_api_key = os.getenv("POLYGON_API_KEY")
-    
-    
-    url = "https://api.polygon.io/v3/reference/tickers"
-    params = {
-        "apiKey": polygon_api_key,
-        "limit": 1000  # Maximum per page
-    }
-    
-    # Add any additional parameters passed to the function
-    params.update(kwargs)
+    ranges = get_ticker_ranges(partitions, boundaries)
+    if len(ranges) == 1:
+        all_results = []
+        for results, _, _ in iter_polygon_ticker_pages(base_url, **kwargs):
+            all_results.extend(results)
+        return all_results
+
+    if any(key.startswith("ticker") for key in kwargs):
+        raise ValueError("ticker filters cannot be combined with partitions")
+
+    api_key = kwargs.pop("api_key", None)
+    if api_key is None:
+        load_dotenv()
+        api_key = os.getenv("POLYGON_API_KEY")
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(ranges)) as executor:
+        futures = [
+            executor.submit(_fetch_ticker_range, base_url, api_key, ticker_range, **kwargs)
+            for ticker_range in ranges
+        ]
+        # Merge in range order, not completion order
+        range_results = [future.result() for future in futures]
+
+    all_results = [result for results in range_results for result in results]
+    print(f"Fetched {len(all_results)} results from {len(ranges)} ticker ranges")
+    return all_results
+
+def _prefetch_pages(pages, page_queue, stop):
+    """Fetch pages into a bounded queue so the next request overlaps the current insert"""
+    def put(item):
+        # Give up once the consumer stopped, instead of blocking on a full queue
+        while not stop.is_set():
+            try:
+                page_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        for page in pages:
+            if not put(('page', page)):
+                return
+        put(('done', None))
+    except Exception as e:
+        put(('error', e))
+
+def add_reference_hash(data_source, fields=REFERENCE_FIELDS, hash_column='ref_hash'):
+    """
+    Hash the reference fields of every row, to detect changed rows without comparing columns.
+
+    Args:
+        data_source (pandas.DataFrame): Cleaned ticker records
+        fields (list): Fields that make a row changed, missing ones hash as null
+                       (default: REFERENCE_FIELDS, leaving out e.g. last_updated_utc)
+        hash_column (str): Column to add (default: 'ref_hash')
+
+    Returns:
+        pandas.DataFrame: Copy of data_source with the hash column
+    """
+    values = data_source.reindex(columns=fields).astype(object)
+    values = values.where(values.notna(), None)
+    hashes = [
+        hashlib.sha1(json.dumps(row, default=str).encode()).hexdigest()
+        for row in values.itertuples(index=False, name=None)
+    ]
+    return data_source.assign(**{hash_column: hashes})
+
+def print_sync_summary(table_name, summary, sample=10):
+    """Print the counts of a reference sync with a sample of the affected tickers"""
+    print(f"{table_name} sync: {len(summary['inserted'])} inserted, {len(summary['changed'])} changed, "
+          f"{len(summary['delisted'])} delisted, {summary['unchanged']} unchanged")
+    for kind in ('inserted', 'changed', 'delisted'):
+        tickers = summary[kind]
+        if tickers:
+            print(f"  {kind.capitalize()} (first {sample}): {', '.join(tickers[:sample])}"
+                  + ("..." if len(tickers) > sample else ""))
+
+def sync_polygon_tickers(table_name='stocks', base_url=POLYGON_TICKERS_URL, partitions=4, delist_missing=True,
+                         manager=None, **kwargs):
+    """
+    Refresh a reference table from the Polygon ticker list, writing only what changed.
+
+    The list is fetched (in concurrent ticker ranges), cleaned and hashed, then
+    compared against the stored hashes in one query. New tickers are inserted,
+    changed ones updated in place and, with delist_missing, stored tickers that
+    are no longer listed are marked inactive, all in one transaction.
+
+    Args:
+        table_name (str): Reference table (default: 'stocks')
+        base_url (str): Tickers endpoint (default: Polygon's)
+        partitions (int): Ticker ranges fetched concurrently (default: 4)
+        delist_missing (bool): Mark stored tickers missing from the list inactive, only
+                               correct when kwargs select everything the table holds (default: True)
+        manager (DatabaseManager, optional): Database to use (default: a new DatabaseManager)
+        **kwargs: Optional query parameters for the Polygon API
+
+    Returns:
+        dict: inserted, changed and delisted tickers (lists) and the unchanged count
+    """
+    manager = manager or DatabaseManager()
+    data = get_polygon_tickers_data(base_url, partitions=partitions, **kwargs)
+    if not data:
+        raise ValueError("Polygon returned no tickers, not syncing")
+
+    polygon_data = add_reference_hash(clean_up_data(pd.DataFrame(data)))
+    summary = manager.sync_reference_rows(table_name, polygon_data, delist_missing=delist_missing)
+    print_sync_summary(table_name, summary)
+    return summary
+
+def ingest_polygon_tickers(table_name='stocks', base_url=POLYGON_TICKERS_URL, resume=False, prefetch=2,
+                           delist_missing=True, manager=None, **kwargs):
+    """
+    Stream the Polygon ticker list into a table, cleaning and syncing page by page.
+
+    A background thread fetches the next pages while the current one is cleaned
+    and written, and at most prefetch pages are held in memory. Tickers already
+    kept from an earlier page are dropped, so duplicates across pages are
+    removed just like duplicates within one. Each page only writes its new and
+    changed tickers (see sync_polygon_tickers), and once the last page is
+    written, stored tickers that were not listed are marked inactive.
 
-    all_results = []
+    Every written page is recorded in the job journal with its tickers and the
+    cursor to the next page. With resume, an interrupted ingestion with the same
+    filters continues after its last written page.
+
+    Args:
+        table_name (str): Table to write to (default: 'stocks')
+        base_url (str): Tickers endpoint, e.g. a local stand-in for tests (default: Polygon's)
+        resume (bool): Continue an interrupted ingestion with the same filters (default: False)
+        prefetch (int): Pages fetched ahead of the write (default: 2)
+        delist_missing (bool): Mark stored tickers missing from the list inactive (default: True)
+        manager (DatabaseManager, optional): Database to use (default: a new DatabaseManager)
+        **kwargs: Optional query parameters for the Polygon API
+
+    Returns:
+        dict: pages, fetched, the sync summary (inserted, changed, delisted, unchanged)
+              and the journal's throughput metrics
+    """
+    manager = manager or DatabaseManager()
+    seen_tickers = set()
+    start_url = None
     page = 1
+    fetched = 0
+    summary = {'inserted': [], 'changed': [], 'delisted': [], 'unchanged': 0}
 
-    while url:
-        print(f"Fetching page {page}...")
-        # For subsequent pages, include API key in URL
-        if page > 1:
-            url = f"{url}&apiKey={polygon_api_key}"
-            
-        response = requests.get(url, params=params if page == 1 else None)
-        data = response.json()
-        results = data.get("results", [])
-        all_results.extend(results)
-        url = data.get("next_url")
+    # The API key is left out so it is not stored in the journal
+    journal = JobJournal('polygon_tickers', {'url': base_url, 'table': table_name, **kwargs}, resume=resume,
+                         manager=manager)
+    for completed in journal.get_completed().itertuples(index=False):
+        payload = json.loads(completed.payload)
+        seen_tickers.update(payload['tickers'])
+        start_url = payload['next_url']
         page += 1
+    if page > 1:
+        print(f"Skipping {page - 1} written pages ({len(seen_tickers)} tickers)")
 
-    return all_results
+    first_page = page
+    if page == 1 or start_url is not None:
+        session = create_session()
+        page_queue = queue.Queue(maxsize=prefetch)
+        stop = threading.Event()
+        fetcher = threading.Thread(
+            target=_prefetch_pages,
+            args=(iter_polygon_ticker_pages(base_url, session=session, start_url=start_url, **kwargs), page_queue, stop),
+            daemon=True
+        )
+        fetcher.start()
+
+        try:
+            while True:
+                kind, item = page_queue.get()
+                if kind == 'error':
+                    raise item
+                if kind == 'done':
+                    break
+
+                results, next_url, retries = item
+                print(f"Processing page {page} ({len(results)} results)...")
+                fetched += len(results)
+                tickers = []
+                written = 0
+                if results:
+                    page_df = clean_up_data(pd.DataFrame(results), seen_tickers)
+                    if not page_df.empty:
+                        page_summary = manager.sync_reference_rows(table_name, add_reference_hash(page_df),
+                                                                   delist_missing=False)
+                        for change in ('inserted', 'changed'):
+                            summary[change].extend(page_summary[change])
+                        summary['unchanged'] += page_summary['unchanged']
+                        written = len(page_summary['inserted']) + len(page_summary['changed'])
+                        tickers = page_df['ticker'].tolist()
+                        seen_tickers.update(tickers)
 
-def clean_up_data(data_source):
+                journal.complete([f"page_{page}"], rows=[written], retries=[retries],
+                                 payloads=[{'next_url': next_url, 'tickers': tickers}])
+                page += 1
+        except KeyboardInterrupt:
+            stop.set()
+            journal.finish('interrupted')
+            raise
+        except Exception as e:
+            stop.set()
+            journal.fail([f"page_{page}"], e)
+            journal.finish()
+            raise
+        finally:
+            session.close()
+
+    if delist_missing and seen_tickers:
+        summary['delisted'] = manager.delist_reference_rows(table_name, seen_tickers)
+
+    metrics = journal.finish()
+    print_sync_summary(table_name, summary)
+    return {'pages': page - first_page, 'fetched': fetched, **summary, **metrics}
+
+def clean_up_data(data_source, seen_tickers=None):
     """
     Clean up the data source by removing records with null CIKs and duplicate tickers.
     
     Args:
         data_source (pandas.DataFrame): DataFrame containing stock data from Polygon API
+        seen_tickers (set, optional): Tickers kept from earlier pages, their records are
+                                      removed as duplicates too
         
     Returns:
         pandas.DataFrame: Cleaned DataFrame with no null CIKs and no duplicate tickers
@@ -62,6 +385,10 @@ def clean_up_data(data_source):
     
     original_count = len(data_source)
     print(f"Original record count: {original_count}")
+    if original_count == 0:
+        return data_source
+    if 'cik' not in data_source.columns:
+        data_source = data_source.assign(cik=None)
     
     # Check for null or empty CIKs
     null_cik_mask = data_source['cik'].isna()
@@ -86,6 +413,14 @@ def clean_up_data(data_source):
         # Remove all rows with invalid CIKs
         data_source = data_source[~invalid_cik_mask]
     
+    # Remove tickers already kept from earlier pages
+    if seen_tickers:
+        seen_mask = data_source['ticker'].isin(seen_tickers)
+        seen_count = seen_mask.sum()
+        if seen_count > 0:
+            print(f"Removing {seen_count} records of tickers seen on earlier pages")
+            data_source = data_source[~seen_mask]
+
     # Check for and remove duplicate tickers
     duplicate_mask = data_source.duplicated(subset=['ticker'], keep='first')
     duplicate_count = duplicate_mask.sum()
@@ -115,11 +450,14 @@ def clean_up_data(data_source):
     return data_source
 
 if __name__ == "__main__":
-    db = DatabaseManager()
+    parser = argparse.ArgumentParser(description='Sync the stock list from Polygon into the stocks table')
+    parser.add_argument('--partitions', type=int, default=4, help='Ticker ranges fetched concurrently (default: 4)')
+    parser.add_argument('--stream', action='store_true', help='Write page by page with a resumable journal instead')
+    parser.add_argument('--resume', action='store_true', help='With --stream, continue after the last written page')
+    parser.add_argument('--base-url', type=str, default=POLYGON_TICKERS_URL, help='Tickers endpoint, e.g. a local stand-in')
+    args = parser.parse_args()
 
-    # Load environment variables from .env file
-    load_dotenv()
-    polygon_api_key = os.getenv("POLYGON_API_KEY")
+    db = DatabaseManager()
 
     base_params = {
         "market": "stocks", 
@@ -129,38 +467,10 @@ if __name__ == "__main__":
         "order": "asc"
     }
 
-    # Initialize polygon_data as empty DataFrame
-    polygon_data = pd.DataFrame()
-
-    # Get data from Polygon API
-    try:
-        data = get_polygon_tickers_data(**base_params)
-        if data and len(data) > 0:
-            # Print total count
-            print(f"Total stocks: {len(data)}")
-            
-            # Print data structure of first stock for debugging
-            print("\nData structure of first stock:")
-            first_stock = data[0]
-            for key, value in first_stock.items():
-                print(f"  {key}: {value}")
-            
-            # Print first 10 stocks with available fields
-            print("\nFirst 10 stocks:")
-            for i, stock in enumerate(data[:10]):
-                print(f"{i+1}. {stock['ticker']} | {stock['name']} | {stock['market']} | {stock['type']} | {stock['currency_name']} | Active: {stock['active']}")
-
-            # Convert to DataFrame
-            polygon_data = pd.DataFrame(data)
-            polygon_data = clean_up_data(polygon_data)
-    
-    except Exception as e:
-        print(f"Error getting data from Polygon API: {e}")
-    
     try:
-        # Insert in db
-        if not polygon_data.empty:
-            inserted = db.insert_dataframe(polygon_data, "stocks")
-            
+        if args.stream or args.resume:
+            ingest_polygon_tickers("stocks", base_url=args.base_url, resume=args.resume, manager=db, **base_params)
+        else:
+            sync_polygon_tickers("stocks", base_url=args.base_url, partitions=args.partitions, manager=db, **base_params)
     except Exception as e:
-        raise ValueError(f"Error updating stock history: {e}")
\ No newline at end of file
+        raise ValueError(f"Error updating stock history: {e}")
@@ -0,0 +1,153 @@
+import json
+import hashlib
+import time
+from utils.db_utils import DatabaseManager
+
+db = DatabaseManager()
+
+class JobJournal:
+    """
+    Checkpoint journal of an ingestion job, stored in the ingestion_jobs tables.
+
+    A job is identified by its type and parameters, so running the same
+    ingestion again finds the earlier, unfinished job. Every unit of work
+    (a ticker, a page) is recorded once its result is committed, and a resumed
+    job skips the units that already completed.
+    """
+
+    def __init__(self, job_type, parameters, resume=True, manager=None):
+        """
+        Open the job, creating it or, without resume, starting it over
+
+        Args:
+            job_type (str): Kind of job, e.g. 'yf_ohlcv' or 'polygon_tickers'
+            parameters (dict): Parameters that identify the job
+            resume (bool): Continue an unfinished job with the same parameters (default: True)
+            manager (DatabaseManager, optional): Database to use (default: the module's db)
+        """
+        self.manager = manager or db
+        self.job_type = job_type
+        self.parameters = json.dumps(parameters, sort_keys=True, default=str)
+        self.job_id = self.get_job_id(job_type, self.parameters)
+
+        self.manager.ensure_job_tables()
+        previous = self.manager.get_job(self.job_id)
+        self.resumed = resume and previous is not None and previous['status'] != 'completed'
+        self.manager.save_job(self.job_id, job_type, self.parameters, 'running', reset=not self.resumed)
+        if self.resumed:
+            print(f"Resuming {job_type} job {self.job_id} ({previous['status']})")
+        else:
+            print(f"Starting {job_type} job {self.job_id}")
+
+        self.started = time.perf_counter()
+        self.units_done = 0
+        self.units_failed = 0
+        self.rows = 0
+        self.retries = 0
+
+    @staticmethod
+    def get_job_id(job_type, parameters):
+        """Deterministic job ID from the job type and its JSON parameters"""
+        return hashlib.sha1(f"{job_type}:{parameters}".encode()).hexdigest()[:16]
+
+    def get_completed(self):
+        """
+        Get the completed units, in the order they completed
+
+        Returns:
+            pd.DataFrame: unit, seq, status, rows, retries, error, payload, updated_at
+        """
+        return self.manager.get_job_units(self.job_id, status='completed')
+
+    def get_pending(self, units):
+        """
+        Filter units down to the ones that did not complete yet
+
+        Args:
+            units (list): Units of the job, e.g. tickers
+
+        Returns:
+            list: Units without a completed record, in the given order
+        """
+        completed = set(self.get_completed()['unit'])
+        pending = [unit for unit in units if str(unit) not in completed]
+        if completed:
+            print(f"Skipping {len(units) - len(pending)} completed units, {len(pending)} remaining")
+        return pending
+
+    def complete(self, units, rows=None, retries=None, payloads=None):
+        """
+        Record units whose results are committed
+
+        Args:
+            units (list): Completed units
+            rows (list, optional): Rows written per unit
+            retries (list, optional): Retries needed per unit
+            payloads (list, optional): Resume data per unit, e.g. a page cursor (stored as JSON)
+        """
+        if not units:
+            return
+        rows = rows or [0] * len(units)
+        retries = retries or [0] * len(units)
+        payloads = payloads or [None] * len(units)
+        self.manager.record_job_units(self.job_id, [
+            (str(unit), 'completed', int(unit_rows), int(unit_retries), None,
+             None if payload is None else json.dumps(payload, default=str))
+            for unit, unit_rows, unit_retries, payload in zip(units, rows, retries, payloads)
+        ])
+        self.units_done += len(units)
+        self.rows += int(sum(rows))
+        self.retries += int(sum(retries))
+
+    def fail(self, units, error, retries=0):
+        """
+        Record units that failed, they are retried when the job is resumed
+
+        Args:
+            units (list): Failed units
+            error (str or Exception): Error message
+            retries (int): Retries spent on them
+        """
+        if not units:
+            return
+        self.manager.record_job_units(self.job_id, [
+            (str(unit), 'failed', 0, retries, str(error), None) for unit in units
+        ])
+        self.units_failed += len(units)
+        self.retries += retries
+
+    def finish(self, status=None):
+        """
+        Close the job and print its throughput
+
+        Args:
+            status (str, optional): Final status (default: 'completed', or 'failed' if units failed)
+
+        Returns:
+            dict: Throughput metrics, as returned by metrics
+        """
+        status = status or ('failed' if self.units_failed else 'completed')
+        self.manager.save_job(self.job_id, self.job_type, self.parameters, status)
+        metrics = self.metrics()
+        print(f"Job {self.job_id} {status}: {metrics['units']} units ({metrics['units_per_min']:.1f}/min), "
+              f"{metrics['rows']} rows ({metrics['rows_per_sec']:.0f}/s), {metrics['retries']} retries, "
+              f"{metrics['failed']} failed")
+        return metrics
+
+    def metrics(self):
+        """
+        Throughput of this run of the job
+
+        Returns:
+            dict: units, failed, rows, retries, seconds, units_per_min, rows_per_sec
+        """
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        return {
+            'units': self.units_done,
+            'failed': self.units_failed,
+            'rows': self.rows,
+            'retries': self.retries,
+            'seconds': elapsed,
+            'units_per_min': self.units_done / elapsed * 60,
+            'rows_per_sec': self.rows / elapsed,
+        }
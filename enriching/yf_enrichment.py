@@ -1,5 +1,11 @@
 from api.yf import download_data
+from api.rate_limit import TokenBucket, call_with_retry
 from utils.db_utils import DatabaseManager
+from utils.asset_index import AssetIndex
+from enriching.journal import JobJournal
+from utils.trading_calendar import next_session, previous_session
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date
 import pandas as pd
 import time
 
@@ -11,7 +17,8 @@ def map_dataframe_to_ohlcv_table(df, matching_df):
     
     Args:
         df: DataFrame with OHLCV data
-        matching_df: DataFrame with asset information to get asset_id
+        matching_df: AssetIndex, or DataFrame with asset information, to get asset_id.
+                     Pass an AssetIndex when mapping many frames so it is built once.
         
     Returns:
         DataFrame with columns matching ohlcv table
@@ -19,30 +26,14 @@ def map_dataframe_to_ohlcv_table(df, matching_df):
     if df.empty:
         print("Input DataFrame is empty, cannot map to OHLCV table")
         return pd.DataFrame()
-        
-    # Create a new DataFrame with only the columns needed for stocks_ohlcv
-    ohlcv_df = pd.DataFrame()
-    
-    # Map date column
-    ohlcv_df['datetime'] = df['date']
-    
-    # Map price and volume columns
-    ohlcv_df['open'] = df['open']
-    ohlcv_df['high'] = df['high']
-    ohlcv_df['low'] = df['low']
-    ohlcv_df['close'] = df['close']
-    ohlcv_df['volume'] = df['volume']
     
-    # We need to map ticker to asset_id using the matching table
-    # Create a dictionary mapping ticker to asset_id
-    ticker_to_id = dict(zip(matching_df['ticker'], matching_df['id']))
-    
-    ohlcv_df['asset_id'] = df['ticker'].map(ticker_to_id)
-
-    ohlcv_df = ohlcv_df.dropna(subset=['asset_id'])
+    asset_index = matching_df if isinstance(matching_df, AssetIndex) else AssetIndex(matching_df)
+    asset_ids = asset_index.map(df['ticker'])
+    known = asset_ids >= 0
     
-    # Convert asset_id to integer
-    ohlcv_df['asset_id'] = ohlcv_df['asset_id'].astype(int)
+    # Keep only the columns needed for stocks_ohlcv, rows of unknown tickers are dropped
+    ohlcv_df = df.loc[known, ['date', 'open', 'high', 'low', 'close', 'volume']].rename(columns={'date': 'datetime'})
+    ohlcv_df['asset_id'] = asset_ids[known]
     
     return ohlcv_df
 
@@ -62,15 +53,128 @@ def get_specific_tickers(assets_df, ticker_list):
         print(f"Error getting specific tickers: {e}")
         return []
 
-def process_stock_data(table_name, timeframe, ticker_list=None):
+def write_ohlcv_batch(frames, table_name, manager=None):
+    """
+    Upsert the buffered rows of many tickers in one transaction
+    
+    Args:
+        frames (list): DataFrames mapped by map_dataframe_to_ohlcv_table
+        table_name (str): Base table name ('stocks' or 'indexes')
+        manager (DatabaseManager, optional): Database to write to (default: the module's db)
+        
+    Returns:
+        int: Number of rows inserted or changed, unchanged bars are not rewritten
+    """
+    if not frames:
+        return 0
+    batch_df = pd.concat(frames, ignore_index=True)
+    return (manager or db).upsert_ohlcv(table_name, batch_df)
+
+def get_last_completed_session(today=None):
+    """
+    Get the last session whose bar is final
+    
+    Today's bar can still be forming, and a partial bar stored now would never be
+    replaced by the incremental sync, so only sessions before today count.
+    
+    Args:
+        today (date, optional): Current date (default: date.today())
+        
+    Returns:
+        datetime.date: Last completed session
+    """
+    return previous_session(today or date.today())
+
+def get_download_range(last_date, today=None):
+    """
+    Get the download arguments that fetch only the completed bars after the last stored one
+    
+    Args:
+        last_date (str): Date of the last stored bar (YYYY-MM-DD), None if there are none
+        today (date, optional): Current date (default: date.today())
+        
+    Returns:
+        dict: Keyword arguments for download_data ({} downloads the default period),
+              or None if the ticker is already up to date
+    """
+    if last_date is None:
+        return {}
+    
+    last_completed = get_last_completed_session(today)
+    start = next_session(last_date)
+    if start > last_completed:
+        return None
+    # The end date is exclusive, so the range stops at the last completed session
+    return {'start': start.strftime('%Y-%m-%d'), 'end': next_session(last_completed).strftime('%Y-%m-%d')}
+
+def get_download_batches(downloads, batch_size=1):
+    """
+    Group tickers that share a download range into batches
+    
+    Args:
+        downloads (dict): Ticker to download_data keyword arguments, as from get_download_range
+        batch_size (int): Maximum number of tickers per batch (default: 1)
+        
+    Returns:
+        list: (tickers, download_range) tuples
+    """
+    groups = {}
+    for ticker, download_range in downloads.items():
+        groups.setdefault(tuple(sorted(download_range.items())), []).append(ticker)
+    
+    batches = []
+    for download_range, tickers in groups.items():
+        for i in range(0, len(tickers), batch_size):
+            batches.append((tickers[i:i + batch_size], dict(download_range)))
+    return batches
+
+def process_stock_data(table_name, timeframe, ticker_list=None, incremental=False, batch_size=1, max_workers=8,
+                       rate=2.0, burst=4, retries=4, backoff=1.0, batch_rows=50000, downloader=download_data,
+                       manager=None, resume=False):
     """
     Process stock data for a list of tickers and insert into database
     
+    Tickers are downloaded by a thread pool. All threads share one token bucket,
+    so the provider sees at most `rate` requests per second (bursts of `burst`),
+    and failed downloads are retried with exponential backoff. Only this thread
+    writes to the database, in batches of about `batch_rows` rows across tickers.
+    
+    Rows are upserted on (asset_id, datetime), so re-downloaded bars replace the
+    stored ones instead of adding duplicates, and bars that did not change are
+    not rewritten. The ticker to asset_id index is built once per run and shared
+    by the download threads, which map their own rows. Only completed sessions
+    are stored (see get_last_completed_session), so a bar still forming today is
+    never written. In incremental mode each ticker is
+    only downloaded from the session after its last stored bar, and tickers that
+    are up to date are not requested at all. A full refresh still re-downloads
+    the whole period, which picks up split and dividend adjustments.
+    
     Args:
         table_name (str): Base table name ('stocks' or 'indexes')
         timeframe (str): Timeframe of data ('daily')
         ticker_list (list): List of tickers to process (default: None - all from table)
+        incremental (bool): Only download bars after each ticker's last stored bar (default: False)
+        batch_size (int): Tickers with the same download range fetched per request (default: 1).
+                          Above 1 the downloader is called with batch_size, so download_data
+                          uses one yf.download call per batch.
+        max_workers (int): Number of download threads (default: 8)
+        rate (float): Requests per second across all threads (default: 2.0)
+        burst (int): Requests allowed at once before the rate applies (default: 4)
+        retries (int): Retries per request after the first attempt (default: 4)
+        backoff (float): Delay before the first retry in seconds, doubled on every retry (default: 1.0)
+        batch_rows (int): Buffered rows that trigger a database write (default: 50000)
+        downloader (callable): Called as downloader(tickers, **download_range), returns the
+                               download_data DataFrame (default: download_data)
+        manager (DatabaseManager, optional): Database to use (default: the module's db)
+        resume (bool): Skip the tickers an interrupted run with the same arguments and last
+                       completed session already stored, as recorded in the job journal (default: False)
+        
+    Returns:
+        dict: processed, errors, rows and seconds of the run
     """
+    manager = manager or db
+    requested_tickers = sorted(ticker_list) if ticker_list is not None else None
+    
     # Determine the actual output table name based on timeframe
     if timeframe == 'daily':
         output_table = f'{table_name}_ohlcv_daily'
@@ -80,7 +184,8 @@ def process_stock_data(table_name, timeframe, ticker_list=None):
         
     try:
         print(f"Getting list of assets from {table_name} table...")
-        assets_df = db.get_table_data(table_name)
+        assets_df = manager.get_table_data(table_name)
+        asset_index = AssetIndex(assets_df)
         if ticker_list is None:
             ticker_list = assets_df['ticker'].unique().tolist()
         
@@ -89,62 +194,179 @@ def process_stock_data(table_name, timeframe, ticker_list=None):
         
         print(f"Found {len(ticker_list)} unique tickers to process")
         print(f"Will insert data into table: {output_table}")
-        print(ticker_list)
+        
+        manager.ensure_ohlcv_unique_index(table_name)
+        today = date.today()
+        end_session = get_last_completed_session(today).strftime('%Y-%m-%d')
+        downloads = {ticker: {} for ticker in ticker_list}
+        if incremental:
+            last_dates = manager.get_last_bar_dates(table_name)
+            downloads = {ticker: get_download_range(last_dates.get(asset_index.get(ticker)), today) for ticker in ticker_list}
+            downloads = {ticker: download_range for ticker, download_range in downloads.items() if download_range is not None}
+            print(f"{len(ticker_list) - len(downloads)} tickers are up to date, {len(downloads)} to download")
     except Exception as e:
         print(f"Error getting stock list: {e}")
         return
     
+    journal = JobJournal('yf_ohlcv', {
+        'table_name': table_name,
+        'timeframe': timeframe,
+        'ticker_list': requested_tickers,
+        'incremental': incremental,
+        # A run for a later session is a new job, not a resume of an older one
+        'end_session': end_session,
+    }, resume=resume, manager=manager)
+    pending = journal.get_pending(list(downloads))
+    downloads = {ticker: downloads[ticker] for ticker in pending}
+    
+    batches = get_download_batches(downloads, batch_size)
+    return download_and_store(table_name, asset_index, batches, max_workers=max_workers, rate=rate, burst=burst,
+                              retries=retries, backoff=backoff, batch_rows=batch_rows, downloader=downloader,
+                              manager=manager, journal=journal, end_session=end_session)
+
+def download_ohlcv(downloader, tickers, asset_index, limiter, retries, backoff, on_retry=None, end_session=None,
+                   **download_range):
+    """
+    Download one batch with retries and map it to the OHLCV table, in the calling worker thread
+    
+    Returns:
+        pd.DataFrame: Mapped rows up to end_session, empty if there was no data
+    """
+    df_data = call_with_retry(downloader, tickers, limiter=limiter, retries=retries, backoff=backoff,
+                              on_retry=on_retry, **download_range)
+    ohlcv_df = map_dataframe_to_ohlcv_table(df_data, asset_index) if not df_data.empty else pd.DataFrame()
+    if end_session and not ohlcv_df.empty:
+        # Period downloads can end with today's unfinished bar
+        ohlcv_df = ohlcv_df[ohlcv_df['datetime'] <= end_session]
+    return ohlcv_df
 
+def download_and_store(table_name, assets, batches, max_workers=8, rate=2.0, burst=4, retries=4, backoff=1.0,
+                       batch_rows=50000, downloader=download_data, manager=None, journal=None, end_session=None):
+    """
+    Download batches of tickers concurrently and upsert them into the OHLCV table
+    
+    Tickers are recorded in the journal once their rows are committed, so an
+    interrupted run only loses the rows still buffered. On Ctrl-C the queued
+    downloads are cancelled, the buffer is written and the job is marked
+    'interrupted' before the KeyboardInterrupt is raised again.
+    
+    Args:
+        table_name (str): Base table name ('stocks' or 'indexes')
+        assets (AssetIndex or pd.DataFrame): Asset index, or assets with ticker and id columns,
+                                             shared by the workers to map tickers to asset_id
+        batches (list): (tickers, download_range) tuples, one request each
+        max_workers, rate, burst, retries, backoff, batch_rows, downloader, manager:
+            As in process_stock_data
+        journal (JobJournal, optional): Journal recording every completed or failed ticker
+        end_session (str, optional): Drop downloaded bars after this session (YYYY-MM-DD)
+        
+    Returns:
+        dict: processed, errors, rows and seconds of the run
+    """
+    manager = manager or db
+    n_tickers_total = sum(len(tickers) for tickers, _ in batches)
+    asset_index = assets if isinstance(assets, AssetIndex) else AssetIndex(assets)
+    
     processed_count = 0
     error_count = 0
+    rows_inserted = 0
+    # Mapped frames and the (ticker, rows, retries) they hold, written together
+    buffer = []
+    buffered_units = []
+    started = time.perf_counter()
+    limiter = TokenBucket(rate, burst)
     
-    # Process each ticker individually instead of all at once
-    for ticker in ticker_list:
+    def flush():
+        """Write the buffer and journal its tickers, returns (rows written, tickers failed)"""
         try:
-            print(f"Processing ticker: {ticker}")
-            
-            # Download data for single ticker
-            print(f"Downloading data for {ticker}...")
-            df_data = download_data([ticker])
-            
-            # Check if DataFrame is empty
-            if df_data.empty:
-                print(f"No data found for {ticker}, skipping")
+            written = write_ohlcv_batch(buffer, table_name, manager)
+        except Exception as e:
+            print(f"Error inserting {sum(len(df) for df in buffer)} rows: {e}")
+            if journal:
+                journal.fail([unit[0] for unit in buffered_units], e)
+            failed = sum(1 for unit in buffered_units if unit[1] > 0)
+            buffer.clear()
+            buffered_units.clear()
+            return 0, failed
+        if journal:
+            journal.complete([unit[0] for unit in buffered_units],
+                             rows=[unit[1] for unit in buffered_units],
+                             retries=[unit[2] for unit in buffered_units])
+        buffer.clear()
+        buffered_units.clear()
+        return written, 0
+    
+    interrupted = False
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {}
+        for tickers, download_range in batches:
+            if len(tickers) > 1:
+                download_range = {**download_range, 'batch_size': len(tickers)}
+            retry_log = []
+            future = executor.submit(download_ohlcv, downloader, tickers, asset_index, limiter,
+                                     retries, backoff,
+                                     on_retry=lambda attempt, e, log=retry_log: log.append(e),
+                                     end_session=end_session, **download_range)
+            futures[future] = (tickers, retry_log)
+        
+        for future in as_completed(futures):
+            tickers, retry_log = futures[future]
+            label = tickers[0] if len(tickers) == 1 else f"{len(tickers)} tickers from {tickers[0]}"
+            try:
+                ohlcv_df = future.result()
+            except Exception as e:
+                print(f"Error processing {label}: {e}")
+                error_count += len(tickers)
+                if journal:
+                    journal.fail(tickers, e, retries=len(retry_log))
+                # Continue with next ticker rather than exiting
                 continue
-                
-            # Data is already a DataFrame, no need to convert
-            print(f"Downloaded {len(df_data)} rows of data for {ticker}")
             
-            # Map to OHLCV table format
-            print(f"Mapping {ticker} data to {table_name} table...")
-            ohlcv_df = map_dataframe_to_ohlcv_table(df_data, assets_df)
+            rows_by_id = ohlcv_df['asset_id'].value_counts() if not ohlcv_df.empty else pd.Series(dtype=int)
+            buffered_units.extend(
+                (ticker, int(rows_by_id.get(asset_index.get(ticker), 0)), len(retry_log)) for ticker in tickers
+            )
             
+            # Tickers without data are journaled as completed with 0 rows
             if ohlcv_df.empty:
-                print(f"No mappable data for {ticker}, skipping")
-                continue
-            
-            print(f"Inserting {ticker} data into {output_table} table...")
-            rows_inserted = db.insert_dataframe(ohlcv_df, output_table)
-            print(f"Successfully inserted {rows_inserted} rows for {ticker}")
-            
-            processed_count += 1
-            print(f"Completed {processed_count}/{len(ticker_list)} tickers")
-            
-            # Add a small delay between tickers to avoid rate limits
-            if processed_count < len(ticker_list):
-                delay = 1.5  # 1.5 seconds between requests
-                print(f"Waiting {delay} seconds before next ticker...")
-                time.sleep(delay)
+                print(f"No data found for {label}, skipping")
+            else:
+                n_tickers = len(rows_by_id)
+                if n_tickers < len(tickers):
+                    print(f"No data found for {len(tickers) - n_tickers} of {label}")
+                buffer.append(ohlcv_df)
+                processed_count += n_tickers
             
-        except Exception as e:
-            print(f"Error processing {ticker}: {e}")
-            error_count += 1
-            # Continue with next ticker rather than exiting
-            continue
+            if sum(len(df) for df in buffer) >= batch_rows:
+                written, failed = flush()
+                rows_inserted += written
+                error_count += failed
+                processed_count -= failed
+                print(f"Wrote {rows_inserted} new or changed rows, completed {processed_count}/{n_tickers_total} tickers")
+    
+    except KeyboardInterrupt:
+        interrupted = True
+        print("Interrupted, cancelling queued downloads and saving what was downloaded")
+    
+    finally:
+        executor.shutdown(wait=not interrupted, cancel_futures=interrupted)
+    
+    written, failed = flush()
+    rows_inserted += written
+    error_count += failed
+    processed_count -= failed
     
+    elapsed = time.perf_counter() - started
     print(f"Processing complete. Successfully processed: {processed_count}, Errors: {error_count}")
+    print(f"Wrote {rows_inserted} new or changed rows in {elapsed:.1f}s ({n_tickers_total / max(elapsed, 1e-9):.2f} tickers/s)")
+    if journal:
+        journal.finish('interrupted' if interrupted else None)
+    if interrupted:
+        raise KeyboardInterrupt
+    return {'processed': processed_count, 'errors': error_count, 'rows': rows_inserted, 'seconds': elapsed}
 
 if __name__ == "__main__":
     # needs to pass in table name and ticker list
-    process_stock_data('indexes', 'daily')
+    process_stock_data('indexes', 'daily', incremental=True)
     # process_stock_data('stocks', 'daily')
\ No newline at end of file
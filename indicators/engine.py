@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Indicator Engine
+
+Computes several rolling-mean indicators and periods in one pass over a
+DataFrame that stacks many tickers (e.g. the output of get_ohlcv_data("stocks")).
+Windows are evaluated per ticker with cumulative sums on NumPy arrays, so they
+never span two tickers, and only the new columns are returned.
+"""
+
+import numpy as np
+import pandas as pd
+
+def _sma_source(df: pd.DataFrame) -> np.ndarray:
+    """Closing prices, averaged by the SMA"""
+    return np.asarray(df['close'], dtype='float64')
+
+def _adv_source(df: pd.DataFrame) -> np.ndarray:
+    """Daily volume, averaged by the ADV"""
+    return np.asarray(df['volume'], dtype='float64')
+
+def _adr_source(df: pd.DataFrame) -> np.ndarray:
+    """Daily range as a percentage of the open, averaged by the ADR"""
+    high = np.asarray(df['high'], dtype='float64')
+    low = np.asarray(df['low'], dtype='float64')
+    open_ = np.asarray(df['open'], dtype='float64')
+    return (high - low) / open_ * 100
+
+# Indicator name -> function returning the per-bar values the indicator averages.
+# Sources accept a DataFrame, a dict of arrays or a single bar mapping.
+INDICATOR_SOURCES = {
+    'sma': _sma_source,
+    'adv': _adv_source,
+    'adr': _adr_source,
+}
+
+def register_indicator(name: str, source) -> None:
+    """
+    Register a new rolling-mean indicator.
+
+    Registered indicators can be used by calculate_indicators, the streaming
+    classes and the materialized indicator store by name.
+
+    Args:
+        name: Indicator name, used as the column prefix (e.g. 'adv' -> 'adv_30')
+        source: Function taking OHLCV data and returning the per-bar values to average
+    """
+    if name in INDICATOR_SOURCES:
+        raise ValueError(f"Indicator '{name}' is already registered")
+    INDICATOR_SOURCES[name] = source
+
+def group_starts(keys: np.ndarray) -> np.ndarray:
+    """
+    For each row, get the position of the first row of its group.
+
+    Args:
+        keys: Group keys, with each group stored contiguously
+
+    Returns:
+        Array of group start positions, one per row
+    """
+    n = len(keys)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    is_start = np.empty(n, dtype=bool)
+    is_start[0] = True
+    is_start[1:] = keys[1:] != keys[:-1]
+    return np.maximum.accumulate(np.where(is_start, np.arange(n), 0))
+
+def rolling_mean(values: np.ndarray, period: int, starts: np.ndarray = None) -> np.ndarray:
+    """
+    Rolling mean over a sliding window using cumulative sums.
+
+    Matches pandas' rolling(window=period).mean(): the first period - 1 rows of
+    each group, and any window containing a NaN, are NaN.
+
+    Args:
+        values: Values to average
+        period: Window length
+        starts: Group start position for each row (default: a single group)
+
+    Returns:
+        Array with the rolling mean for each row
+    """
+    n = len(values)
+    result = np.full(n, np.nan)
+    if n == 0:
+        return result
+
+    if starts is None:
+        starts = np.zeros(n, dtype=np.int64)
+
+    # Cumulative sums with a leading zero so window sums are csum[i + 1] - csum[lo]
+    valid = ~np.isnan(values)
+    csum = np.zeros(n + 1)
+    np.cumsum(np.where(valid, values, 0.0), out=csum[1:])
+    nan_count = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(~valid, out=nan_count[1:])
+
+    positions = np.arange(n)
+    window_start = positions - period + 1
+    clipped_start = np.maximum(window_start, 0)
+
+    # Keep windows that fit inside their group and contain no NaN
+    complete = (window_start >= starts) & (nan_count[positions + 1] - nan_count[clipped_start] == 0)
+    result[complete] = (csum[positions + 1] - csum[clipped_start])[complete] / period
+
+    return result
+
+def calculate_indicators(df: pd.DataFrame, indicators: dict, group_col: str = 'ticker') -> pd.DataFrame:
+    """
+    Calculate several indicators and periods at once, per ticker.
+
+    Rows of a ticker are expected in chronological order. Tickers do not need
+    to be contiguous, but the computation skips a reordering step when they are.
+
+    Args:
+        df: DataFrame with OHLCV columns and optionally a group column
+        indicators: Mapping of indicator name to periods, e.g. {'adv': [30], 'adr': [20]}
+        group_col: Column identifying each ticker (ignored if missing)
+
+    Returns:
+        DataFrame with one column per indicator and period (e.g. 'adv_30'),
+        aligned on the index of df
+    """
+    unknown = [name for name in indicators if name not in INDICATOR_SOURCES]
+    if unknown:
+        raise ValueError(f"Unknown indicators: {unknown}. Available: {list(INDICATOR_SOURCES)}")
+
+    n = len(df)
+    order = None
+    if group_col in df.columns and n > 0:
+        codes = pd.factorize(df[group_col])[0]
+        # Factorize numbers groups by first appearance, so contiguous groups
+        # have non-decreasing codes
+        if np.any(np.diff(codes) < 0):
+            order = np.argsort(codes, kind='stable')
+            codes = codes[order]
+        starts = group_starts(codes)
+    else:
+        starts = np.zeros(n, dtype=np.int64)
+
+    columns = {}
+    for name, periods in indicators.items():
+        source = INDICATOR_SOURCES[name](df)
+        if order is not None:
+            source = source[order]
+
+        for period in periods:
+            values = rolling_mean(source, period, starts)
+            if order is not None:
+                unordered = np.empty(n)
+                unordered[order] = values
+                values = unordered
+            columns[f"{name}_{period}"] = values
+
+    return pd.DataFrame(columns, index=df.index)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Indicator Store
+
+Materializes indicators from the indicator engine into the
+<asset_type>_indicator_values tables, refreshing only the bars added since
+each ticker's last computed date, and reads them back for strategies.
+
+Usage:
+    python -m indicators.store    # Refresh every materialized indicator
+"""
+
+import numpy as np
+import pandas as pd
+from indicators.engine import calculate_indicators
+from utils.db_utils import DatabaseManager
+
+db = DatabaseManager()
+
+# Indicators kept up to date by the batch job, per asset type. Any indicator
+# registered in the engine can be added here without strategy code.
+MATERIALIZED_INDICATORS = {
+    'stocks': {'adv': [30], 'adr': [20]},
+    'indexes': {'sma': [50]},
+}
+
+def get_specs(indicators: dict) -> list:
+    """Flatten {'adv': [30], 'adr': [20]} into [('adv', 30), ('adr', 20)]"""
+    return [(name, period) for name, periods in indicators.items() for period in periods]
+
+def materialize_indicators(asset_type: str, indicators: dict = None) -> int:
+    """
+    Compute and store indicator values for every asset of a type.
+
+    Only bars after each asset's last computed date are written. The bars
+    before them that the longest window needs are loaded as warm-up. When
+    upsert_ohlcv rewrites past bars it deletes the values from the first
+    changed bar on, so those assets are recomputed from there.
+
+    Args:
+        asset_type: 'stocks' or 'indexes'
+        indicators: Mapping of indicator name to periods (default: MATERIALIZED_INDICATORS[asset_type])
+
+    Returns:
+        Number of indicator values written
+    """
+    indicators = indicators or MATERIALIZED_INDICATORS[asset_type]
+    specs = get_specs(indicators)
+    warmup = max(period for _, period in specs) - 1
+
+    db.ensure_indicator_table(asset_type)
+    bars_df = db.get_indicator_refresh_bars(asset_type, specs, warmup)
+    if bars_df.empty:
+        print(f"Indicators for {asset_type} are up to date")
+        return 0
+
+    print(f"Computing {specs} for {bars_df['asset_id'].nunique()} {asset_type} over {len(bars_df)} bars")
+    values_df = calculate_indicators(bars_df, indicators, group_col='asset_id')
+
+    # Warm-up bars were already computed by a previous run
+    new_rows = (bars_df['last_dt'].isna() | (bars_df['datetime'] > bars_df['last_dt'])).to_numpy()
+
+    frames = []
+    for name, period in specs:
+        values = values_df[f"{name}_{period}"].to_numpy()
+        keep = new_rows & ~np.isnan(values)
+        frames.append(pd.DataFrame({
+            'asset_id': bars_df['asset_id'].to_numpy()[keep],
+            'datetime': bars_df['datetime'].to_numpy()[keep],
+            'indicator': name,
+            'period': period,
+            'value': values[keep],
+        }))
+
+    long_df = pd.concat(frames, ignore_index=True)
+    written = db.upsert_indicator_values(asset_type, long_df)
+    print(f"Stored {written} indicator values for {asset_type}")
+    return written
+
+def load_indicator_frame(asset_type: str, indicators: dict, tickers: list = None,
+                         start_date: str = None, end_date: str = None) -> pd.DataFrame:
+    """
+    Load OHLCV bars with precomputed indicator columns in one query.
+
+    Indicators missing from the store, or not refreshed up to the latest bar,
+    are computed in memory instead so callers always get complete columns.
+
+    Args:
+        asset_type: 'stocks' or 'indexes'
+        indicators: Mapping of indicator name to periods, e.g. {'adv': [30], 'adr': [20]}
+        tickers: Ticker symbols to load (default: all)
+        start_date: Start date in YYYY-MM-DD format
+        end_date: End date in YYYY-MM-DD format
+
+    Returns:
+        DataFrame with ticker, datetime, OHLCV and '<indicator>_<period>' columns,
+        sorted by ticker and datetime with datetime parsed
+    """
+    specs = get_specs(indicators)
+    db.ensure_indicator_table(asset_type)
+    df = db.get_indicator_values(asset_type, specs, tickers=tickers, start_date=start_date, end_date=end_date)
+
+    # Fall back to the engine for indicators the batch job has not caught up on
+    stale = {}
+    latest_bar = df['datetime'].max()
+    for name, period in specs:
+        column = f"{name}_{period}"
+        stored = df.loc[df[column].notna(), 'datetime']
+        if stored.empty or stored.max() < latest_bar:
+            stale.setdefault(name, []).append(period)
+
+    if stale:
+        print(f"Indicator store is missing or stale for {stale}, computing in memory. "
+              f"Run 'python -m indicators.store' to refresh it.")
+        computed = calculate_indicators(df, stale)
+        for column in computed.columns:
+            df[column] = computed[column]
+
+    df['datetime'] = pd.to_datetime(df['datetime'])
+    return df
+
+if __name__ == "__main__":
+    for asset_type in MATERIALIZED_INDICATORS:
+        materialize_indicators(asset_type)
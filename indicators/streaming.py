@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Streaming Indicators
+
+Incremental versions of the SMA, ADV and ADR indicators for bar-by-bar updates.
+Each object keeps a ring buffer of the last period values and a running sum,
+so update() costs O(1) instead of recomputing the rolling mean from scratch.
+Values match the batch calculate_indicator functions.
+"""
+
+import math
+import numpy as np
+from indicators.engine import INDICATOR_SOURCES
+
+class StreamingIndicator:
+    """
+    Rolling mean of an indicator source, updated one bar at a time.
+    """
+    __slots__ = ('period', '_source', '_buffer', '_position', '_count', '_sum', '_nan_count')
+
+    name = None
+
+    def __init__(self, period: int):
+        """
+        Initialize with the window length
+
+        Parameters:
+            period: Number of bars in the rolling window
+        """
+        if period < 1:
+            raise ValueError("period must be at least 1")
+
+        self.period = period
+        self._source = INDICATOR_SOURCES[self.name]
+        self.reset()
+
+    def reset(self):
+        """Clear the window"""
+        self._buffer = [math.nan] * self.period
+        self._position = 0
+        self._count = 0
+        self._sum = 0.0
+        self._nan_count = 0
+
+    @property
+    def value(self) -> float:
+        """Current indicator value, NaN until the window is full or while it holds a NaN"""
+        if self._count < self.period or self._nan_count:
+            return math.nan
+        return self._sum / self.period
+
+    def update(self, bar) -> float:
+        """
+        Add a new bar and return the updated indicator value
+
+        Parameters:
+            bar: Mapping with the OHLCV fields the indicator needs (dict, Series, DataFrame row)
+
+        Returns:
+            Current indicator value
+        """
+        return self.update_value(float(self._source(bar)))
+
+    def update_value(self, value: float) -> float:
+        """
+        Add a new source value (e.g. a close for the SMA) and return the updated indicator value
+        """
+        position = self._position
+
+        # Drop the value leaving the window
+        if self._count == self.period:
+            old = self._buffer[position]
+            if old != old:
+                self._nan_count -= 1
+            else:
+                self._sum -= old
+        else:
+            self._count += 1
+
+        self._buffer[position] = value
+        if value != value:
+            self._nan_count += 1
+        else:
+            self._sum += value
+
+        position += 1
+        if position == self.period:
+            position = 0
+            # Recompute the sum once per lap so add/subtract rounding cannot drift
+            self._sum = math.fsum(x for x in self._buffer if x == x)
+        self._position = position
+
+        return self.value
+
+    def warm_up(self, bars) -> float:
+        """
+        Load historical bars in bulk
+
+        Only the last period bars affect the state, so the window is filled
+        directly from the tail of the history.
+
+        Parameters:
+            bars: DataFrame or dict of arrays with the OHLCV fields, in chronological order
+
+        Returns:
+            Current indicator value
+        """
+        values = np.asarray(self._source(bars), dtype='float64')[-self.period:]
+        self.reset()
+
+        self._count = len(values)
+        self._buffer[:self._count] = values.tolist()
+        self._position = self._count % self.period
+
+        valid = ~np.isnan(values)
+        self._nan_count = int((~valid).sum())
+        self._sum = math.fsum(values[valid].tolist())
+
+        return self.value
+
+class SMA(StreamingIndicator):
+    """Simple Moving Average of closing prices"""
+    __slots__ = ()
+    name = 'sma'
+
+class ADV(StreamingIndicator):
+    """Average Daily Volume"""
+    __slots__ = ()
+    name = 'adv'
+
+class ADR(StreamingIndicator):
+    """Average Daily Range, as a percentage of the open"""
+    __slots__ = ()
+    name = 'adr'
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Enrichment Benchmark
+
+Runs OHLCV enrichment against a local fake provider that adds latency, rejects
+requests above its rate limit and fails a share of requests at random. Compares
+the sequential loop (one ticker at a time with a fixed pause, as
+process_stock_data worked before) against the concurrent downloader with the
+token-bucket limiter, and checks that both write the same rows. Then runs the
+concurrent download again and checks that it writes no rows.
+No network access is needed.
+
+Usage:
+    python -m scripts.benchmark_enrichment                     # 200 tickers
+    python -m scripts.benchmark_enrichment --tickers 50 --latency 0.1
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+import numpy as np
+import pandas as pd
+from api.rate_limit import RateLimitError, TokenBucket
+from enriching.yf_enrichment import process_stock_data, map_dataframe_to_ohlcv_table
+from utils.db_utils import DatabaseManager
+
+class FakeProvider:
+    """
+    Stand-in for download_data with simulated latency, rate limit and failures.
+
+    Callable as provider([ticker], start=None, end=None) and returns the
+    download_data column layout.
+    """
+
+    def __init__(self, latency=0.3, rate_limit=10.0, error_rate=0.02, n_days=1250, seed=42):
+        """
+        Args:
+            latency (float): Seconds per request
+            rate_limit (float): Requests per second accepted before RateLimitError is raised
+            error_rate (float): Share of requests failing with a transient error
+            n_days (int): Daily bars returned per ticker
+            seed (int): Random seed
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.dates = pd.bdate_range(end='2024-12-31', periods=n_days)
+        self.requests = 0
+        self.rate_limited = 0
+        self.errors = 0
+        self._server_bucket = TokenBucket(rate_limit, max(1, rate_limit))
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+
+    def __call__(self, tickers, start=None, end=None):
+        with self._lock:
+            self.requests += 1
+            # The server does not wait for tokens, it rejects the request
+            if not self._server_bucket.try_acquire():
+                self.rate_limited += 1
+                raise RateLimitError("Too Many Requests")
+            failed = self._rng.random() < self.error_rate
+            if failed:
+                self.errors += 1
+
+        time.sleep(self.latency)
+        if failed:
+            raise ConnectionError("Simulated connection reset")
+        df = self._bars(tickers[0])
+        if start:
+            df = df[df['date'] >= start]
+        if end:
+            df = df[df['date'] < end]
+        return df.reset_index(drop=True)
+
+    def _bars(self, ticker):
+        """Deterministic bars per ticker so every run writes the same rows"""
+        rng = np.random.default_rng(zlib.crc32(ticker.encode()))
+        close = 50 * np.exp(np.cumsum(rng.normal(0, 0.02, len(self.dates))))
+        df = pd.DataFrame({
+            'date': self.dates.strftime('%Y-%m-%d'),
+            'open': close * (1 + rng.normal(0, 0.005, len(close))),
+            'high': close * 1.01,
+            'low': close * 0.99,
+            'close': close,
+            'volume': rng.integers(1e5, 1e7, len(close)).astype(float),
+        })
+        df['year'] = self.dates.year
+        df['month'] = self.dates.month
+        df['week'] = self.dates.isocalendar().week.to_numpy()
+        df['ticker'] = ticker
+        return df
+
+def build_database(db_path, n_tickers):
+    """Create an empty stocks_ohlcv_daily table and n_tickers stocks"""
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE stocks (id INTEGER PRIMARY KEY, ticker TEXT)")
+        conn.execute("""
+            CREATE TABLE stocks_ohlcv_daily (
+                asset_id INTEGER, datetime TEXT,
+                open REAL, high REAL, low REAL, close REAL, volume REAL
+            )
+        """)
+        conn.executemany("INSERT INTO stocks (id, ticker) VALUES (?, ?)",
+                         [(i + 1, f"T{i:05d}") for i in range(n_tickers)])
+
+def run_sequential(provider, manager, delay, retries=4):
+    """
+    One ticker at a time with a fixed pause and one insert per ticker,
+    as process_stock_data worked before the concurrent downloader.
+    """
+    assets_df = manager.get_table_data('stocks')
+    for ticker in assets_df['ticker']:
+        for attempt in range(retries + 1):
+            try:
+                df = provider([ticker])
+                break
+            except Exception:
+                if attempt == retries:
+                    df = pd.DataFrame()
+                time.sleep(delay)
+        if not df.empty:
+            manager.insert_dataframe(map_dataframe_to_ohlcv_table(df, assets_df), 'stocks_ohlcv_daily')
+        time.sleep(delay)
+
+def load_rows(db_path):
+    """All written bars, sorted, for comparing runs"""
+    with sqlite3.connect(db_path) as conn:
+        return pd.read_sql("SELECT * FROM stocks_ohlcv_daily ORDER BY asset_id, datetime", conn)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark sequential and concurrent OHLCV enrichment')
+    parser.add_argument('--tickers', type=int, default=200, help='Number of tickers (default: 200)')
+    parser.add_argument('--latency', type=float, default=0.3, help='Provider latency in seconds (default: 0.3)')
+    parser.add_argument('--provider-rate', type=float, default=10.0, help='Requests per second the provider accepts (default: 10)')
+    parser.add_argument('--error-rate', type=float, default=0.02, help='Share of requests failing (default: 0.02)')
+    parser.add_argument('--workers', type=int, default=16, help='Download threads (default: 16)')
+    parser.add_argument('--rate', type=float, default=None, help='Limiter rate (default: 90%% of the provider rate)')
+    args = parser.parse_args()
+
+    rate = args.rate or args.provider_rate * 0.9
+    output_dir = tempfile.mkdtemp(prefix='enrichment_')
+    results = {}
+
+    for mode in ('sequential', 'concurrent'):
+        db_path = os.path.join(output_dir, f'{mode}.db')
+        build_database(db_path, args.tickers)
+        manager = DatabaseManager(db_path)
+        provider = FakeProvider(args.latency, args.provider_rate, args.error_rate)
+
+        start = time.perf_counter()
+        if mode == 'sequential':
+            # The pause that keeps one thread under the provider limit
+            run_sequential(provider, manager, delay=1 / args.provider_rate)
+        else:
+            process_stock_data('stocks', 'daily', max_workers=args.workers, rate=rate,
+                               burst=max(1, int(rate)), backoff=0.2, manager=manager,
+                               downloader=provider)
+        elapsed = time.perf_counter() - start
+
+        results[mode] = load_rows(db_path)
+        print(f"{mode}: {elapsed:.1f}s, {args.tickers / elapsed:.1f} tickers/s, "
+              f"{provider.requests} requests, {provider.rate_limited} rate limited, {provider.errors} errors")
+
+    if not results['sequential'].equals(results['concurrent']):
+        raise SystemExit("Sequential and concurrent runs wrote different rows")
+    print(f"Both runs wrote the same {len(results['concurrent']):,} rows")
+
+    # Re-running the same download must not write anything
+    db_path = os.path.join(output_dir, 'concurrent.db')
+    provider = FakeProvider(args.latency, args.provider_rate, error_rate=0)
+    rerun = process_stock_data('stocks', 'daily', max_workers=args.workers, rate=rate,
+                               burst=max(1, int(rate)), backoff=0.2, manager=DatabaseManager(db_path),
+                               downloader=provider)
+    if rerun['rows'] != 0 or not load_rows(db_path).equals(results['concurrent']):
+        raise SystemExit(f"Re-running the download wrote {rerun['rows']} rows")
+    print(f"Re-running the download fetched {provider.requests} batches and wrote no rows")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Screening Benchmark
+
+Builds a synthetic stocks database and compares the SQLite window-function
+screen (DatabaseManager.screen_universe) against the pandas path (load all
+bars, compute indicators with the indicator engine, screen in memory).
+Both paths must return the same tickers and the same qualifying days.
+No network access is needed.
+
+Usage:
+    python -m scripts.benchmark_screening                          # 5,000 tickers x 20 years
+    python -m scripts.benchmark_screening --tickers 200 --years 2  # Quick check
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from indicators.engine import calculate_indicators
+from utils.db_utils import DatabaseManager
+
+TRADING_DAYS_PER_YEAR = 252
+
+# Same thresholds as the adr_stocks strategy defaults
+THRESHOLDS = {'min_volume': 30000000, 'min_adr': 4.0, 'min_price': 40}
+
+def build_synthetic_db(db_path, n_tickers, n_years, seed=42):
+    """
+    Create stocks and stocks_ohlcv_daily tables filled with random walks.
+
+    Args:
+        db_path: Path of the database file to create
+        n_tickers: Number of tickers
+        n_years: Years of daily bars per ticker
+        seed: Random seed
+
+    Returns:
+        int: Number of bars written
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end='2024-12-31', periods=n_years * TRADING_DAYS_PER_YEAR).strftime('%Y-%m-%d').to_numpy()
+    n_days = len(dates)
+
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE stocks (id INTEGER PRIMARY KEY, ticker TEXT)")
+        conn.execute("""
+            CREATE TABLE stocks_ohlcv_daily (
+                asset_id INTEGER, datetime TEXT,
+                open REAL, high REAL, low REAL, close REAL, volume REAL
+            )
+        """)
+        conn.executemany("INSERT INTO stocks (id, ticker) VALUES (?, ?)",
+                         [(i + 1, f"T{i:05d}") for i in range(n_tickers)])
+
+        for asset_id in range(1, n_tickers + 1):
+            # Per-ticker price level, volatility and liquidity so thresholds split the universe
+            start_price = rng.uniform(5, 200)
+            volatility = rng.uniform(0.01, 0.04)
+            base_volume = rng.lognormal(16, 1.2)
+
+            close = start_price * np.exp(np.cumsum(rng.normal(0, volatility, n_days)))
+            open_ = close * (1 + rng.normal(0, volatility / 2, n_days))
+            spread = np.abs(rng.normal(0, volatility * 1.5, n_days))
+            high = np.maximum(open_, close) * (1 + spread)
+            low = np.minimum(open_, close) * (1 - spread)
+            volume = np.round(base_volume * rng.lognormal(0, 0.5, n_days))
+
+            conn.executemany(
+                "INSERT INTO stocks_ohlcv_daily VALUES (?, ?, ?, ?, ?, ?, ?)",
+                zip([asset_id] * n_days, dates.tolist(), open_.tolist(), high.tolist(),
+                    low.tolist(), close.tolist(), volume.tolist())
+            )
+
+    return n_tickers * n_days
+
+def screen_with_pandas(db, start_date=None):
+    """
+    Screen in memory with the indicator engine, as adr_stocks did before the SQL screen.
+
+    Returns:
+        tuple: (qualifying tickers, DataFrame of qualifying datetime/ticker pairs)
+    """
+    df = db.get_ohlcv_data("stocks")
+    df = df.sort_values(['ticker', 'datetime'], kind='stable').reset_index(drop=True)
+    df = df.join(calculate_indicators(df, {'adv': [30], 'adr': [20]}))
+    if start_date:
+        df = df[df['datetime'] >= start_date]
+
+    volume_ok = df['adv_30'] >= THRESHOLDS['min_volume']
+    adr_ok = df['adr_20'] >= THRESHOLDS['min_adr']
+    price_ok = df['close'] >= THRESHOLDS['min_price']
+
+    passes = pd.DataFrame({'ticker': df['ticker'], 'volume': volume_ok, 'adr': adr_ok, 'price': price_ok})
+    passes = passes.groupby('ticker').any()
+    tickers = sorted(passes.index[passes.all(axis=1)].tolist())
+
+    pairs = df.loc[volume_ok & adr_ok & price_ok, ['datetime', 'ticker']]
+    return tickers, pairs.sort_values(['datetime', 'ticker']).reset_index(drop=True)
+
+def timed(label, func, *args, **kwargs):
+    """Run func and print its wall time"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    print(f"{label}: {time.perf_counter() - start:.2f}s")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark SQLite screening against the pandas path')
+    parser.add_argument('--tickers', type=int, default=5000, help='Number of synthetic tickers (default: 5000)')
+    parser.add_argument('--years', type=int, default=20, help='Years of daily bars per ticker (default: 20)')
+    parser.add_argument('--start-date', help='Only screen dates from this day on (YYYY-MM-DD)')
+    parser.add_argument('--db', help='Reuse or create the synthetic database at this path')
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix='screening_'), 'synthetic.db')
+    if not os.path.exists(db_path):
+        n_bars = timed(f"Building {args.tickers} tickers x {args.years} years",
+                       build_synthetic_db, db_path, args.tickers, args.years)
+        print(f"Wrote {n_bars:,} bars to {db_path}")
+
+    db = DatabaseManager(db_path)
+    timed("Creating (asset_id, datetime) index", db.ensure_ohlcv_index, "stocks")
+
+    sql_tickers = timed("SQL screen, tickers", db.screen_universe, start_date=args.start_date, **THRESHOLDS)
+    sql_pairs = timed("SQL screen, daily pairs", db.screen_universe, start_date=args.start_date, daily=True, **THRESHOLDS)
+    pandas_tickers, pandas_pairs = timed("pandas screen", screen_with_pandas, db, args.start_date)
+
+    print(f"Qualifying tickers: SQL {len(sql_tickers)}, pandas {len(pandas_tickers)}")
+    print(f"Qualifying days:    SQL {len(sql_pairs)}, pandas {len(pandas_pairs)}")
+
+    if sql_tickers != pandas_tickers:
+        raise SystemExit(f"Ticker mismatch: {sorted(set(sql_tickers) ^ set(pandas_tickers))[:10]}")
+    if not sql_pairs[['datetime', 'ticker']].equals(pandas_pairs):
+        raise SystemExit("Daily pairs mismatch")
+    print("SQL and pandas screens match")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Vector Engine Cross-Check
+
+Runs a strategy twice over the same local data, once through lumibot
+(data_source "local") and once through the vectorized engine (data_source
+"vector"), and compares the fills by date, symbol, side and quantity.
+Lumibot stamps a daily fill with the clock of the following iteration, so
+vector fills are compared on the session after the one they fill on,
+capped at the backtest end date.
+Keep the date range and universe small, the lumibot run is the slow one.
+
+Usage:
+    BACKTESTING_START=2024-01-02 BACKTESTING_END=2024-03-01 \\
+        python -m scripts.compare_vector_backtest --file backtests/backtests/adr_stocks.py
+"""
+import argparse
+import importlib
+import os
+import tempfile
+import pandas as pd
+from backtests.backtest_runner import get_module_path, get_latest_trades_files
+from utils.trading_calendar import next_session
+
+FILL_COLUMNS = ['date', 'symbol', 'side', 'quantity']
+
+def run_engine(strategy_class, data_source, run_dir):
+    """
+    Run the strategy with a data source inside its own logs directory.
+
+    Returns:
+        pd.DataFrame: Fills with FILL_COLUMNS, sorted
+    """
+    original_cwd = os.getcwd()
+    os.makedirs(run_dir, exist_ok=True)
+    os.chdir(run_dir)
+    try:
+        engine_class = type(strategy_class.__name__, (strategy_class,), {
+            'parameters': {**strategy_class.parameters, 'data_source': data_source}
+        })
+        engine_class.run_strategy()
+        if data_source != "vector":
+            engine_class.rename_custom_logs()
+
+        trades_file = get_latest_trades_files()
+        if not trades_file:
+            print(f"No trade log written by the {data_source} run")
+            return pd.DataFrame(columns=FILL_COLUMNS)
+        fills = pd.read_csv(trades_file)
+    finally:
+        os.chdir(original_cwd)
+
+    fills['date'] = fills['timestamp'].astype(str).str[:10]
+    if data_source == "vector":
+        end_date = strategy_class.parameters.get("backtesting_end")
+        fills['date'] = [min(str(next_session(date)), end_date) for date in fills['date']]
+    fills['side'] = fills['side'].astype(str).str.lower()
+    fills['quantity'] = fills['quantity'].abs().astype(int)
+    return fills[FILL_COLUMNS].sort_values(FILL_COLUMNS).reset_index(drop=True)
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare lumibot and vector engine fills for a strategy')
+    parser.add_argument('--file', default='backtests/backtests/adr_stocks.py', help='Path to strategy file')
+    parser.add_argument('--output', help='Directory for the run logs (default: a temporary directory)')
+    args = parser.parse_args()
+
+    strategy_class = importlib.import_module(get_module_path(args.file)).Strategy
+    output_dir = os.path.abspath(args.output or tempfile.mkdtemp(prefix='vector_check_'))
+
+    vector_fills = run_engine(strategy_class, "vector", os.path.join(output_dir, "vector"))
+    lumibot_fills = run_engine(strategy_class, "local", os.path.join(output_dir, "lumibot"))
+
+    print(f"Fills: lumibot {len(lumibot_fills)}, vector {len(vector_fills)}")
+    merged = lumibot_fills.merge(vector_fills, on=FILL_COLUMNS, how='outer', indicator=True)
+    mismatches = merged[merged['_merge'] != 'both']
+    if mismatches.empty:
+        print("Lumibot and vector engine fills match")
+        return
+
+    print(f"{len(mismatches)} fills differ (left_only = lumibot, right_only = vector):")
+    print(mismatches.head(50).to_string(index=False))
+    raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Mock Polygon Server
+
+Local stand-in for Polygon's /v3/reference/tickers endpoint with synthetic
+tickers, next_url cursor pagination, the ticker.gte/ticker.gt/ticker.lt/ticker.lte
+filters and a simulated round-trip latency. Some records have no CIK and some
+tickers appear twice, so clean_up_data has work to do. Chosen requests can
+be answered with an error status instead, e.g. a 429 with Retry-After.
+
+By default it benchmarks a single paginated request against requests split
+into concurrent ticker ranges, and checks that both give the same cleaned data.
+No network access is needed.
+
+Usage:
+    python -m scripts.mock_polygon_server                       # benchmark, 10,000 tickers
+    python -m scripts.mock_polygon_server --tickers 20000 --partitions 8 --latency 0.2
+    python -m scripts.mock_polygon_server --serve --port 8765   # serve until Ctrl-C
+    python -m enriching.get_stocks_polygon --base-url http://127.0.0.1:8765/v3/reference/tickers
+"""
+import argparse
+import base64
+import bisect
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+import pandas as pd
+from enriching.get_stocks_polygon import clean_up_data, get_polygon_tickers_data
+
+TICKERS_PATH = "/v3/reference/tickers"
+
+def make_tickers(n_tickers=10000, null_cik_rate=0.01, duplicate_rate=0.005, seed=42):
+    """
+    Build synthetic ticker records sorted by ticker, as Polygon returns them.
+
+    Args:
+        n_tickers (int): Number of distinct tickers
+        null_cik_rate (float): Share of records without a CIK
+        duplicate_rate (float): Share of tickers with a second record
+        seed (int): Random seed
+
+    Returns:
+        list: Ticker records with the fields of the Polygon response
+    """
+    rng = np.random.default_rng(seed)
+    tickers = set()
+    while len(tickers) < n_tickers:
+        length = rng.integers(1, 6)
+        tickers.add(''.join(chr(ord('A') + letter) for letter in rng.integers(0, 26, length)))
+
+    records = []
+    for i, ticker in enumerate(sorted(tickers)):
+        copies = 2 if rng.random() < duplicate_rate else 1
+        for copy in range(copies):
+            records.append({
+                'ticker': ticker,
+                'name': f"{ticker} Corp" + (" Class B" if copy else ""),
+                'market': 'stocks',
+                'locale': 'us',
+                'primary_exchange': 'XNAS' if i % 3 else 'XNYS',
+                'type': 'CS',
+                'active': True,
+                'currency_name': 'usd',
+                'cik': None if rng.random() < null_cik_rate else f"{1000000 + i:010d}",
+                'composite_figi': f"BBG{i:09d}{copy}",
+                'share_class_figi': f"BBG{i:09d}{copy}",
+                'last_updated_utc': '2024-12-31T00:00:00Z',
+            })
+    return records
+
+class MockPolygonServer:
+    """
+    Threaded HTTP server answering /v3/reference/tickers from an in-memory list.
+
+    The cursor in next_url encodes the filters and offset, so the follow-up
+    requests carry only the cursor and the API key, like Polygon's.
+    """
+
+    def __init__(self, records, latency=0.1, host='127.0.0.1', port=0, errors=None, retry_after=1):
+        """
+        Args:
+            records (list): Ticker records sorted by ticker, e.g. from make_tickers
+            latency (float): Seconds added to every response
+            host (str): Interface to bind (default: '127.0.0.1')
+            port (int): Port to bind, 0 picks a free one (default: 0)
+            errors (dict, optional): HTTP status to answer instead, by request number
+                                     counted from 1, e.g. {2: 429, 3: 429}
+            retry_after (int): Retry-After seconds sent with 429 responses (default: 1)
+        """
+        self.records = records
+        self.keys = [record['ticker'] for record in records]
+        self.latency = latency
+        self.errors = dict(errors or {})
+        self.retry_after = retry_after
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{TICKERS_PATH}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self):
+        """Serve in the calling thread until Ctrl-C"""
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def query(self, params):
+        """
+        Answer one request
+
+        Args:
+            params (dict): Query parameters, single values
+
+        Returns:
+            tuple: (HTTP status, response body dict)
+        """
+        if not params.get('apiKey'):
+            return 401, {'status': 'ERROR', 'error': 'Unknown API Key'}
+
+        if 'cursor' in params:
+            state = json.loads(base64.urlsafe_b64decode(params['cursor']))
+        else:
+            state = {
+                'filters': {key: value for key, value in params.items() if key.startswith('ticker')},
+                'limit': min(int(params.get('limit', 100)), 1000),
+                'offset': 0,
+            }
+
+        filters = state['filters']
+        lo, hi = 0, len(self.keys)
+        if 'ticker' in filters:
+            lo = bisect.bisect_left(self.keys, filters['ticker'])
+            hi = bisect.bisect_right(self.keys, filters['ticker'])
+        if 'ticker.gte' in filters:
+            lo = max(lo, bisect.bisect_left(self.keys, filters['ticker.gte']))
+        if 'ticker.gt' in filters:
+            lo = max(lo, bisect.bisect_right(self.keys, filters['ticker.gt']))
+        if 'ticker.lt' in filters:
+            hi = min(hi, bisect.bisect_left(self.keys, filters['ticker.lt']))
+        if 'ticker.lte' in filters:
+            hi = min(hi, bisect.bisect_right(self.keys, filters['ticker.lte']))
+
+        start = lo + state['offset']
+        end = min(start + state['limit'], hi)
+        body = {'results': self.records[start:end], 'status': 'OK', 'count': max(end - start, 0)}
+        if end < hi:
+            cursor = base64.urlsafe_b64encode(json.dumps({**state, 'offset': end - lo}).encode()).decode()
+            body['next_url'] = f"{self.url}?cursor={cursor}"
+        return 200, body
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                with server._lock:
+                    server.requests += 1
+                    error = server.errors.pop(server.requests, None)
+                time.sleep(server.latency)
+
+                if error:
+                    status, body = error, {'status': 'ERROR', 'error': f"Injected {error} response"}
+                elif parsed.path != TICKERS_PATH:
+                    status, body = 404, {'status': 'NOT_FOUND'}
+                else:
+                    params = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+                    status, body = server.query(params)
+
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                if status == 429:
+                    self.send_header('Retry-After', str(server.retry_after))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description='Mock Polygon tickers endpoint and partitioned fetch benchmark')
+    parser.add_argument('--tickers', type=int, default=10000, help='Number of tickers (default: 10000)')
+    parser.add_argument('--latency', type=float, default=0.1, help='Seconds per response (default: 0.1)')
+    parser.add_argument('--limit', type=int, default=1000, help='Results per page (default: 1000)')
+    parser.add_argument('--partitions', type=int, default=4, help='Ticker ranges for the concurrent fetch (default: 4)')
+    parser.add_argument('--serve', action='store_true', help='Only serve the endpoint until Ctrl-C')
+    parser.add_argument('--port', type=int, default=8765, help='Port for --serve (default: 8765)')
+    args = parser.parse_args()
+
+    records = make_tickers(args.tickers)
+
+    if args.serve:
+        server = MockPolygonServer(records, args.latency, port=args.port)
+        print(f"Serving {len(records)} records at {server.url}")
+        server.serve_forever()
+        return
+
+    results = {}
+    with MockPolygonServer(records, args.latency) as server:
+        for partitions in (1, args.partitions):
+            requests_before = server.requests
+            start = time.perf_counter()
+            data = get_polygon_tickers_data(server.url, partitions=partitions, api_key='mock',
+                                            limit=args.limit, sort='ticker', order='asc')
+            elapsed = time.perf_counter() - start
+            results[partitions] = data
+            print(f"{partitions} partition(s): {elapsed:.2f}s, {len(data)} records, "
+                  f"{server.requests - requests_before} requests")
+
+    if results[1] != results[args.partitions]:
+        raise SystemExit("Partitioned fetch returned different records")
+    single = clean_up_data(pd.DataFrame(results[1])).reset_index(drop=True)
+    partitioned = clean_up_data(pd.DataFrame(results[args.partitions])).reset_index(drop=True)
+    if not single.equals(partitioned):
+        raise SystemExit("Partitioned fetch cleaned to different records")
+    print(f"Both fetches returned the same {len(results[1]):,} records, {len(single):,} after clean_up_data")
+
+if __name__ == "__main__":
+    main()
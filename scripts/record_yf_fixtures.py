@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Record yfinance Fixtures
+
+Saves the frames yfinance returns for a few tickers as CSV fixtures for the
+offline tests in tests/test_yf.py: one yf.download(group_by='ticker') result
+and the Ticker.history() result of every ticker. SOLV was listed on
+2024-04-01, so the batch frame has empty rows for it before that date, and
+^VIX covers the VIX symbol mapping. Needs network access.
+
+Usage:
+    python -m scripts.record_yf_fixtures
+"""
+import os
+import yfinance as yf
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tests', 'fixtures')
+SYMBOLS = ['AAPL', '^VIX', 'SOLV']
+START = '2024-03-25'
+END = '2024-04-06'
+
+def main():
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    data = yf.download(SYMBOLS, start=START, end=END, group_by='ticker', auto_adjust=True, actions=True,
+                       threads=False, progress=False)
+    data.to_csv(os.path.join(FIXTURES_DIR, 'yf_download_group_by_ticker.csv'))
+    print(f"Recorded yf.download: {data.shape}")
+
+    for symbol in SYMBOLS:
+        history = yf.Ticker(symbol).history(start=START, end=END)
+        history.to_csv(os.path.join(FIXTURES_DIR, f"yf_history_{symbol.lstrip('^')}.csv"))
+        print(f"Recorded {symbol} history: {history.shape}")
+
+if __name__ == "__main__":
+    main()
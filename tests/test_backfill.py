@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+import enriching.backfill as backfill
+from enriching.backfill import merge_gaps, plan_backfill
+from utils.db_utils import DatabaseManager
+
+SESSIONS = pd.bdate_range('2024-01-01', periods=60).values.astype('datetime64[D]')
+
+def session(idx):
+    return str(SESSIONS[idx])
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    """
+    Stocks database with these bars (session indexes, inclusive):
+        AAA  active    0-9, 12-14, 30-39
+        BBB  delisted  5-7, 10-20
+        CCC  active    none
+        DDD  delisted  none
+        EEE  unknown   0-59
+    """
+    monkeypatch.setattr(backfill, 'get_sessions', lambda: SESSIONS)
+    manager = DatabaseManager(str(tmp_path / 'test.db'))
+    bars = {
+        1: [*range(0, 10), *range(12, 15), *range(30, 40)],
+        2: [*range(5, 8), *range(10, 21)],
+        5: list(range(0, 60)),
+    }
+    with manager.connection() as conn:
+        conn.execute("CREATE TABLE stocks (id INTEGER PRIMARY KEY, ticker TEXT, active INTEGER)")
+        conn.executemany("INSERT INTO stocks VALUES (?, ?, ?)",
+                         [(1, 'AAA', 1), (2, 'BBB', 0), (3, 'CCC', 1), (4, 'DDD', 0), (5, 'EEE', None)])
+        conn.execute("CREATE TABLE stocks_ohlcv_daily (asset_id INTEGER, datetime TEXT, open REAL, high REAL, "
+                     "low REAL, close REAL, volume INTEGER)")
+        conn.executemany("INSERT INTO stocks_ohlcv_daily VALUES (?, ?, 1, 1, 1, 1, 100)",
+                         [(asset_id, session(idx)) for asset_id, idxs in bars.items() for idx in idxs])
+    return manager
+
+def plan_ranges(plan):
+    return [(row.ticker, row.start, row.end, row.missing_sessions) for row in plan.itertuples(index=False)]
+
+def expected_range(ticker, start_idx, end_idx, missing):
+    # Plan end dates are exclusive, one day after the last missing session
+    return (ticker, session(start_idx), str(SESSIONS[end_idx] + 1), missing)
+
+def test_merge_gaps():
+    asset_ids = np.array([2, 1, 1, 1, 2])
+    gap_starts = np.array([5, 20, 3, 10, 15])
+    gap_ends = np.array([6, 25, 4, 12, 15])
+
+    # Gaps of asset 1 are 5 and 7 stored sessions apart, those of asset 2 eight
+    ids, starts, ends, missing = merge_gaps(asset_ids, gap_starts, gap_ends, merge_gap=5)
+    assert ids.tolist() == [1, 1, 2, 2]
+    assert starts.tolist() == [3, 20, 5, 15]
+    assert ends.tolist() == [12, 25, 6, 15]
+    assert missing.tolist() == [5, 6, 2, 1]
+
+    ids, starts, ends, missing = merge_gaps(asset_ids, gap_starts, gap_ends, merge_gap=0)
+    assert len(ids) == 5 and missing.sum() == 14
+
+    assert all(len(part) == 0 for part in merge_gaps(np.array([]), np.array([]), np.array([])))
+
+def test_plan_gaps_and_tail(manager):
+    plan = plan_backfill('stocks', end_date=session(49), merge_gap=5, manager=manager)
+
+    assert plan_ranges(plan) == [
+        # 10-11 and 15-29 are 3 stored sessions apart
+        expected_range('AAA', 10, 29, 17),
+        expected_range('AAA', 40, 49, 10),
+        # Interior gaps of delisted assets are planned, the tail after the last bar is not
+        expected_range('BBB', 8, 9, 2),
+    ]
+
+def test_plan_head_and_empty_assets(manager):
+    plan = plan_backfill('stocks', start_date=session(2), end_date=session(49), merge_gap=5, manager=manager)
+
+    assert plan_ranges(plan) == [
+        expected_range('AAA', 10, 29, 17),
+        expected_range('AAA', 40, 49, 10),
+        # Head 2-4 and gap 8-9 are 3 stored sessions apart
+        expected_range('BBB', 2, 9, 5),
+        # Only listed assets without bars are planned
+        expected_range('CCC', 2, 49, 48),
+    ]
+
+def test_plan_clips_to_end_date(manager):
+    plan = plan_backfill('stocks', end_date=session(11), manager=manager)
+    assert plan_ranges(plan) == [expected_range('AAA', 10, 11, 2), expected_range('BBB', 8, 9, 2)]
+
+def test_plan_ticker_list(manager):
+    plan = plan_backfill('stocks', start_date=session(0), end_date=session(49), ticker_list=['CCC', 'DDD'],
+                         manager=manager)
+    assert plan_ranges(plan) == [expected_range('CCC', 0, 49, 50)]
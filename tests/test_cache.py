@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+from api.cache import CACHE_COLUMNS, DiskCache
+
+DATES = pd.bdate_range('2024-01-01', '2024-03-29')
+
+class FakeProvider:
+    """Deterministic download_ticker stand-in that records every request"""
+
+    def __init__(self, factor=1.0, extra_columns=True):
+        self.factor = factor
+        self.extra_columns = extra_columns
+        self.empty = False
+        self.calls = []
+
+    def __call__(self, ticker, start=None, end=None):
+        self.calls.append((start, end))
+        if self.empty:
+            return pd.DataFrame()
+        dates = DATES[(DATES >= start) & (DATES < end)]
+        close = (100 + np.arange(len(DATES), dtype=float))[DATES.isin(dates)] * self.factor
+        df = pd.DataFrame({
+            'date': dates.strftime('%Y-%m-%d'),
+            'open': close - 1,
+            'high': close + 1,
+            'low': close - 2,
+            'close': close,
+            'volume': np.full(len(dates), 1000, dtype='int64'),
+        })
+        if self.extra_columns:
+            df['dividends'] = 0.0
+            df['stock splits'] = 0.0
+            df['capital gains'] = 0.0
+        df['year'] = dates.year
+        df['month'] = dates.month
+        df['week'] = dates.isocalendar().week.to_numpy()
+        df['ticker'] = ticker
+        return df
+
+@pytest.fixture
+def cache(tmp_path):
+    return DiskCache(str(tmp_path), ttl=900)
+
+def test_extends_edges_with_one_overlapping_bar(cache):
+    provider = FakeProvider()
+    cache.get('AAA', provider, start='2024-02-01', end='2024-02-15')
+    df = cache.get('AAA', provider, start='2024-01-15', end='2024-03-01')
+
+    assert provider.calls[1:] == [('2024-01-15', '2024-02-02'), ('2024-02-14', '2024-03-01')]
+    expected = provider('AAA', start='2024-01-15', end='2024-03-01')
+    assert df['date'].tolist() == expected['date'].tolist()
+    assert np.array_equal(df['close'], expected['close'])
+    assert list(df.columns[1:8]) == list(CACHE_COLUMNS)
+
+    provider.calls.clear()
+    cache.get('AAA', provider, start='2024-01-20', end='2024-02-20')
+    assert provider.calls == []
+
+def test_empty_download_is_not_cached(cache):
+    provider = FakeProvider()
+    provider.empty = True
+    assert cache.get('AAA', provider, start='2024-02-01', end='2024-02-15').empty
+
+    provider.empty = False
+    df = cache.get('AAA', provider, start='2024-02-01', end='2024-02-15')
+    assert len(provider.calls) == 2
+    assert len(df) == 10
+
+def test_empty_edge_keeps_coverage(cache):
+    provider = FakeProvider()
+    cache.get('AAA', provider, start='2024-02-01', end='2024-02-15')
+    provider.empty = True
+    df = cache.get('AAA', provider, start='2024-02-01', end='2024-03-01')
+    assert len(df) == 10
+
+    provider.empty = False
+    df = cache.get('AAA', provider, start='2024-02-01', end='2024-03-01')
+    assert df['date'].iloc[-1] == '2024-02-29'
+
+def test_pinned_columns_when_download_columns_change(cache):
+    cache.get('AAA', FakeProvider(extra_columns=False), start='2024-02-01', end='2024-02-15')
+    df = cache.get('AAA', FakeProvider(extra_columns=True), start='2024-02-01', end='2024-03-01')
+
+    assert 'capital gains' not in df.columns
+    assert (df['dividends'] == 0).all()
+    assert df['volume'].dtype == 'int64'
+    assert str(df['week'].dtype) == 'UInt32'
+
+def test_readjusted_history_invalidates_entry(cache):
+    cache.get('AAA', FakeProvider(), start='2024-01-02', end='2024-02-01')
+    adjusted = FakeProvider(factor=0.5)
+    df = cache.get('AAA', adjusted, start='2024-01-02', end='2024-03-01')
+
+    # The tail check found the adjustment, then the whole range was fetched again
+    assert adjusted.calls[-1] == ('2024-01-02', '2024-03-01')
+    expected = adjusted('AAA', start='2024-01-02', end='2024-03-01')
+    assert np.array_equal(df['close'], expected['close'])
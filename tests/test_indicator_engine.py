@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+from indicators import adr, adv, sma
+from indicators.engine import calculate_indicators, rolling_mean
+
+REFERENCE = {'sma': sma, 'adv': adv, 'adr': adr}
+
+def make_ohlcv(lengths, seed=0):
+    """Stacked OHLCV of tickers T0, T1, ... with the given number of bars each"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for i, length in enumerate(lengths):
+        close = 50 + rng.normal(0, 1, length).cumsum()
+        open_ = close + rng.normal(0, 0.5, length)
+        frames.append(pd.DataFrame({
+            'ticker': f"T{i}",
+            'date': pd.bdate_range('2024-01-02', periods=length).strftime('%Y-%m-%d'),
+            'open': open_,
+            'high': np.maximum(open_, close) + rng.uniform(0, 1, length),
+            'low': np.minimum(open_, close) - rng.uniform(0, 1, length),
+            'close': close,
+            'volume': rng.integers(1000, 100000, length).astype('float64'),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+def reference_indicators(df, indicators):
+    """The per-ticker indicator modules, applied one ticker at a time"""
+    columns = {}
+    for name, periods in indicators.items():
+        for period in periods:
+            values = pd.Series(np.nan, index=df.index)
+            for _, group in df.groupby('ticker', sort=False):
+                values.loc[group.index] = REFERENCE[name].calculate_indicator(group, period)[name]
+            columns[f"{name}_{period}"] = values.to_numpy()
+    return pd.DataFrame(columns, index=df.index)
+
+INDICATORS = {'sma': [5, 20], 'adv': [10], 'adr': [3, 20]}
+
+def assert_matches_reference(df, indicators=INDICATORS):
+    result = calculate_indicators(df, indicators)
+    expected = reference_indicators(df, indicators)
+    assert list(result.columns) == list(expected.columns)
+    pd.testing.assert_index_equal(result.index, expected.index)
+    np.testing.assert_allclose(result.to_numpy(), expected.to_numpy(), rtol=1e-9, equal_nan=True)
+
+def test_matches_per_ticker_modules():
+    assert_matches_reference(make_ohlcv([60, 45, 80]))
+
+def test_short_groups():
+    # T1 and T3 have fewer bars than the 20-bar windows, T2 exactly as many
+    df = make_ohlcv([40, 4, 20, 1, 30])
+    assert_matches_reference(df)
+    assert calculate_indicators(df, {'sma': [20]})[df['ticker'] == 'T2']['sma_20'].notna().sum() == 1
+
+def test_nan_inputs():
+    df = make_ohlcv([50, 50])
+    df.loc[[3, 30], 'close'] = np.nan
+    df.loc[[10, 70], 'volume'] = np.nan
+    df.loc[[55], 'open'] = np.nan
+    df.loc[[60], 'high'] = np.nan
+    assert_matches_reference(df)
+
+def test_interleaved_tickers():
+    df = make_ohlcv([30, 25, 35])
+    # Interleave the tickers by date, keeping each ticker in chronological order
+    interleaved = df.sort_values(['date', 'ticker'], kind='stable')
+    assert_matches_reference(interleaved)
+
+def test_unknown_indicator():
+    with pytest.raises(ValueError):
+        calculate_indicators(make_ohlcv([10]), {'rsi': [14]})
+
+def test_rolling_mean_matches_pandas():
+    values = np.array([1.0, 2.0, np.nan, 4.0, 5.0, 6.0, 7.0, np.nan, 9.0, 10.0, 11.0])
+    expected = pd.Series(values).rolling(window=3).mean().to_numpy()
+    np.testing.assert_allclose(rolling_mean(values, 3), expected, equal_nan=True)
+    assert np.isnan(rolling_mean(values[:2], 3)).all()
+    assert len(rolling_mean(np.array([]), 3)) == 0
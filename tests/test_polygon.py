@@ -0,0 +1,107 @@
+import time
+import pandas as pd
+import pytest
+import requests
+from enriching.get_stocks_polygon import (
+    clean_up_data, create_session, get_polygon_tickers_data, ingest_polygon_tickers, iter_polygon_ticker_pages
+)
+from scripts.mock_polygon_server import MockPolygonServer, make_tickers
+from utils.db_utils import DatabaseManager
+
+RECORDS = make_tickers(120, null_cik_rate=0.05, duplicate_rate=0.1, seed=7)
+
+def split_duplicate_limit():
+    """Page size that puts the two records of a duplicated ticker, both with a CIK, on different pages"""
+    for i in range(20, len(RECORDS) - 1):
+        first, second = RECORDS[i], RECORDS[i + 1]
+        if first['ticker'] == second['ticker'] and first['cik'] and second['cik']:
+            return first['ticker'], i + 1
+    raise AssertionError("No duplicated ticker with a CIK in the synthetic records")
+
+DUPLICATE, LIMIT = split_duplicate_limit()
+PAGES = -(-len(RECORDS) // LIMIT)
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    # Ingestion reads the key from the environment, so it is not stored in the job journal
+    monkeypatch.setenv('POLYGON_API_KEY', 'test')
+    return DatabaseManager(str(tmp_path / 'polygon.db'))
+
+def ingest(server, manager, **kwargs):
+    return ingest_polygon_tickers('stocks', base_url=server.url, manager=manager, limit=LIMIT, **kwargs)
+
+def stored_tickers(manager):
+    return manager.fetch_df("SELECT ticker, name FROM stocks ORDER BY ticker")
+
+def test_pages_stream_in_order():
+    with MockPolygonServer(RECORDS, latency=0) as server:
+        pages = list(iter_polygon_ticker_pages(server.url, api_key='test', limit=LIMIT))
+
+    assert len(pages) == server.requests == PAGES
+    assert [record for results, _, _ in pages for record in results] == RECORDS
+    assert all(next_url for _, next_url, _ in pages[:-1])
+    assert pages[-1][1] is None
+
+def test_ingest_drops_duplicates_across_pages(manager):
+    with MockPolygonServer(RECORDS, latency=0) as server:
+        result = ingest(server, manager)
+
+    expected = clean_up_data(pd.DataFrame(RECORDS))
+    stored = stored_tickers(manager)
+    assert result['pages'] == PAGES
+    assert stored['ticker'].tolist() == expected['ticker'].tolist()
+    # The first record of the ticker is kept, the copy on the next page is dropped
+    assert stored.loc[stored['ticker'] == DUPLICATE, 'name'].tolist() == [f"{DUPLICATE} Corp"]
+
+def test_ingest_resumes_after_a_failing_page(manager):
+    with MockPolygonServer(RECORDS, latency=0) as server:
+        complete = ingest(server, DatabaseManager(str(manager.db_path) + '.complete'))
+
+    # The third page fails with a status the session does not retry
+    with MockPolygonServer(RECORDS, latency=0, errors={3: 400}) as server:
+        with pytest.raises(requests.HTTPError):
+            ingest(server, manager)
+        assert len(stored_tickers(manager)) > 0
+
+        requests_before = server.requests
+        resumed = ingest(server, manager, resume=True)
+        # Only the failed page and the ones after it are requested again
+        assert resumed['pages'] == server.requests - requests_before == PAGES - 2
+
+    assert stored_tickers(manager).equals(stored_tickers(DatabaseManager(str(manager.db_path) + '.complete')))
+    assert len(complete['inserted']) == len(stored_tickers(manager))
+
+def test_throttled_pages_are_retried_after_retry_after():
+    # Retry-After (1s) is used instead of the 60s backoff
+    session = create_session(retries=2, backoff=60)
+    with MockPolygonServer(RECORDS, latency=0, errors={2: 429, 3: 429}) as server:
+        start = time.perf_counter()
+        pages = list(iter_polygon_ticker_pages(server.url, api_key='test', session=session, limit=LIMIT))
+        elapsed = time.perf_counter() - start
+
+    assert [record for results, _, _ in pages for record in results] == RECORDS
+    assert [retries for _, _, retries in pages] == [0, 2] + [0] * (PAGES - 2)
+    assert elapsed < 10
+
+def test_throttling_past_the_retries_raises():
+    session = create_session(retries=1, backoff=0)
+    with MockPolygonServer(RECORDS, latency=0, errors={1: 429, 2: 429}, retry_after=0) as server:
+        with pytest.raises(requests.HTTPError, match="429"):
+            list(iter_polygon_ticker_pages(server.url, api_key='test', session=session, limit=LIMIT))
+        assert server.requests == 2
+
+@pytest.mark.parametrize('partitions, boundaries', [(4, None), (3, [DUPLICATE, 'M'])])
+def test_partitioned_fetch_matches_a_single_range(partitions, boundaries):
+    with MockPolygonServer(RECORDS, latency=0) as server:
+        single = get_polygon_tickers_data(server.url, api_key='test', limit=LIMIT, sort='ticker')
+        partitioned = get_polygon_tickers_data(server.url, partitions=partitions, boundaries=boundaries,
+                                               api_key='test', limit=LIMIT, sort='ticker')
+
+    assert single == RECORDS
+    assert partitioned == single
+    assert clean_up_data(pd.DataFrame(partitioned)).equals(clean_up_data(pd.DataFrame(single)))
+
+def test_partitions_reject_ticker_filters():
+    with pytest.raises(ValueError, match="ticker filters"):
+        get_polygon_tickers_data('http://127.0.0.1:1/v3/reference/tickers', partitions=2, api_key='test',
+                                 **{'ticker.gte': 'M'})
@@ -0,0 +1,80 @@
+import sqlite3
+import pandas as pd
+import pytest
+from backtests.utils.backtest_data_to_db import build_run_results
+from backtests.utils.result_writer import ResultWriter
+from utils.db_utils import DatabaseManager
+
+EXECUTION_COLUMNS = ['execution_timestamp', 'date', 'time_of_day', 'order_id', 'symbol', 'side', 'quantity',
+                     'price', 'trade_id', 'is_entry', 'is_exit', 'commission', 'order_type',
+                     'net_cash_with_billable']
+TRADE_COLUMNS = ['trade_id', 'num_executions', 'symbol', 'start_date', 'start_time', 'end_date', 'end_time',
+                 'duration_hours', 'quantity', 'entry_price', 'stop_price', 'exit_price', 'capital_required',
+                 'exit_type', 'take_profit_price', 'risk_reward', 'is_winner', 'perc_return', 'week', 'month',
+                 'year', 'risk_per_trade_perc', 'day', 'commission', 'direction', 'status']
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = DatabaseManager(str(tmp_path / 'results.db'))
+    with manager.connection() as conn:
+        conn.execute("CREATE TABLE backtest_runs (run_id INTEGER PRIMARY KEY AUTOINCREMENT, strategy_name TEXT)")
+        conn.execute(f"CREATE TABLE backtest_executions (run_id INTEGER, {', '.join(EXECUTION_COLUMNS)})")
+        # A trade without a symbol fails the insert
+        trade_columns = ['symbol TEXT NOT NULL' if column == 'symbol' else column for column in TRADE_COLUMNS]
+        conn.execute(f"CREATE TABLE backtest_trades (run_id INTEGER, {', '.join(trade_columns)})")
+    return manager
+
+def make_run(name, symbol):
+    """One run with a buy and a sell of symbol, as processed by the backtest pipeline"""
+    settings = pd.DataFrame({'strategy_name': [name]})
+    executions = pd.DataFrame({
+        'execution_timestamp': ['2024-01-03 09:30:00', '2024-01-05 09:30:00'],
+        'date': ['2024-01-03', '2024-01-05'],
+        'time_of_day': ['09:30:00', '09:30:00'],
+        'order_id': ['1', '2'],
+        'symbol': [symbol, symbol],
+        'side': ['buy', 'sell'],
+        'quantity': [10, 10],
+        'price': [100.0, 105.0],
+        'trade_id': [1, 1],
+        'is_entry': [True, False],
+        'is_exit': [False, True],
+        'type': ['market', 'market'],
+    })
+    trades = pd.DataFrame({column: [0] for column in TRADE_COLUMNS})
+    trades['trade_id'] = 1
+    trades['symbol'] = symbol
+    return settings, executions, trades
+
+def count_rows(manager):
+    with sqlite3.connect(manager.db_path) as conn:
+        return {table: conn.execute(f"SELECT run_id, COUNT(*) FROM {table} GROUP BY run_id").fetchall()
+                for table in ('backtest_runs', 'backtest_executions', 'backtest_trades')}
+
+def test_failing_run_is_rolled_back_alone(manager):
+    with ResultWriter(batch_size=10, flush_interval=5, manager=manager) as writer:
+        good = writer.submit(*make_run('good', 'AAA'))
+        bad = writer.submit(*make_run('bad', None))
+        later = writer.submit(*make_run('later', 'BBB'))
+
+    assert good.result() == 1
+    with pytest.raises(sqlite3.IntegrityError):
+        bad.result()
+    # The bad run's parent row, with its id, and executions were rolled back with its trade
+    assert later.result() == 2
+    assert writer.runs_written == 2
+    assert count_rows(manager) == {
+        'backtest_runs': [(1, 1), (2, 1)],
+        'backtest_executions': [(1, 2), (2, 2)],
+        'backtest_trades': [(1, 1), (2, 1)],
+    }
+
+def test_insert_run_results_is_all_or_nothing_by_default(manager):
+    runs = [build_run_results(*make_run('good', 'AAA')), build_run_results(*make_run('bad', None))]
+
+    with pytest.raises(sqlite3.IntegrityError):
+        manager.insert_run_results(runs, 'backtest_runs', 'run_id')
+    assert count_rows(manager) == {'backtest_runs': [], 'backtest_executions': [], 'backtest_trades': []}
+
+    run_ids = manager.insert_run_results(runs[:1], 'backtest_runs', 'run_id')
+    assert run_ids == [1]
@@ -0,0 +1,21 @@
+import pytest
+from scripts.benchmark_screening import THRESHOLDS, build_synthetic_db, screen_with_pandas
+from utils.db_utils import DatabaseManager
+
+@pytest.fixture(scope='module')
+def db(tmp_path_factory):
+    db_path = tmp_path_factory.mktemp('screening') / 'synthetic.db'
+    build_synthetic_db(str(db_path), n_tickers=60, n_years=1)
+    return DatabaseManager(str(db_path))
+
+@pytest.mark.parametrize('start_date', [None, '2024-09-02'])
+def test_sql_screen_matches_pandas(db, start_date):
+    pandas_tickers, pandas_pairs = screen_with_pandas(db, start_date)
+    sql_tickers = db.screen_universe(start_date=start_date, **THRESHOLDS)
+    sql_pairs = db.screen_universe(start_date=start_date, daily=True, **THRESHOLDS)
+
+    # The thresholds split the synthetic universe
+    assert 0 < len(sql_tickers) < 60
+    assert len(sql_pairs) > 0
+    assert sql_tickers == pandas_tickers
+    assert sql_pairs[['datetime', 'ticker']].equals(pandas_pairs)
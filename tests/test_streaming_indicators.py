@@ -0,0 +1,77 @@
+import math
+import numpy as np
+import pandas as pd
+import pytest
+from indicators.engine import calculate_indicators
+from indicators.streaming import ADR, ADV, SMA
+
+STREAMING = [SMA, ADV, ADR]
+
+def make_bars(length=200, seed=0):
+    """Random OHLCV bars with a few NaN fields"""
+    rng = np.random.default_rng(seed)
+    close = 50 + rng.normal(0, 1, length).cumsum()
+    open_ = close + rng.normal(0, 0.5, length)
+    df = pd.DataFrame({
+        'open': open_,
+        'high': np.maximum(open_, close) + rng.uniform(0, 1, length),
+        'low': np.minimum(open_, close) - rng.uniform(0, 1, length),
+        'close': close,
+        'volume': rng.integers(1000, 100000, length).astype('float64'),
+    })
+    for column in df.columns:
+        df.loc[rng.choice(length, 3, replace=False), column] = np.nan
+    return df
+
+def stream(indicator, df):
+    return np.array([indicator.update(bar) for bar in df.to_dict('records')])
+
+@pytest.mark.parametrize('indicator_class', STREAMING)
+@pytest.mark.parametrize('period', [1, 3, 7, 20])
+def test_matches_batch_engine(indicator_class, period):
+    # 200 bars run the ring buffer through many laps, with NaN bars and the warm-up
+    df = make_bars()
+    expected = calculate_indicators(df, {indicator_class.name: [period]})[f"{indicator_class.name}_{period}"]
+
+    values = stream(indicator_class(period), df)
+
+    np.testing.assert_allclose(values, expected.to_numpy(), rtol=1e-12, equal_nan=True)
+    assert np.isnan(values[:period - 1]).all()
+
+@pytest.mark.parametrize('indicator_class', STREAMING)
+@pytest.mark.parametrize('history', [0, 5, 13, 60])
+def test_warm_up_then_update(indicator_class, history):
+    period = 10
+    df = make_bars(seed=1)
+    expected = calculate_indicators(df, {indicator_class.name: [period]})[f"{indicator_class.name}_{period}"].to_numpy()
+
+    indicator = indicator_class(period)
+    warm_value = indicator.warm_up(df.iloc[:history])
+    values = stream(indicator, df.iloc[history:])
+
+    if history:
+        np.testing.assert_allclose(warm_value, expected[history - 1], rtol=1e-12, equal_nan=True)
+    np.testing.assert_allclose(values, expected[history:], rtol=1e-12, equal_nan=True)
+
+def test_lap_recompute_removes_rounding_drift():
+    # Adding and removing 1e16 loses the ones kept in the running sum, the sum is
+    # recomputed from the window once per lap
+    indicator = SMA(4)
+    values = [indicator.update_value(value) for value in [1e16, 1.0, 1.0, 1.0] + [1.0] * 12]
+    assert values[3] == (1e16 + 3) / 4
+    assert values[7] == values[11] == values[15] == 1.0
+
+def test_nan_leaves_the_window():
+    indicator = ADV(3)
+    values = [indicator.update({'volume': volume}) for volume in [1.0, math.nan, 2.0, 3.0, 4.0, 5.0]]
+    np.testing.assert_allclose(values, [math.nan] * 4 + [3.0, 4.0], equal_nan=True)
+
+def test_reset_and_period_check():
+    indicator = SMA(2)
+    indicator.update_value(1.0)
+    indicator.update_value(3.0)
+    assert indicator.value == 2.0
+    indicator.reset()
+    assert math.isnan(indicator.update_value(5.0))
+    with pytest.raises(ValueError):
+        SMA(0)
@@ -0,0 +1,60 @@
+import sys
+import types
+import pandas as pd
+import pytest
+import backtests.sweep_runner as sweep_runner
+from backtests.sweep_runner import prepare_shared_data, run_parameter_set
+
+class Strategy:
+    parameters = {'data_source': 'polygon'}
+    runs = []
+
+    @classmethod
+    def prepare_shared_data(cls):
+        if cls.parameters.get('adr_threshold') is None:
+            raise ValueError("No threshold")
+        return {'universe_hash': f"universe-{cls.parameters['adr_threshold']}"}
+
+    @classmethod
+    def run_strategy(cls):
+        cls.runs.append(dict(cls.parameters))
+
+    @classmethod
+    def rename_custom_logs(cls):
+        pass
+
+@pytest.fixture
+def report_calls(monkeypatch):
+    """Run a no-op strategy module and record the benchmark flag of its reports"""
+    monkeypatch.setitem(sys.modules, 'sweep_test_strategy', types.SimpleNamespace(Strategy=Strategy))
+    monkeypatch.setattr(sweep_runner, 'get_latest_trades_files', lambda: 'trades.csv')
+    monkeypatch.setattr(sweep_runner, 'process_data', lambda trades_file: (pd.DataFrame(), pd.DataFrame()))
+    monkeypatch.setattr(sweep_runner, 'summarize_reports', lambda reports: {})
+    calls = []
+
+    def generate_reports(trades_df, benchmark=True):
+        calls.append(benchmark)
+        return {'week': pd.DataFrame()}
+
+    monkeypatch.setattr(sweep_runner, 'generate_reports', generate_reports)
+    return calls
+
+@pytest.mark.parametrize('data_source, benchmark', [('local', False), ('vector', False), ('polygon', True)])
+def test_offline_runs_skip_the_benchmark(tmp_path, report_calls, data_source, benchmark):
+    result = run_parameter_set('sweep_test_strategy', {'data_source': data_source}, str(tmp_path / data_source))
+
+    assert result['status'] == 'completed'
+    assert report_calls == [benchmark]
+
+def test_shared_data_is_prepared_once_per_run_and_passed_to_the_worker(tmp_path, report_calls, monkeypatch):
+    monkeypatch.setattr(Strategy, 'runs', [])
+    parameter_sets = [{'adr_threshold': 3.0}, {'adr_threshold': 4.0}, {'data_source': 'local'}]
+
+    shared = prepare_shared_data('sweep_test_strategy', parameter_sets)
+    # The failing preparation is left to the worker
+    assert shared == [{'universe_hash': 'universe-3.0'}, {'universe_hash': 'universe-4.0'}, {}]
+
+    result = run_parameter_set('sweep_test_strategy', parameter_sets[1], str(tmp_path / 'run'), shared[1])
+    assert Strategy.runs[-1]['universe_hash'] == 'universe-4.0'
+    # The result keeps only the overrides, so resuming compares the same parameters
+    assert result['parameters'] == {'adr_threshold': 4.0}
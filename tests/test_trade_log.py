@@ -0,0 +1,85 @@
+import pandas as pd
+from lumibot.strategies.strategy import Strategy
+from backtests.utils.backtest_functions import BaseStrategy
+from backtests.utils.trade_log import TRADE_LOG_COLUMNS, TradeLogWriter
+
+def make_fill(i):
+    """A fill as BaseStrategy._on_filled_order logs it"""
+    return {
+        'name': 'Strategy',
+        'order_id': f"order-{i}",
+        'symbol': 'AAA' if i % 2 else 'BBB',
+        'price': 100.0 + i / 4,
+        'quantity': 10 + i,
+        'side': 'buy' if i % 3 else 'sell',
+        'timestamp': pd.Timestamp('2024-01-02 09:30', tz='America/New_York') + pd.Timedelta(days=i),
+        'stop_loss': None if i % 2 else 95.5,
+        'take_profit': None,
+        'status': 'fill',
+        'type': 'market',
+        'risk_per_trade': None,
+    }
+
+def read_rows(path):
+    return pd.read_csv(path) if path.exists() else pd.DataFrame(columns=TRADE_LOG_COLUMNS)
+
+def test_rows_are_written_every_buffer_size(tmp_path):
+    writer = TradeLogWriter(tmp_path / 'logs' / 'trades.csv', buffer_size=3)
+    for i in range(7):
+        writer.append(make_fill(i))
+
+    assert len(writer) == 7
+    assert writer.rows_written == 6
+    assert len(read_rows(writer.path)) == 6
+    assert writer.flush() == 1
+    assert writer.flush() == 0
+    assert len(read_rows(writer.path)) == 7
+
+def test_round_trip_matches_the_in_memory_log(tmp_path):
+    fills = [make_fill(i) for i in range(10)]
+    with TradeLogWriter(tmp_path / 'trades.csv', buffer_size=4) as writer:
+        for fill in fills:
+            writer.append(fill)
+
+    # The trade log used to be a list of dicts written once with to_csv
+    pd.DataFrame(fills).to_csv(tmp_path / 'in_memory.csv', index=False)
+    expected = pd.read_csv(tmp_path / 'in_memory.csv')
+
+    result = writer.to_dataframe()
+    assert list(result.columns) == TRADE_LOG_COLUMNS
+    pd.testing.assert_frame_equal(result, expected)
+
+def test_move_keeps_the_rows_and_appends_to_the_new_path(tmp_path):
+    writer = TradeLogWriter(tmp_path / 'run.csv', buffer_size=100)
+    for i in range(3):
+        writer.append(make_fill(i))
+
+    writer.move(tmp_path / 'final.csv')
+    assert not (tmp_path / 'run.csv').exists()
+    assert len(read_rows(tmp_path / 'final.csv')) == 3
+
+    writer.append(make_fill(3))
+    assert len(writer.to_dataframe()) == 4
+    assert writer.to_dataframe()['order_id'].tolist() == [f"order-{i}" for i in range(4)]
+
+def test_move_before_any_fill(tmp_path):
+    writer = TradeLogWriter(tmp_path / 'run.csv')
+    writer.move(tmp_path / 'final.csv')
+    assert writer.to_dataframe().empty
+    assert not (tmp_path / 'final.csv').exists()
+
+def test_crash_writes_the_buffered_fills(tmp_path, monkeypatch):
+    crashes = []
+    monkeypatch.setattr(Strategy, 'on_bot_crash', lambda self, error: crashes.append(error))
+    # Only the trade log writer is needed, so lumibot's initialization is skipped
+    strategy = object.__new__(BaseStrategy)
+    strategy._trade_log_writer = TradeLogWriter(tmp_path / 'trades.csv', buffer_size=100)
+    for i in range(5):
+        strategy._trade_log_writer.append(make_fill(i))
+    assert not (tmp_path / 'trades.csv').exists()
+
+    error = RuntimeError("broker disconnected")
+    strategy.on_bot_crash(error)
+
+    assert len(read_rows(tmp_path / 'trades.csv')) == 5
+    assert crashes == [error]
@@ -0,0 +1,34 @@
+import pandas as pd
+import pytest
+import analytics.trade_results as trade_results
+from analytics.trade_results import run_report
+
+SETTINGS = pd.DataFrame({'backtesting_start': ['2024-01-02'], 'backtesting_end': ['2024-03-01']})
+
+def make_trades():
+    dates = pd.to_datetime(['2024-01-03', '2024-01-10', '2024-02-05', '2024-02-20'])
+    return pd.DataFrame({
+        'start_date': dates.strftime('%Y-%m-%d'),
+        'year': dates.year.astype(str),
+        'month': dates.month.astype(str).str.zfill(2),
+        'week': dates.isocalendar().week.astype(str).str.zfill(2).to_numpy(),
+        'is_winner': [1, 0, 1, 1],
+        'risk_reward': [2.0, -1.0, 1.5, 0.5],
+        'risk_per_trade_perc': [0.01, 0.01, 0.02, 0.01],
+        'duration_hours': [6.5, 30.0, 6.5, 54.0],
+        'perc_return': [0.02, -0.01, 0.015, 0.005],
+    })
+
+@pytest.fixture
+def no_network(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("benchmark data was downloaded")
+    monkeypatch.setattr(trade_results, 'download_data', fail)
+
+@pytest.mark.parametrize('group_by', ['week', 'month', 'year'])
+def test_report_without_benchmark(no_network, group_by):
+    report = run_report(make_trades(), group_by, SETTINGS, benchmark=False)
+
+    assert list(report.columns[-2:]) == ['spy_perc_return', 'qqq_perc_return']
+    assert report[['spy_perc_return', 'qqq_perc_return']].isna().all().all()
+    assert report['nr_trades'].iloc[-1] == 4
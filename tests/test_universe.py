@@ -0,0 +1,82 @@
+import sqlite3
+import pandas as pd
+import pytest
+import backtests.utils.universe as universe
+import indicators.store as store
+from backtests.utils.universe import build_universe
+from indicators.engine import calculate_indicators
+from scripts.benchmark_screening import THRESHOLDS, build_synthetic_db
+from utils.db_utils import DatabaseManager
+
+SCREEN = {'min_volume': THRESHOLDS['min_volume'], 'min_adr': THRESHOLDS['min_adr'],
+          'min_price': THRESHOLDS['min_price']}
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    db_path = str(tmp_path / 'synthetic.db')
+    build_synthetic_db(db_path, n_tickers=20, n_years=1)
+    manager = DatabaseManager(db_path)
+    monkeypatch.setattr(universe, 'db_manager', manager)
+    monkeypatch.setattr(store, 'db', manager)
+    return db_path
+
+def append_session(db_path, day):
+    """Copy the last bar of every asset to a new session"""
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("""
+            INSERT INTO stocks_ohlcv_daily
+            SELECT asset_id, ?, open, high, low, close, volume FROM stocks_ohlcv_daily
+            WHERE datetime = (SELECT MAX(datetime) FROM stocks_ohlcv_daily)
+        """, (day,))
+
+def test_universe_is_reused_until_its_range_gets_new_bars(db_path):
+    open_ended = build_universe(**SCREEN, start_date='2024-06-03')
+    bounded = build_universe(**SCREEN, start_date='2024-06-03', end_date='2024-12-31')
+    assert build_universe(**SCREEN, start_date='2024-06-03') == open_ended
+    assert build_universe(**SCREEN, start_date='2024-06-03', end_date='2024-12-31') == bounded
+
+    append_session(db_path, '2025-01-02')
+
+    rebuilt = build_universe(**SCREEN, start_date='2025-01-01')
+    assert build_universe(**SCREEN, start_date='2024-06-03') != open_ended
+    # The new session is after the end date of the bounded universe
+    assert build_universe(**SCREEN, start_date='2024-06-03', end_date='2024-12-31') == bounded
+
+    passes = DatabaseManager(db_path).get_universe_passes(rebuilt, start_date='2025-01-02', end_date='2025-01-02')
+    assert len(passes) > 0
+
+def test_rewritten_bars_are_recomputed(db_path):
+    manager = DatabaseManager(db_path)
+    manager.ensure_ohlcv_unique_index('stocks')
+    bars = manager.fetch_df("SELECT * FROM stocks_ohlcv_daily WHERE asset_id IN (1, 2) ORDER BY asset_id, datetime")
+    # Asset 2 misses a bar that a later download backfills
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("DELETE FROM stocks_ohlcv_daily WHERE asset_id = 2 AND datetime = '2024-09-03'")
+    bounded = build_universe(**SCREEN, start_date='2024-06-03', end_date='2024-12-31')
+
+    # A full re-download of both assets, with a corrected bar for asset 1
+    bars.loc[(bars['asset_id'] == 1) & (bars['datetime'] == '2024-09-03'), 'high'] *= 1.5
+    assert manager.upsert_ohlcv('stocks', bars) == 2
+
+    assert build_universe(**SCREEN, start_date='2024-06-03', end_date='2024-12-31') != bounded
+    stored = manager.get_indicator_values('stocks', [('adv', 30), ('adr', 20)], tickers=['T00000', 'T00001'])
+    expected = calculate_indicators(stored, {'adv': [30], 'adr': [20]})
+    for column in ['adv_30', 'adr_20']:
+        pd.testing.assert_series_equal(stored[column], expected[column], check_names=False)
+
+def test_superseded_universes_are_deleted(db_path):
+    manager = DatabaseManager(db_path)
+    stale = build_universe(**SCREEN, start_date='2024-06-03')
+    bounded = build_universe(**SCREEN, start_date='2024-06-03', end_date='2024-12-31')
+    stricter = build_universe(**{**SCREEN, 'min_price': SCREEN['min_price'] * 2}, start_date='2024-06-03')
+
+    append_session(db_path, '2025-01-02')
+    current = build_universe(**SCREEN, start_date='2024-06-03')
+
+    # Only the universe of the same thresholds on the older data is deleted
+    assert current != stale
+    assert not manager.universe_exists(stale)
+    assert manager.fetch_df("SELECT COUNT(*) AS n FROM universe_daily WHERE params_hash = ?", [stale])['n'][0] == 0
+    for params_hash in (bounded, stricter, current):
+        assert manager.universe_exists(params_hash)
+        assert manager.fetch_df("SELECT COUNT(*) AS n FROM universe_daily WHERE params_hash = ?", [params_hash])['n'][0] > 0
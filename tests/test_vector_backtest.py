@@ -0,0 +1,181 @@
+import math
+import numpy as np
+import pandas as pd
+import pytest
+from backtests.utils.backtest_functions import BaseStrategy
+from backtests.utils.vector_backtest import (
+    GATE_FLATTEN, GATE_TRADE, BarPanel, run_vector_backtest, size_entries
+)
+
+DATES = pd.bdate_range('2024-01-02', periods=4).values.astype('datetime64[D]')
+TICKERS = np.array(['AAA', 'BBB', 'CCC'], dtype=object)
+
+def make_panel(open_price):
+    """Three tickers closing at 10 every day, opening at open_price"""
+    shape = (len(DATES), len(TICKERS))
+    return BarPanel(DATES, TICKERS, np.full(shape, open_price), np.full(shape, open_price + 1.0),
+                    np.full(shape, 9.0), np.full(shape, 10.0))
+
+def run(open_price, **parameters):
+    parameters = {
+        'backtesting_start': str(DATES[0]),
+        'backtesting_end': str(DATES[-1]),
+        'side': 'buy',
+        'position_pct': 0.5,
+        'budget': 1000,
+        **parameters,
+    }
+    entry_mask = np.zeros((len(DATES), len(TICKERS)), dtype=bool)
+    entry_mask[0] = True
+    gates = np.full(len(DATES), GATE_TRADE, dtype=np.int8)
+    return run_vector_backtest(make_panel(open_price), entry_mask, gates, parameters)
+
+def cash_after(trade_log, budget=1000):
+    signed = np.where(trade_log['side'] == 'buy', trade_log['quantity'], -trade_log['quantity'])
+    return budget - float(np.sum(signed * trade_log['price']))
+
+def test_size_entries():
+    prices = np.array([10.0, 12.0, np.nan, 1.0])
+    assert size_entries(10000, prices, 0.05).tolist() == [50, 41, 0, 500]
+    # 500 + 492 leaves 8 of the 1000 for the last entry
+    assert size_entries(1000, prices, 0.5).tolist() == [50, 41, 0, 8]
+    assert size_entries(1000, prices, 0.5, margin=True).tolist() == [50, 41, 0, 500]
+    assert size_entries(-5, prices, 0.5).tolist() == [0, 0, 0, 0]
+
+def test_buys_are_sized_to_cash():
+    # Each order is sized to 50 shares from the cash at the start of the day
+    trade_log = run(open_price=10.0)
+    assert trade_log['symbol'].tolist() == ['AAA', 'BBB']
+    assert trade_log['quantity'].tolist() == [50, 50]
+    assert cash_after(trade_log) == 0
+
+def test_sizing_uses_the_previous_close():
+    # Orders are sized at the close of 10, the gap up to 12 is paid at the open
+    trade_log = run(open_price=12.0)
+    assert trade_log['quantity'].tolist() == [50, 50]
+    assert cash_after(trade_log) == -200
+
+def test_margin_skips_the_check():
+    trade_log = run(open_price=10.0, margin=True)
+    assert trade_log['quantity'].tolist() == [50, 50, 50]
+    assert cash_after(trade_log) == -500
+
+def simulate_per_bar(panel, entry_mask, gates, parameters):
+    """
+    Reference for run_vector_backtest: the rules of on_trading_iteration
+    replayed one day and one ticker at a time, for long entries.
+
+    Returns:
+        list: (date, symbol, side, quantity, price, type) of every fill
+    """
+    stop_loss_pct = parameters.get("stop_loss_pct")
+    take_profit_pct = parameters.get("take_profit_pct")
+    cash = float(parameters["budget"])
+    positions = {}  # ticker index -> [shares, stop price, take profit price]
+    pending_exit = set()
+    fills = []
+
+    def fill(day, j, side, quantity, price, order_type):
+        nonlocal cash
+        fills.append((str(panel.dates[day]), panel.tickers[j], side, int(quantity), float(price), order_type))
+        cash += -quantity * price if side == "buy" else quantity * price
+
+    start, end = np.datetime64(parameters["backtesting_start"]), np.datetime64(parameters["backtesting_end"])
+    for day in range(1, len(panel.dates)):
+        if not start < panel.dates[day] <= end:
+            continue
+        has_bar = lambda j: not math.isnan(panel.open[day, j])
+
+        for j in sorted(pending_exit):
+            if has_bar(j):
+                fill(day, j, "sell", positions.pop(j)[0], panel.open[day, j], "market")
+                pending_exit.discard(j)
+
+        gate = gates[day - 1]
+        if gate == GATE_FLATTEN:
+            for j in sorted(positions):
+                if j in pending_exit:
+                    continue
+                if has_bar(j):
+                    fill(day, j, "sell", positions.pop(j)[0], panel.open[day, j], "market")
+                else:
+                    pending_exit.add(j)
+        elif gate == GATE_TRADE:
+            allocation = cash * parameters["position_pct"]
+            unspent = cash
+            for j in range(len(panel.tickers)):
+                reference = panel.close[day - 1, j]
+                if not entry_mask[day - 1, j] or j in positions or not has_bar(j) or not reference > 0:
+                    continue
+                quantity = math.floor(allocation / reference)
+                if quantity <= 0:
+                    continue
+                quantity = min(quantity, math.floor(max(unspent, 0.0) / reference))
+                if quantity <= 0:
+                    continue
+                unspent -= quantity * reference
+                stop = reference * (1 - stop_loss_pct) if stop_loss_pct else math.nan
+                take_profit = reference * (1 + take_profit_pct) if take_profit_pct else math.nan
+                positions[j] = [quantity, stop, take_profit]
+                fill(day, j, "buy", quantity, panel.open[day, j], "bracket" if stop_loss_pct or take_profit_pct else "market")
+
+        for j in sorted(positions):
+            if j in pending_exit or not has_bar(j):
+                continue
+            quantity, stop, take_profit = positions[j]
+            if panel.low[day, j] <= stop:
+                fill(day, j, "sell", positions.pop(j)[0], min(panel.open[day, j], stop), "stop")
+            elif panel.high[day, j] >= take_profit:
+                fill(day, j, "sell", positions.pop(j)[0], max(panel.open[day, j], take_profit), "limit")
+    return fills
+
+def make_random_panel(n_dates=80, n_tickers=12, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2024-01-02', periods=n_dates).values.astype('datetime64[D]')
+    close = 20 * np.exp(rng.normal(0, 0.03, (n_dates, n_tickers)).cumsum(axis=0))
+    open_ = close * np.exp(rng.normal(0, 0.01, close.shape))
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.05, close.shape))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.05, close.shape))
+    missing = rng.random(close.shape) < 0.05
+    for array in (open_, high, low, close):
+        array[missing] = np.nan
+    tickers = np.array([f"T{j:02d}" for j in range(n_tickers)], dtype=object)
+    entry_mask = rng.random(close.shape) < 0.3
+    gates = rng.choice([-1, 0, 1], size=n_dates, p=[0.1, 0.2, 0.7]).astype(np.int8)
+    return BarPanel(dates, tickers, open_, high, low, close), entry_mask, gates
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('legs', [{}, {'stop_loss_pct': 0.03, 'take_profit_pct': 0.05}])
+def test_matches_per_bar_simulation(seed, legs):
+    panel, entry_mask, gates = make_random_panel(seed=seed)
+    parameters = {
+        'backtesting_start': str(panel.dates[1]),
+        'backtesting_end': str(panel.dates[-1]),
+        'side': 'buy',
+        'position_pct': 0.3,
+        'budget': 10000,
+        **legs,
+    }
+    trade_log = run_vector_backtest(panel, entry_mask, gates, parameters)
+    vector_fills = [
+        (row.timestamp[:10], row.symbol, row.side, row.quantity, row.price, row.type)
+        for row in trade_log.itertuples(index=False)
+    ]
+    expected = simulate_per_bar(panel, entry_mask, gates, parameters)
+    assert len(expected) > 0
+    assert sorted(vector_fills) == pytest.approx(sorted(expected))
+
+def test_vector_engine_requires_support():
+    class NoVectorStrategy(BaseStrategy):
+        parameters = {'backtesting_start': '2024-01-02', 'backtesting_end': '2024-02-01', 'data_source': 'vector'}
+
+    class VectorStrategy(NoVectorStrategy):
+        @classmethod
+        def run_vector_strategy(cls):
+            return 'vector run'
+
+    assert not NoVectorStrategy.supports_vector_engine()
+    with pytest.raises(ValueError, match="does not implement run_vector_strategy"):
+        NoVectorStrategy.run_strategy()
+    assert VectorStrategy.supports_vector_engine()
+    assert VectorStrategy.run_strategy() == 'vector run'
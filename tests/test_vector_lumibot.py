@@ -0,0 +1,104 @@
+import importlib
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pytest
+from backtests.utils.regime import RegimeSeries
+from backtests.utils.vector_backtest import BarPanel, get_regime_gates, run_vector_backtest
+from utils.trading_calendar import previous_session, sessions_in_range
+
+lumibot_backtesting = pytest.importorskip("lumibot.backtesting")
+from lumibot.entities import Asset, Data
+
+START, END = '2024-02-21', '2024-03-28'
+TICKERS = ['AAA', 'BBB', 'CCC', 'DDD']
+
+def make_market(seed):
+    """Random daily bars, a random universe and a benchmark regime flattening on 20% of the days"""
+    rng = np.random.default_rng(seed)
+    dates = sessions_in_range('2024-01-02', END)
+    shape = (len(dates), len(TICKERS))
+    close = 50 * np.exp(rng.normal(0, 0.02, shape).cumsum(axis=0))
+    open_ = close * np.exp(rng.normal(0, 0.01, shape))
+    high = np.maximum(open_, close) * 1.01
+    low = np.minimum(open_, close) * 0.99
+    entry_mask = rng.random(shape) < 0.5
+    vix = np.where(rng.random(len(dates)) < 0.2, 30.0, 15.0)
+    regime = RegimeSeries(dates, np.full(len(dates), 100.0), np.full(len(dates), 90.0), vix)
+    return BarPanel(dates, np.array(TICKERS, dtype=object), open_, high, low, close), entry_mask, regime
+
+def run_lumibot(strategy_class, panel, entry_mask, regime):
+    """
+    Run the strategy through lumibot on the synthetic panel.
+
+    Returns:
+        list: (date, symbol, side, quantity, price) of every fill, dated by the
+              iteration that submitted the order, whose open it fills at
+    """
+    usd = Asset("USD", asset_type=Asset.AssetType.FOREX)
+    index = pd.DatetimeIndex(panel.dates)
+    pandas_data = {}
+    for j, ticker in enumerate(panel.tickers):
+        asset = Asset(ticker, asset_type=Asset.AssetType.STOCK)
+        bars = pd.DataFrame({'open': panel.open[:, j], 'high': panel.high[:, j], 'low': panel.low[:, j],
+                             'close': panel.close[:, j], 'volume': 1e6}, index=index)
+        pandas_data[asset] = Data(asset, bars, timestep="day", quote=usd)
+
+    day_index = {day: i for i, day in enumerate(panel.dates.tolist())}
+    fills = []
+
+    class SyntheticStrategy(strategy_class):
+        def initialize(self):
+            self.sleeptime = "1D"
+            self.margin = False
+            self.side = "buy"
+            self.risk_per_trade = None
+            self.regime = regime
+
+        def get_qualified_tickers(self, current_time):
+            i = day_index[previous_session(current_time)]
+            return [(ticker, panel.close[i, j]) for j, ticker in enumerate(panel.tickers) if entry_mask[i, j]]
+
+        def on_trading_iteration(self):
+            # Fills are processed at the next iteration's clock, before that iteration runs
+            self.iteration_day = self.get_datetime().date()
+            super().on_trading_iteration()
+
+        def on_filled_order(self, position, order, price, quantity, multiplier):
+            side = getattr(order.side, 'value', order.side)
+            fills.append((str(self.iteration_day), order.asset.symbol, str(side), int(quantity), float(price)))
+
+        def after_market_closes(self):
+            pass
+
+    SyntheticStrategy.run_backtest(
+        lumibot_backtesting.PandasDataBacktesting, datetime.fromisoformat(START), datetime.fromisoformat(END),
+        pandas_data=pandas_data, benchmark_asset=None, quote_asset=usd, budget=100000,
+        parameters=SyntheticStrategy.parameters, risk_free_rate=0.0, show_plot=False, save_tearsheet=False,
+        show_tearsheet=False, show_indicators=False, analyze_backtest=False,
+    )
+    return fills
+
+@pytest.mark.parametrize('seed', range(3))
+def test_adr_stocks_matches_lumibot(seed, monkeypatch, tmp_path):
+    monkeypatch.setenv('BACKTESTING_START', START)
+    monkeypatch.setenv('BACKTESTING_END', END)
+    # lumibot writes its logs to the working directory
+    monkeypatch.chdir(tmp_path)
+    adr_stocks = importlib.import_module('backtests.backtests.adr_stocks')
+
+    panel, entry_mask, regime = make_market(seed)
+    parameters = {**adr_stocks.Strategy.parameters, 'symbols': TICKERS, 'position_pct': 0.3, 'budget': 100000,
+                  'backtesting_start': START, 'backtesting_end': END}
+    strategy_class = type('Strategy', (adr_stocks.Strategy,), {'parameters': parameters})
+
+    lumibot_fills = run_lumibot(strategy_class, panel, entry_mask, regime)
+    gates = get_regime_gates(regime, panel.dates, parameters['vix_threshold'])
+    trade_log = run_vector_backtest(panel, entry_mask, gates, parameters)
+    vector_fills = [
+        (row.timestamp[:10], row.symbol, row.side, int(row.quantity), float(row.price))
+        for row in trade_log.itertuples(index=False)
+    ]
+
+    assert {side for _, _, side, _, _ in vector_fills} == {'buy', 'sell'}
+    assert sorted(vector_fills) == pytest.approx(sorted(lumibot_fills))
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+from backtests.walk_forward import get_window_dir, split_windows, stitch_windows
+from utils.trading_calendar import next_session, sessions_in_range
+
+START, END = '2024-01-02', '2024-03-01'
+
+def scored_sessions(window):
+    return [str(day) for day in sessions_in_range(window['start'], window['end'])]
+
+@pytest.mark.parametrize('n_windows', [1, 3, 4, 7])
+def test_windows_cover_the_range_without_overlap(n_windows):
+    windows = split_windows(START, END, n_windows)
+
+    sessions = [str(day) for day in sessions_in_range(START, END) if day < np.datetime64(END, 'D')]
+    assert [day for window in windows for day in scored_sessions(window)] == sessions
+    assert [window['window'] for window in windows] == list(range(n_windows))
+    for previous, window in zip(windows, windows[1:]):
+        assert window['start'] == str(next_session(previous['end']))
+        # A run ends on the next window's first session, which it does not trade
+        assert previous['backtesting_end'] == window['start']
+    assert windows[-1]['backtesting_end'] == END
+
+def test_last_window_is_partial():
+    # 41 sessions in 4 windows
+    windows = split_windows(START, END, 4)
+
+    sizes = [len(scored_sessions(window)) for window in windows]
+    assert sizes == [11, 10, 10, 10]
+    assert windows[-1]['end'] == '2024-02-29'
+
+def test_overlap_starts_runs_earlier():
+    windows = split_windows(START, END, 4, overlap=3)
+    plain = split_windows(START, END, 4)
+
+    assert [(window['start'], window['end']) for window in windows] == [(window['start'], window['end']) for window in plain]
+    assert windows[0]['backtesting_start'] == START
+    for window in windows[1:]:
+        warm_up = sessions_in_range(window['backtesting_start'], window['start'])
+        assert len(warm_up) == 4
+
+def test_too_many_windows():
+    with pytest.raises(ValueError, match="Cannot split"):
+        split_windows(START, '2024-01-05', 5)
+
+def write_window(output_dir, window, trades):
+    """Write processed results with one buy and one sell per (trade_id, start_date, start_time)"""
+    run_dir = output_dir / get_window_dir(window)
+    run_dir.mkdir()
+    trades_df = pd.DataFrame(trades, columns=['trade_id', 'start_date', 'start_time'])
+    trades_df['symbol'] = [f"S{window['window']}{trade_id}" for trade_id in trades_df['trade_id']]
+    trades_df.to_csv(run_dir / 'trades.csv', index=False)
+    executions_df = pd.DataFrame([
+        {'trade_id': trade_id, 'execution_timestamp': f"{start_date} {start_time}", 'side': side}
+        for trade_id, start_date, start_time in trades for side in ('buy', 'sell')
+    ])
+    executions_df.to_csv(run_dir / 'executions.csv', index=False)
+
+def test_stitch_renumbers_trades_across_windows(tmp_path):
+    windows = split_windows(START, END, 3, overlap=2)
+    write_window(tmp_path, windows[0], [(1, '2024-01-03', '09:30:00'), (2, '2024-01-03', '09:30:00'),
+                                        (3, windows[0]['end'], '09:30:00')])
+    # The first trade was entered during the overlap, so window 0 scores it and window 1 drops it
+    write_window(tmp_path, windows[1], [(1, windows[1]['backtesting_start'], '09:30:00'),
+                                        (2, windows[1]['start'], '09:30:00'), (3, '2024-02-05', '09:30:00')])
+    write_window(tmp_path, windows[2], [(1, windows[2]['start'], '09:30:00')])
+    assert windows[1]['backtesting_start'] < windows[1]['start']
+
+    executions_df, trades_df = stitch_windows(windows, tmp_path)
+
+    assert trades_df['trade_id'].tolist() == [1, 2, 3, 4, 5, 6]
+    assert trades_df[['window', 'window_trade_id']].values.tolist() == [[0, 1], [0, 2], [0, 3], [1, 2], [1, 3], [2, 1]]
+    assert trades_df['start_date'].is_monotonic_increasing
+    assert trades_df['symbol'].tolist() == ['S01', 'S02', 'S03', 'S12', 'S13', 'S21']
+
+    # Executions follow the new IDs and the overlap trade's executions are dropped
+    assert executions_df['trade_id'].tolist() == [1, 1, 2, 2, 3, 3, 4, 4, 5, 5, 6, 6]
+    assert executions_df[['window', 'window_trade_id']].drop_duplicates().values.tolist() == \
+        trades_df[['window', 'window_trade_id']].values.tolist()
+    assert executions_df['side'].tolist() == ['buy', 'sell'] * 6
+
+def test_stitch_skips_windows_without_results(tmp_path):
+    windows = split_windows(START, END, 2)
+    write_window(tmp_path, windows[1], [(4, windows[1]['start'], '09:30:00')])
+
+    executions_df, trades_df = stitch_windows(windows, tmp_path)
+
+    assert trades_df[['trade_id', 'window', 'window_trade_id']].values.tolist() == [[1, 1, 4]]
+    assert len(executions_df) == 2
+
+def test_stitch_without_results(tmp_path):
+    executions_df, trades_df = stitch_windows(split_windows(START, END, 2), tmp_path)
+    assert executions_df.empty and trades_df.empty
@@ -0,0 +1,89 @@
+import os
+import pandas as pd
+import pytest
+import api.yf as yf_api
+from api.yf import download_data, from_yf_symbol, reshape_download, to_yf_symbol
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+TICKERS = ['AAPL', 'VIX', 'SOLV']
+OUTPUT_COLUMNS = ['date', 'open', 'high', 'low', 'close', 'volume', 'dividends', 'stock splits',
+                  'year', 'month', 'week', 'ticker']
+
+def load_download_fixture():
+    """yf.download(group_by='ticker') frame, recorded by scripts/record_yf_fixtures.py"""
+    data = pd.read_csv(os.path.join(FIXTURES_DIR, 'yf_download_group_by_ticker.csv'),
+                       header=[0, 1], index_col=0)
+    data.index = pd.DatetimeIndex(pd.to_datetime(data.index), name='Date')
+    return data
+
+def load_history_fixture(symbol):
+    """Ticker.history() frame of one symbol, with its exchange-local index"""
+    history = pd.read_csv(os.path.join(FIXTURES_DIR, f"yf_history_{symbol.lstrip('^')}.csv"), index_col=0)
+    history.index = pd.DatetimeIndex(pd.to_datetime(history.index, utc=True), name='Date').tz_convert('America/New_York')
+    return history
+
+class FakeTicker:
+    def __init__(self, symbol):
+        self.symbol = symbol
+
+    def history(self, period=None, start=None, end=None):
+        return load_history_fixture(self.symbol)
+
+@pytest.fixture
+def recorded_yahoo(monkeypatch):
+    """Serve yf.download and yf.Ticker from the fixtures, recording the requested symbols"""
+    requests = []
+
+    def fake_download(symbols, **kwargs):
+        requests.append((list(symbols), kwargs))
+        return load_download_fixture()[list(symbols)]
+
+    monkeypatch.setattr(yf_api.yf, 'download', fake_download)
+    monkeypatch.setattr(yf_api.yf, 'Ticker', FakeTicker)
+    return requests
+
+def test_vix_symbol_mapping():
+    assert to_yf_symbol('VIX') == '^VIX'
+    assert from_yf_symbol('^VIX') == 'VIX'
+    assert to_yf_symbol('AAPL') == 'AAPL'
+    assert from_yf_symbol(to_yf_symbol('SOLV')) == 'SOLV'
+
+def test_reshape_download():
+    data = load_download_fixture()
+    df = reshape_download(data, TICKERS)
+
+    assert list(df.columns) == OUTPUT_COLUMNS
+    assert df['ticker'].unique().tolist() == TICKERS
+    # SOLV was listed on 2024-04-01, the empty rows before are dropped
+    assert (df['ticker'] == 'SOLV').sum() == 5
+    assert (df['ticker'] == 'AAPL').sum() == len(data)
+
+    vix = df[df['ticker'] == 'VIX'].set_index('date')
+    assert vix.loc['2024-03-26', 'close'] == data.loc['2024-03-26', ('^VIX', 'Close')]
+    assert vix.loc['2024-04-05', 'volume'] == 0
+    assert df['volume'].dtype == 'int64'
+    assert str(df['week'].dtype) == 'UInt32'
+
+def test_reshape_download_flat_columns():
+    data = load_download_fixture()
+    flat = reshape_download(data['AAPL'], ['AAPL'])
+    pd.testing.assert_frame_equal(flat, reshape_download(data[['AAPL']], ['AAPL']))
+
+def test_reshape_download_empty():
+    assert reshape_download(pd.DataFrame(), TICKERS).empty
+
+def test_download_batch_requests_yahoo_symbols(recorded_yahoo):
+    download_data(TICKERS, start='2024-03-25', end='2024-04-06', batch_size=3)
+
+    symbols, kwargs = recorded_yahoo[0]
+    assert symbols == ['AAPL', '^VIX', 'SOLV']
+    assert kwargs['group_by'] == 'ticker'
+    assert kwargs['auto_adjust'] and kwargs['actions']
+    assert (kwargs['start'], kwargs['end']) == ('2024-03-25', '2024-04-06')
+
+def test_batch_matches_per_ticker(recorded_yahoo):
+    per_ticker = download_data(TICKERS, start='2024-03-25', end='2024-04-06')
+    batched = download_data(TICKERS, start='2024-03-25', end='2024-04-06', batch_size=2)
+
+    assert list(per_ticker.columns) == OUTPUT_COLUMNS
+    pd.testing.assert_frame_equal(batched, per_ticker)
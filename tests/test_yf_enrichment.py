@@ -0,0 +1,29 @@
+import pytest
+from enriching.yf_enrichment import process_stock_data
+from scripts.benchmark_enrichment import FakeProvider, build_database, load_rows
+from utils.db_utils import DatabaseManager
+
+N_TICKERS, N_DAYS = 12, 40
+
+@pytest.fixture
+def db_path(tmp_path):
+    db_path = str(tmp_path / 'enrichment.db')
+    build_database(db_path, N_TICKERS)
+    return db_path
+
+def download(db_path, provider):
+    return process_stock_data('stocks', 'daily', max_workers=4, rate=1000, burst=100, backoff=0,
+                              manager=DatabaseManager(db_path), downloader=provider)
+
+def test_rerunning_a_download_writes_nothing(db_path):
+    provider = FakeProvider(latency=0, rate_limit=1000, error_rate=0, n_days=N_DAYS)
+    first = download(db_path, provider)
+    stored = load_rows(db_path)
+    assert first['rows'] == len(stored) == N_TICKERS * N_DAYS
+    assert first['errors'] == 0
+
+    provider = FakeProvider(latency=0, rate_limit=1000, error_rate=0, n_days=N_DAYS)
+    second = download(db_path, provider)
+    assert provider.requests == N_TICKERS
+    assert second['rows'] == 0
+    assert load_rows(db_path).equals(stored)
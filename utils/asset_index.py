@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+from utils.db_utils import DatabaseManager
+
+class AssetIndex:
+    """
+    Read-only ticker to asset_id lookup, built once per job.
+
+    The tickers are kept as the categories of a CategoricalDtype with the ids
+    in the same order, so a column of tickers is mapped by factorizing it and
+    looking up the codes of its distinct values, instead of hashing every row
+    into a dict. The arrays are never modified, so download threads can share
+    one index.
+    """
+
+    def __init__(self, assets_df):
+        """
+        Args:
+            assets_df (pd.DataFrame): Assets with ticker and id columns, e.g. from get_table_data.
+                                      A ticker stored more than once maps to its last row,
+                                      as dict(zip(tickers, ids)) did.
+        """
+        assets = assets_df[['ticker', 'id']].dropna().drop_duplicates(subset=['ticker'], keep='last')
+        self.dtype = pd.CategoricalDtype(assets['ticker'].astype(str).to_numpy())
+        self.ids = assets['id'].to_numpy(np.int64)
+
+    @classmethod
+    def from_table(cls, table_name, manager=None):
+        """
+        Load the index of an assets table
+
+        Args:
+            table_name (str): Assets table ('stocks' or 'indexes')
+            manager (DatabaseManager, optional): Database to read (default: a new DatabaseManager)
+
+        Returns:
+            AssetIndex: Index of the table's tickers
+        """
+        return cls((manager or DatabaseManager()).get_table_data(table_name))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, ticker):
+        return ticker in self.dtype.categories
+
+    def get(self, ticker, default=None):
+        """Asset id of one ticker, or default if it is not in the index"""
+        code = self.dtype.categories.get_indexer([ticker])[0]
+        return int(self.ids[code]) if code >= 0 else default
+
+    def map(self, tickers):
+        """
+        Map tickers to asset ids
+
+        Args:
+            tickers (array-like): Tickers, e.g. the ticker column of download_data
+
+        Returns:
+            np.ndarray: int64 asset ids, -1 where the ticker is not in the index
+        """
+        codes, uniques = pd.factorize(np.asarray(tickers, dtype=object))
+        if len(uniques) == 0 or len(self.ids) == 0:
+            return np.full(len(codes), -1, dtype=np.int64)
+        unique_codes = pd.Categorical(uniques, dtype=self.dtype).codes
+        unique_ids = np.where(unique_codes >= 0, self.ids[unique_codes], -1)
+        return np.where(codes >= 0, unique_ids[codes], -1)
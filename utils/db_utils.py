@@ -1,4 +1,6 @@
+import json
 import sqlite3
+import numpy as np
 import pandas as pd
 from contextlib import contextmanager
 import os
@@ -9,9 +11,21 @@ class DatabaseManager:
     Provides a consistent interface for database interactions.
     """
     
-    def __init__(self, db_path='data/kairos.db'):
-        """Initialize with the database path"""
+    def __init__(self, db_path='data/kairos.db', timeout=30):
+        """
+        Initialize with the database path
+        
+        Args:
+            db_path (str): Path to the SQLite database (default: 'data/kairos.db')
+            timeout (float): Seconds a connection waits for another writer's lock
+                             before raising 'database is locked' (default: 30)
+        """
+        # Resolve relative paths now so the manager keeps pointing at the same
+        # file if the process later changes directory (e.g. sweep workers)
+        if db_path != ':memory:':
+            db_path = os.path.abspath(db_path)
         self.db_path = db_path
+        self.timeout = timeout
         self._ensure_db_exists()
     
     def _ensure_db_exists(self):
@@ -29,7 +43,7 @@ class DatabaseManager:
         """Context manager for database connections"""
         conn = None
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout)
             yield conn
             conn.commit()
         except Exception as e:
@@ -268,4 +282,1023 @@ class DatabaseManager:
             return df
         except Exception as e:
             print(f"Error retrieving OHLCV data: {e}")
-            return pd.DataFrame()
\ No newline at end of file
+            return pd.DataFrame()
+
+    def get_ohlcv_panel(self, tickers, start_date=None, end_date=None):
+        """
+        Get OHLCV data for many tickers from both the stocks and indexes tables in one query.
+
+        Args:
+            tickers (list): Ticker symbols to load
+            start_date (str, optional): Start date in YYYY-MM-DD format
+            end_date (str, optional): End date in YYYY-MM-DD format
+
+        Returns:
+            pd.DataFrame: DataFrame with ticker, datetime, open, high, low, close, volume columns
+                          sorted by ticker and datetime, with datetime parsed and the
+                          price and volume columns as float64
+        """
+        columns = ['ticker', 'datetime', 'open', 'high', 'low', 'close', 'volume']
+        if not tickers:
+            return pd.DataFrame(columns=columns)
+
+        # The ticker list is passed as a single JSON parameter to stay clear of
+        # SQLite's bound variable limit
+        filters = " AND a.ticker IN (SELECT value FROM json_each(?))"
+        filter_params = [json.dumps(list(tickers))]
+
+        if start_date:
+            filters += " AND o.datetime >= ?"
+            filter_params.append(start_date)
+
+        if end_date:
+            filters += " AND o.datetime <= ?"
+            filter_params.append(end_date)
+
+        query = f"""
+            SELECT a.ticker, o.datetime, o.open, o.high, o.low, o.close, o.volume
+            FROM stocks a
+            JOIN stocks_ohlcv_daily o ON a.id = o.asset_id
+            WHERE 1=1 {filters}
+            UNION ALL
+            SELECT a.ticker, o.datetime, o.open, o.high, o.low, o.close, o.volume
+            FROM indexes a
+            JOIN indexes_ohlcv_daily o ON a.id = o.asset_id
+            WHERE 1=1 {filters}
+            ORDER BY 1, 2
+        """
+
+        try:
+            df = self.fetch_df(query, filter_params * 2)
+        except Exception as e:
+            print(f"Error retrieving OHLCV panel: {e}")
+            return pd.DataFrame(columns=columns)
+
+        df['datetime'] = pd.to_datetime(df['datetime'])
+        for column in ['open', 'high', 'low', 'close', 'volume']:
+            df[column] = df[column].astype('float64')
+
+        print(f"Retrieved {len(df)} rows of OHLCV data for {df['ticker'].nunique()} tickers")
+        return df
+
+    def ensure_indicator_table(self, asset_type):
+        """
+        Create the materialized indicator table for an asset type if it does not exist.
+        
+        Values are stored in long format, one row per (asset_id, datetime, indicator, period).
+        Stocks and indexes have separate id spaces, so each gets its own table.
+        
+        Args:
+            asset_type (str): 'stocks' or 'indexes'
+            
+        Returns:
+            str: Name of the indicator table
+        """
+        table = f"{asset_type.lower()}_indicator_values"
+        with self.connection() as conn:
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    asset_id INTEGER NOT NULL,
+                    datetime TEXT NOT NULL,
+                    indicator TEXT NOT NULL,
+                    period INTEGER NOT NULL,
+                    value REAL,
+                    PRIMARY KEY (asset_id, datetime, indicator, period)
+                )
+            """)
+        return table
+
+    def get_indicator_refresh_bars(self, asset_type, specs, warmup):
+        """
+        Get the bars needed to bring the materialized indicators up to date.
+        
+        For each asset this returns the bars after the last date where every
+        requested (indicator, period) was computed, plus the warmup bars before
+        them. Assets with no computed values return their full history and assets
+        that are already up to date return nothing.
+        
+        Args:
+            asset_type (str): 'stocks' or 'indexes'
+            specs (list): (indicator, period) tuples
+            warmup (int): Number of bars needed before the first new bar
+            
+        Returns:
+            pd.DataFrame: DataFrame with asset_id, datetime, open, high, low, close, volume
+                          and last_dt (last computed date, None if never computed),
+                          sorted by asset_id and datetime
+        """
+        base_table = asset_type.lower()
+        ohlcv_table = f"{base_table}_ohlcv_daily"
+        indicator_table = f"{base_table}_indicator_values"
+        
+        spec_values = ", ".join(["(?, ?)"] * len(specs))
+        params = [value for spec in specs for value in spec] + [len(specs), warmup]
+        
+        query = f"""
+            WITH specs(indicator, period) AS (VALUES {spec_values}),
+            last AS (
+                SELECT asset_id, MIN(last_dt) AS last_dt
+                FROM (
+                    SELECT v.asset_id, v.indicator, v.period, MAX(v.datetime) AS last_dt
+                    FROM {indicator_table} v
+                    JOIN specs s ON s.indicator = v.indicator AND s.period = v.period
+                    GROUP BY v.asset_id, v.indicator, v.period
+                )
+                GROUP BY asset_id
+                HAVING COUNT(*) = ?
+            ),
+            ranked AS (
+                SELECT o.asset_id, o.datetime, o.open, o.high, o.low, o.close, o.volume, l.last_dt,
+                       ROW_NUMBER() OVER (PARTITION BY o.asset_id ORDER BY o.datetime) AS rn
+                FROM {ohlcv_table} o
+                LEFT JOIN last l ON l.asset_id = o.asset_id
+            ),
+            cutoff AS (
+                SELECT asset_id,
+                       MAX(CASE WHEN datetime <= last_dt THEN rn END) AS last_rn,
+                       MAX(rn) AS max_rn
+                FROM ranked
+                GROUP BY asset_id
+            )
+            SELECT r.asset_id, r.datetime, r.open, r.high, r.low, r.close, r.volume, r.last_dt
+            FROM ranked r
+            JOIN cutoff c ON c.asset_id = r.asset_id
+            WHERE c.last_rn IS NULL
+               OR (c.max_rn > c.last_rn AND r.rn > c.last_rn - ?)
+            ORDER BY r.asset_id, r.datetime
+        """
+        return self.fetch_df(query, params)
+
+    def upsert_indicator_values(self, asset_type, values_df, batch_size=50000):
+        """
+        Insert or replace rows in the materialized indicator table.
+        
+        Args:
+            asset_type (str): 'stocks' or 'indexes'
+            values_df (pd.DataFrame): DataFrame with asset_id, datetime, indicator, period, value columns
+            batch_size (int): Number of rows per executemany call
+            
+        Returns:
+            int: Number of rows written
+        """
+        table = f"{asset_type.lower()}_indicator_values"
+        columns = ['asset_id', 'datetime', 'indicator', 'period', 'value']
+        query = f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES (?, ?, ?, ?, ?)"
+        
+        rows = list(values_df[columns].itertuples(index=False, name=None))
+        with self.connection() as conn:
+            for start in range(0, len(rows), batch_size):
+                conn.executemany(query, rows[start:start + batch_size])
+        return len(rows)
+
+    def get_indicator_version(self, asset_type, specs, start_date=None, end_date=None):
+        """
+        Summarize the materialized values of some indicators over a date range.
+        
+        The summary changes whenever values are added inside the range, either
+        new sessions or backfilled ones, or recomputed with different results
+        after upsert_ohlcv rewrote past bars, so it can be used as a data version.
+        
+        Args:
+            asset_type (str): 'stocks' or 'indexes'
+            specs (list): (indicator, period) tuples
+            start_date (str, optional): First date counted, in YYYY-MM-DD format
+            end_date (str, optional): Last date counted, in YYYY-MM-DD format
+            
+        Returns:
+            dict: max_date (None if there are no values), rows and checksum (sum of the values)
+        """
+        table = self.ensure_indicator_table(asset_type)
+        spec_filter = " OR ".join(["(indicator = ? AND period = ?)"] * len(specs))
+        params = [value for spec in specs for value in spec]
+        
+        filters = ""
+        if start_date:
+            filters += " AND datetime >= ?"
+            params.append(start_date)
+        if end_date:
+            filters += " AND datetime <= ?"
+            params.append(end_date)
+        
+        query = f"""
+            SELECT MAX(datetime) AS max_date, COUNT(*) AS rows, TOTAL(value) AS checksum
+            FROM {table} WHERE ({spec_filter}){filters}
+        """
+        with self.connection() as conn:
+            max_date, rows, checksum = conn.execute(query, params).fetchone()
+        return {'max_date': max_date, 'rows': rows, 'checksum': checksum}
+
+    def get_indicator_values(self, asset_type, specs, tickers=None, start_date=None, end_date=None):
+        """
+        Get OHLCV bars joined with their materialized indicator values in one query.
+        
+        Args:
+            asset_type (str): 'stocks' or 'indexes'
+            specs (list): (indicator, period) tuples, returned as '<indicator>_<period>' columns
+            tickers (list, optional): Ticker symbols to filter by
+            start_date (str, optional): Start date in YYYY-MM-DD format
+            end_date (str, optional): End date in YYYY-MM-DD format
+            
+        Returns:
+            pd.DataFrame: DataFrame with ticker, datetime, open, high, low, close, volume
+                          and one column per indicator, sorted by ticker and datetime
+        """
+        base_table = asset_type.lower()
+        ohlcv_table = f"{base_table}_ohlcv_daily"
+        indicator_table = f"{base_table}_indicator_values"
+        
+        select_params = []
+        value_columns = []
+        for indicator, period in specs:
+            value_columns.append(
+                f"MAX(CASE WHEN v.indicator = ? AND v.period = ? THEN v.value END) AS {indicator}_{period}"
+            )
+            select_params.extend([indicator, period])
+        
+        filters = ""
+        filter_params = []
+        if tickers is not None:
+            filters += " AND a.ticker IN (SELECT value FROM json_each(?))"
+            filter_params.append(json.dumps(list(tickers)))
+            
+        if start_date:
+            filters += " AND o.datetime >= ?"
+            filter_params.append(start_date)
+            
+        if end_date:
+            filters += " AND o.datetime <= ?"
+            filter_params.append(end_date)
+        
+        query = f"""
+            SELECT a.ticker, o.datetime, o.open, o.high, o.low, o.close, o.volume,
+                   {', '.join(value_columns)}
+            FROM {base_table} a
+            JOIN {ohlcv_table} o ON a.id = o.asset_id
+            LEFT JOIN {indicator_table} v ON v.asset_id = o.asset_id AND v.datetime = o.datetime
+            WHERE 1=1 {filters}
+            GROUP BY o.asset_id, o.datetime
+            ORDER BY a.ticker, o.datetime
+        """
+        
+        df = self.fetch_df(query, select_params + filter_params)
+        print(f"Retrieved {len(df)} rows of OHLCV and indicator data for {asset_type}")
+        return df
+
+    def ensure_ohlcv_index(self, asset_type):
+        """
+        Create the (asset_id, datetime) index on an OHLCV table if it does not exist.
+        
+        Args:
+            asset_type (str): 'stocks' or 'indexes'
+        """
+        ohlcv_table = f"{asset_type.lower()}_ohlcv_daily"
+        with self.connection() as conn:
+            # The unique index from ensure_ohlcv_unique_index serves the same lookups
+            unique_index = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?",
+                (f"ux_{ohlcv_table}_asset_datetime",)
+            ).fetchone()
+            if not unique_index:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{ohlcv_table}_asset_datetime ON {ohlcv_table} (asset_id, datetime)")
+
+    def ensure_ohlcv_unique_index(self, asset_type):
+        """
+        Make (asset_id, datetime) unique on an OHLCV table, which upsert_ohlcv relies on.
+        
+        Duplicate bars left by earlier full re-downloads are removed first, keeping
+        the most recently inserted copy. The plain (asset_id, datetime) index is
+        dropped since the unique index covers it.
+        
+        Args:
+            asset_type (str): 'stocks' or 'indexes'
+            
+        Returns:
+            int: Number of duplicate rows removed
+        """
+        ohlcv_table = f"{asset_type.lower()}_ohlcv_daily"
+        index_name = f"ux_{ohlcv_table}_asset_datetime"
+        with self.connection() as conn:
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (index_name,)
+            ).fetchone()
+            if exists:
+                return 0
+            
+            removed = conn.execute(f"""
+                DELETE FROM {ohlcv_table}
+                WHERE rowid NOT IN (
+                    SELECT MAX(rowid) FROM {ohlcv_table} GROUP BY asset_id, datetime
+                )
+            """).rowcount
+            conn.execute(f"CREATE UNIQUE INDEX {index_name} ON {ohlcv_table} (asset_id, datetime)")
+            conn.execute(f"DROP INDEX IF EXISTS idx_{ohlcv_table}_asset_datetime")
+        
+        if removed:
+            print(f"Removed {removed} duplicate bars from {ohlcv_table}")
+        return removed
+
+    def get_last_bar_dates(self, asset_type):
+        """
+        Get the date of the last stored bar of every asset in one grouped query.
+        
+        Args:
+            asset_type (str): 'stocks' or 'indexes'
+            
+        Returns:
+            dict: asset_id to last datetime ('YYYY-MM-DD'), assets without bars are missing
+        """
+        ohlcv_table = f"{asset_type.lower()}_ohlcv_daily"
+        with self.connection() as conn:
+            rows = conn.execute(f"SELECT asset_id, MAX(datetime) FROM {ohlcv_table} GROUP BY asset_id").fetchall()
+        return dict(rows)
+
+    def get_ohlcv_session_gaps(self, asset_type, sessions, asset_ids=None):
+        """
+        Find missing sessions in an OHLCV table by joining the stored dates against a calendar.
+        
+        The sessions are loaded into a temporary table, so each stored bar gets its
+        session index and consecutive bars of an asset more than one index apart
+        enclose a gap. Bars on dates that are not sessions are ignored.
+        
+        Args:
+            asset_type (str): 'stocks' or 'indexes'
+            sessions (np.ndarray): Sorted session dates, as datetime64[D]
+            asset_ids (list, optional): Only check these assets (default: all)
+            
+        Returns:
+            tuple: (gaps_df, bounds_df) where gaps_df has asset_id, gap_start, gap_end
+                   (session indexes, inclusive) of every interior gap and bounds_df has
+                   asset_id, first_idx, last_idx of every asset with bars
+        """
+        ohlcv_table = f"{asset_type.lower()}_ohlcv_daily"
+        session_rows = list(enumerate(np.datetime_as_string(np.asarray(sessions, dtype='datetime64[D]')).tolist()))
+        
+        asset_filter = ""
+        params = []
+        if asset_ids is not None:
+            asset_filter = f"WHERE o.asset_id IN ({', '.join(['?'] * len(asset_ids))})"
+            params = [int(asset_id) for asset_id in asset_ids]
+        
+        with self.connection() as conn:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS calendar_sessions (idx INTEGER, date TEXT PRIMARY KEY)")
+            conn.execute("DELETE FROM temp.calendar_sessions")
+            conn.executemany("INSERT INTO temp.calendar_sessions (idx, date) VALUES (?, ?)", session_rows)
+            
+            joined = f"""
+                FROM {ohlcv_table} o
+                JOIN temp.calendar_sessions s ON s.date = o.datetime
+                {asset_filter}
+            """
+            gaps_df = pd.read_sql_query(f"""
+                SELECT asset_id, prev_idx + 1 AS gap_start, idx - 1 AS gap_end
+                FROM (
+                    SELECT o.asset_id, s.idx,
+                           LAG(s.idx) OVER (PARTITION BY o.asset_id ORDER BY s.idx) AS prev_idx
+                    {joined}
+                )
+                WHERE idx - prev_idx > 1
+                ORDER BY asset_id, gap_start
+            """, conn, params=params)
+            bounds_df = pd.read_sql_query(f"""
+                SELECT o.asset_id, MIN(s.idx) AS first_idx, MAX(s.idx) AS last_idx
+                {joined}
+                GROUP BY o.asset_id
+            """, conn, params=params)
+        return gaps_df, bounds_df
+
+    def upsert_ohlcv(self, asset_type, ohlcv_df, batch_size=50000):
+        """
+        Insert bars, or update them where (asset_id, datetime) is already stored.
+        
+        Requires the unique index from ensure_ohlcv_unique_index. All rows are
+        written in one transaction. A stored bar is only rewritten if one of its
+        values changed, so re-running the same download writes nothing.
+        
+        Updating a bar, or inserting one before a stored bar, changes the indicator
+        windows of the bars after it. For each such asset the materialized
+        indicator values from its first changed bar on are deleted in the same
+        transaction, so the indicator store recomputes them on its next refresh.
+        
+        Args:
+            asset_type (str): 'stocks' or 'indexes'
+            ohlcv_df (pd.DataFrame): DataFrame with asset_id, datetime, open, high, low, close, volume columns
+            batch_size (int): Number of rows per executemany call
+            
+        Returns:
+            int: Number of rows inserted or changed
+        """
+        ohlcv_table = f"{asset_type.lower()}_ohlcv_daily"
+        indicator_table = self.ensure_indicator_table(asset_type)
+        columns = ['asset_id', 'datetime', 'open', 'high', 'low', 'close', 'volume']
+        updates = ", ".join(f"{column} = excluded.{column}" for column in columns[2:])
+        changed = " OR ".join(f"{column} IS NOT excluded.{column}" for column in columns[2:])
+        query = f"""
+            INSERT INTO {ohlcv_table} ({', '.join(columns)}) VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (asset_id, datetime) DO UPDATE SET {updates}
+            WHERE {changed}
+        """
+        record_rewrite = """
+            INSERT INTO rewritten_assets VALUES (NEW.asset_id, NEW.datetime)
+            ON CONFLICT (asset_id) DO UPDATE SET first_dt = MIN(first_dt, excluded.first_dt);
+        """
+        
+        rows = self._dataframe_rows(ohlcv_df[columns])
+        written = 0
+        with self.connection() as conn:
+            # Temporary objects only live as long as this connection
+            conn.execute("CREATE TEMP TABLE rewritten_assets (asset_id INTEGER PRIMARY KEY, first_dt TEXT NOT NULL)")
+            conn.execute(f"""
+                CREATE TEMP TRIGGER {ohlcv_table}_updated AFTER UPDATE ON main.{ohlcv_table}
+                BEGIN {record_rewrite} END
+            """)
+            conn.execute(f"""
+                CREATE TEMP TRIGGER {ohlcv_table}_inserted AFTER INSERT ON main.{ohlcv_table}
+                WHEN EXISTS (SELECT 1 FROM main.{ohlcv_table} WHERE asset_id = NEW.asset_id AND datetime > NEW.datetime)
+                BEGIN {record_rewrite} END
+            """)
+            for start in range(0, len(rows), batch_size):
+                written += conn.executemany(query, rows[start:start + batch_size]).rowcount
+            
+            rewritten = conn.execute("SELECT asset_id, first_dt FROM rewritten_assets").fetchall()
+            conn.executemany(f"DELETE FROM {indicator_table} WHERE asset_id = ? AND datetime >= ?", rewritten)
+        
+        if rewritten:
+            print(f"Rewrote past bars of {len(rewritten)} {asset_type}, their indicators will be recomputed from the first changed bar")
+        return written
+
+    def screen_universe(self, min_volume, min_adr, min_price, asset_type='stocks', adv_period=30, adr_period=20,
+                        start_date=None, end_date=None, daily=False):
+        """
+        Screen tickers on volume, ADR and price with SQLite window functions.
+        
+        ADV and ADR are rolling averages over the last adv_period / adr_period bars
+        of each asset, evaluated inside SQLite so only the qualifying rows leave
+        the database. A window only counts once it is full, as with pandas'
+        rolling(window).mean().
+        
+        Args:
+            min_volume (float): Minimum average daily volume
+            min_adr (float): Minimum average daily range, in percent
+            min_price (float): Minimum close
+            asset_type (str): 'stocks' or 'indexes' (default: 'stocks')
+            adv_period (int): ADV window length (default: 30)
+            adr_period (int): ADR window length (default: 20)
+            start_date (str, optional): First date screened, in YYYY-MM-DD format.
+                                        Earlier bars still feed the windows.
+            end_date (str, optional): Last date screened, in YYYY-MM-DD format
+            daily (bool): If False, return the tickers meeting each threshold on at least
+                          one day of the range. If True, return every (datetime, ticker)
+                          meeting all thresholds on the same day.
+            
+        Returns:
+            list: Qualifying tickers, sorted, when daily is False
+            pd.DataFrame: datetime, ticker, adv, adr, close of the qualifying days when daily is True
+        """
+        base_table = asset_type.lower()
+        ohlcv_table = f"{base_table}_ohlcv_daily"
+        self.ensure_ohlcv_index(asset_type)
+        
+        # Frame offsets cannot be bound parameters
+        adv_preceding = int(adv_period) - 1
+        adr_preceding = int(adr_period) - 1
+        
+        window_filter = ""
+        window_params = []
+        if end_date:
+            window_filter = "WHERE o.datetime <= ?"
+            window_params.append(end_date)
+        
+        windows_cte = f"""
+            WITH windows AS (
+                SELECT o.asset_id, o.datetime, o.close,
+                       AVG(o.volume) OVER adv_window AS adv,
+                       COUNT(o.volume) OVER adv_window AS adv_count,
+                       AVG((o.high - o.low) / o.open) OVER adr_window * 100 AS adr,
+                       COUNT((o.high - o.low) / o.open) OVER adr_window AS adr_count
+                FROM {ohlcv_table} o
+                {window_filter}
+                WINDOW adv_window AS (PARTITION BY o.asset_id ORDER BY o.datetime ROWS {adv_preceding} PRECEDING),
+                       adr_window AS (PARTITION BY o.asset_id ORDER BY o.datetime ROWS {adr_preceding} PRECEDING)
+            )
+        """
+        
+        range_filter = ""
+        range_params = []
+        if start_date:
+            range_filter = "AND w.datetime >= ?"
+            range_params.append(start_date)
+        
+        if daily:
+            query = windows_cte + f"""
+                SELECT w.datetime, a.ticker, w.adv, w.adr, w.close
+                FROM windows w
+                JOIN {base_table} a ON a.id = w.asset_id
+                WHERE w.adv_count = ? AND w.adv >= ?
+                  AND w.adr_count = ? AND w.adr >= ?
+                  AND w.close >= ?
+                  {range_filter}
+                ORDER BY w.datetime, a.ticker
+            """
+            params = window_params + [adv_period, min_volume, adr_period, min_adr, min_price] + range_params
+            return self.fetch_df(query, params)
+        
+        query = windows_cte + f"""
+            SELECT a.ticker
+            FROM windows w
+            JOIN {base_table} a ON a.id = w.asset_id
+            WHERE 1=1 {range_filter}
+            GROUP BY w.asset_id
+            HAVING MAX(w.adv_count = ? AND w.adv >= ?) = 1
+               AND MAX(w.adr_count = ? AND w.adr >= ?) = 1
+               AND MAX(w.close >= ?) = 1
+            ORDER BY a.ticker
+        """
+        params = window_params + range_params + [adv_period, min_volume, adr_period, min_adr, min_price]
+        return self.fetch_df(query, params)['ticker'].tolist()
+
+    def ensure_universe_tables(self):
+        """
+        Create the universe_daily and universe_params tables if they do not exist.
+        
+        universe_daily holds one row per (params_hash, datetime, ticker) with the
+        screening inputs and whether the ticker passed that day. universe_params
+        records the threshold set behind each hash.
+        """
+        with self.connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS universe_daily (
+                    params_hash TEXT NOT NULL,
+                    datetime TEXT NOT NULL,
+                    ticker TEXT NOT NULL,
+                    adv REAL,
+                    adr REAL,
+                    close REAL,
+                    passes_screen INTEGER NOT NULL,
+                    PRIMARY KEY (params_hash, datetime, ticker)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS universe_params (
+                    params_hash TEXT PRIMARY KEY,
+                    parameters TEXT NOT NULL,
+                    row_count INTEGER,
+                    created_at TEXT
+                )
+            """)
+
+    def universe_exists(self, params_hash):
+        """Check if a universe has been built for a parameter hash"""
+        self.ensure_universe_tables()
+        return self.record_exists('universe_params', {'params_hash': params_hash})
+
+    def build_universe_daily(self, params_hash, parameters):
+        """
+        Build the daily universe for a threshold set from the materialized indicators.
+        
+        Any previous rows for the hash are replaced in the same transaction. Only
+        days where both indicators are materialized are written. Universes of the
+        same thresholds built on an older data_version can never be reused, as
+        the version is part of their hash, so they are deleted as well.
+        
+        Args:
+            params_hash (str): Hash identifying the threshold set
+            parameters (dict): min_volume, min_adr, min_price, adv_period, adr_period,
+                               start_date and end_date (dates may be None)
+            
+        Returns:
+            int: Number of rows written
+        """
+        self.ensure_universe_tables()
+        self.ensure_indicator_table('stocks')
+        
+        filters = ""
+        filter_params = []
+        if parameters.get('start_date'):
+            filters += " AND o.datetime >= ?"
+            filter_params.append(parameters['start_date'])
+            
+        if parameters.get('end_date'):
+            filters += " AND o.datetime <= ?"
+            filter_params.append(parameters['end_date'])
+        
+        query = f"""
+            INSERT INTO universe_daily (params_hash, datetime, ticker, adv, adr, close, passes_screen)
+            SELECT ?, o.datetime, a.ticker, adv.value, adr.value, o.close,
+                   (adv.value >= ? AND adr.value >= ? AND o.close >= ?)
+            FROM stocks_ohlcv_daily o
+            JOIN stocks a ON a.id = o.asset_id
+            -- CROSS JOIN keeps the bars as the outer loop, so each indicator is a primary key lookup
+            CROSS JOIN stocks_indicator_values adv
+              ON adv.asset_id = o.asset_id AND adv.datetime = o.datetime
+             AND adv.indicator = 'adv' AND adv.period = ?
+            CROSS JOIN stocks_indicator_values adr
+              ON adr.asset_id = o.asset_id AND adr.datetime = o.datetime
+             AND adr.indicator = 'adr' AND adr.period = ?
+            WHERE 1=1 {filters}
+        """
+        params = [
+            params_hash, parameters['min_volume'], parameters['min_adr'], parameters['min_price'],
+            parameters['adv_period'], parameters['adr_period']
+        ] + filter_params
+        
+        thresholds = {key: value for key, value in parameters.items() if key != 'data_version'}
+        
+        with self.connection() as conn:
+            built = conn.execute(
+                "SELECT params_hash, parameters FROM universe_params WHERE params_hash != ?", (params_hash,)
+            ).fetchall()
+            superseded = [
+                (built_hash,) for built_hash, built_parameters in built
+                if {key: value for key, value in json.loads(built_parameters).items() if key != 'data_version'} == thresholds
+            ]
+            if superseded:
+                conn.executemany("DELETE FROM universe_daily WHERE params_hash = ?", superseded)
+                conn.executemany("DELETE FROM universe_params WHERE params_hash = ?", superseded)
+                print(f"Deleted {len(superseded)} superseded universe(s) of the same thresholds")
+            
+            conn.execute("DELETE FROM universe_daily WHERE params_hash = ?", (params_hash,))
+            row_count = conn.execute(query, params).rowcount
+            conn.execute(
+                "INSERT OR REPLACE INTO universe_params (params_hash, parameters, row_count, created_at) "
+                "VALUES (?, ?, ?, datetime('now'))",
+                (params_hash, json.dumps(parameters, sort_keys=True), row_count)
+            )
+        return row_count
+
+    def get_universe_tickers(self, params_hash):
+        """
+        Get every ticker that passes the screen on at least one day of a universe.
+        
+        Args:
+            params_hash (str): Hash identifying the threshold set
+            
+        Returns:
+            list: Sorted ticker symbols
+        """
+        query = """
+            SELECT DISTINCT ticker FROM universe_daily
+            WHERE params_hash = ? AND passes_screen = 1
+            ORDER BY ticker
+        """
+        return self.fetch_df(query, [params_hash])['ticker'].tolist()
+
+    def get_universe_day(self, params_hash, before_date):
+        """
+        Get the tickers passing the screen on the last day of a universe before a date.
+        
+        Both the day and its tickers come from the (params_hash, datetime, ticker)
+        primary key, so this is a single indexed lookup.
+        
+        Args:
+            params_hash (str): Hash identifying the threshold set
+            before_date (str): Date in YYYY-MM-DD format, excluded
+            
+        Returns:
+            pd.DataFrame: DataFrame with datetime, ticker and close of the eligible tickers
+        """
+        query = """
+            SELECT datetime, ticker, close FROM universe_daily
+            WHERE params_hash = ? AND passes_screen = 1
+              AND datetime = (
+                  SELECT MAX(datetime) FROM universe_daily
+                  WHERE params_hash = ? AND datetime < ?
+              )
+            ORDER BY ticker
+        """
+        return self.fetch_df(query, [params_hash, params_hash, before_date])
+
+    def get_universe_passes(self, params_hash, start_date=None, end_date=None):
+        """
+        Get every (datetime, ticker) passing the screen in a universe.
+        
+        Args:
+            params_hash (str): Hash identifying the threshold set
+            start_date (str, optional): Start date in YYYY-MM-DD format
+            end_date (str, optional): End date in YYYY-MM-DD format
+            
+        Returns:
+            pd.DataFrame: DataFrame with datetime and ticker columns
+        """
+        query = "SELECT datetime, ticker FROM universe_daily WHERE params_hash = ? AND passes_screen = 1"
+        params = [params_hash]
+        if start_date:
+            query += " AND datetime >= ?"
+            params.append(start_date)
+        if end_date:
+            query += " AND datetime <= ?"
+            params.append(end_date)
+        return self.fetch_df(query, params)
+
+    def ensure_job_tables(self):
+        """Create the ingestion job journal tables if they do not exist"""
+        with self.connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS ingestion_jobs (
+                    job_id TEXT PRIMARY KEY,
+                    job_type TEXT,
+                    parameters TEXT,
+                    status TEXT,
+                    created_at TEXT,
+                    updated_at TEXT
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS ingestion_job_units (
+                    job_id TEXT,
+                    unit TEXT,
+                    seq INTEGER,
+                    status TEXT,
+                    rows INTEGER DEFAULT 0,
+                    retries INTEGER DEFAULT 0,
+                    error TEXT,
+                    payload TEXT,
+                    updated_at TEXT,
+                    PRIMARY KEY (job_id, unit)
+                )
+            """)
+
+    def get_job(self, job_id):
+        """
+        Get an ingestion job.
+        
+        Args:
+            job_id (str): Job identifier
+            
+        Returns:
+            dict: The job row, or None if it does not exist
+        """
+        df = self.fetch_df("SELECT * FROM ingestion_jobs WHERE job_id = ?", (job_id,))
+        return None if df.empty else df.iloc[0].to_dict()
+
+    def save_job(self, job_id, job_type, parameters, status, reset=False):
+        """
+        Create an ingestion job or update its status.
+        
+        Args:
+            job_id (str): Job identifier
+            job_type (str): Kind of job, e.g. 'yf_ohlcv' or 'polygon_tickers'
+            parameters (str): JSON parameters of the job
+            status (str): 'running', 'completed', 'interrupted' or 'failed'
+            reset (bool): Delete the job's unit records (default: False)
+        """
+        with self.connection() as conn:
+            if reset:
+                conn.execute("DELETE FROM ingestion_job_units WHERE job_id = ?", (job_id,))
+            conn.execute("""
+                INSERT INTO ingestion_jobs (job_id, job_type, parameters, status, created_at, updated_at)
+                VALUES (?, ?, ?, ?, datetime('now'), datetime('now'))
+                ON CONFLICT (job_id) DO UPDATE SET status = excluded.status, updated_at = excluded.updated_at
+            """, (job_id, job_type, parameters, status))
+
+    def get_job_units(self, job_id, status=None):
+        """
+        Get the unit records of an ingestion job, in the order they were recorded.
+        
+        Args:
+            job_id (str): Job identifier
+            status (str, optional): Only units with this status
+            
+        Returns:
+            pd.DataFrame: unit, seq, status, rows, retries, error, payload, updated_at
+        """
+        query = "SELECT unit, seq, status, rows, retries, error, payload, updated_at FROM ingestion_job_units WHERE job_id = ?"
+        params = [job_id]
+        if status:
+            query += " AND status = ?"
+            params.append(status)
+        return self.fetch_df(query + " ORDER BY seq", params)
+
+    def record_job_units(self, job_id, units):
+        """
+        Insert or update unit records of an ingestion job in one transaction.
+        
+        Args:
+            job_id (str): Job identifier
+            units (list): (unit, status, rows, retries, error, payload) tuples
+        """
+        with self.connection() as conn:
+            next_seq = conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) + 1 FROM ingestion_job_units WHERE job_id = ?", (job_id,)
+            ).fetchone()[0]
+            conn.executemany("""
+                INSERT INTO ingestion_job_units (job_id, unit, seq, status, rows, retries, error, payload, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, datetime('now'))
+                ON CONFLICT (job_id, unit) DO UPDATE SET
+                    status = excluded.status,
+                    rows = excluded.rows,
+                    retries = ingestion_job_units.retries + excluded.retries,
+                    error = excluded.error,
+                    payload = excluded.payload,
+                    updated_at = excluded.updated_at
+            """, [(job_id, unit, next_seq + i, status, rows, retries, error, payload)
+                  for i, (unit, status, rows, retries, error, payload) in enumerate(units)])
+
+    @staticmethod
+    def _dataframe_rows(df):
+        """Convert DataFrame rows to tuples sqlite3 can bind, with NaN as NULL"""
+        values = df.astype(object).where(df.notna(), None)
+        rows = []
+        for row in values.itertuples(index=False, name=None):
+            rows.append(tuple(
+                value.item() if isinstance(value, np.generic)
+                else str(value) if isinstance(value, pd.Timestamp)
+                else value
+                for value in row
+            ))
+        return rows
+
+    def insert_run_results(self, runs, run_table, id_column, isolate_runs=False):
+        """
+        Insert parent rows and their child rows, one transaction for all of them.
+        
+        Each parent row is inserted with RETURNING to get its id, which is then
+        set on its child rows. The write lock is taken up front (BEGIN IMMEDIATE),
+        so concurrent writers queue on the busy timeout instead of failing halfway,
+        and either everything is written or nothing is. With isolate_runs, each
+        run is written inside its own SAVEPOINT instead, so a failing run is
+        rolled back alone and the other runs of the transaction are still committed.
+        
+        Args:
+            runs (list): One (run_df, children) tuple per run, where run_df holds the
+                         single parent row and children maps table name to DataFrame
+            run_table (str): Parent table, e.g. 'backtest_runs'
+            id_column (str): Generated id column of the parent table, set on the children
+            isolate_runs (bool): Roll back a failing run alone instead of the whole
+                                 transaction (default: False)
+            
+        Returns:
+            list: Generated id of each run, in order. With isolate_runs, a run that
+                  failed has its exception in place of the id.
+        """
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            run_ids = []
+            for run_df, children in runs:
+                if isolate_runs:
+                    conn.execute("SAVEPOINT run")
+                try:
+                    run_ids.append(self._insert_run(conn, run_df, children, run_table, id_column))
+                except Exception as e:
+                    if not isolate_runs:
+                        raise
+                    conn.execute("ROLLBACK TO run")
+                    print(f"Error inserting a run into {run_table}, rolled back alone: {e}")
+                    run_ids.append(e)
+                if isolate_runs:
+                    conn.execute("RELEASE run")
+            conn.execute("COMMIT")
+            return run_ids
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            print(f"Error inserting results into {run_table}: {e}")
+            raise
+        finally:
+            conn.close()
+
+    def _insert_run(self, conn, run_df, children, run_table, id_column):
+        """Insert one parent row with RETURNING and its child rows, returning the generated id"""
+        columns = list(run_df.columns)
+        cursor = conn.execute(
+            f"INSERT INTO {run_table} ({', '.join(columns)}) "
+            f"VALUES ({', '.join(['?'] * len(columns))}) RETURNING {id_column}",
+            self._dataframe_rows(run_df)[0]
+        )
+        run_id = cursor.fetchone()[0]
+        cursor.close()
+        
+        for table, child_df in children.items():
+            if child_df.empty:
+                continue
+            child_df = child_df.assign(**{id_column: run_id})
+            child_columns = list(child_df.columns)
+            conn.executemany(
+                f"INSERT INTO {table} ({', '.join(child_columns)}) "
+                f"VALUES ({', '.join(['?'] * len(child_columns))})",
+                self._dataframe_rows(child_df)
+            )
+        return run_id
+
+    @staticmethod
+    def _sql_type(dtype):
+        """SQLite column type for a pandas dtype"""
+        if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+            return 'INTEGER'
+        if pd.api.types.is_float_dtype(dtype):
+            return 'REAL'
+        return 'TEXT'
+
+    def sync_reference_rows(self, table, df, key_column='ticker', hash_column='ref_hash',
+                            active_column='active', delist_missing=True):
+        """
+        Write only the differences between a reference list and a table.
+
+        Rows carry a hash of their relevant fields in hash_column. The stored keys
+        and hashes are read in one query, and in one transaction new keys are
+        inserted, rows whose hash differs are updated in place (keeping their id)
+        and, with delist_missing, stored rows whose key is no longer listed get
+        active_column set to 0. Rows without a stored hash, e.g. from before the
+        sync existed, count as changed once. Missing columns are added to the table.
+
+        Args:
+            table (str): Reference table, e.g. 'stocks'
+            df (pd.DataFrame): Complete reference rows, one per key, including hash_column
+            key_column (str): Column identifying a row (default: 'ticker')
+            hash_column (str): Column holding the row hash (default: 'ref_hash')
+            active_column (str): Column set to 0 on delisted rows (default: 'active')
+            delist_missing (bool): Delist stored rows missing from df, only valid if df
+                                   is the full list (default: True)
+
+        Returns:
+            dict: inserted, changed and delisted keys (lists) and the unchanged count
+        """
+        df = df.drop_duplicates(subset=[key_column], keep='first')
+        columns = list(df.columns)
+
+        with self.connection() as conn:
+            table_columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+            if not table_columns:
+                definitions = ', '.join(f"{col} {self._sql_type(df[col].dtype)}" for col in columns)
+                conn.execute(f"CREATE TABLE {table} (id INTEGER PRIMARY KEY, {definitions})")
+                table_columns = ['id'] + columns
+            for col in columns:
+                if col not in table_columns:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {col} {self._sql_type(df[col].dtype)}")
+                    table_columns.append(col)
+
+            stored_columns = ['rowid AS id', key_column, hash_column]
+            if active_column in table_columns:
+                stored_columns.append(active_column)
+            stored = pd.read_sql(f"SELECT {', '.join(stored_columns)} FROM {table}", conn)
+
+            # Earlier appends can have stored a key more than once, every copy is compared
+            merged = df.merge(stored[['id', key_column, hash_column]], on=key_column, how='left',
+                              suffixes=('', '_stored'))
+            new_mask = merged['id'].isna()
+            changed_mask = ~new_mask & (merged[hash_column] != merged[f"{hash_column}_stored"])
+
+            new_rows = merged.loc[new_mask, columns]
+            if not new_rows.empty:
+                conn.executemany(
+                    f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})",
+                    self._dataframe_rows(new_rows)
+                )
+
+            changed_rows = merged.loc[changed_mask, columns + ['id']]
+            if not changed_rows.empty:
+                conn.executemany(
+                    f"UPDATE {table} SET {', '.join(f'{col} = ?' for col in columns)} WHERE rowid = ?",
+                    self._dataframe_rows(changed_rows)
+                )
+
+            delisted = []
+            if delist_missing:
+                delisted = self._delist_rows(conn, table, stored, set(df[key_column]),
+                                             key_column, hash_column, active_column)
+
+        changed_keys = merged.loc[changed_mask, key_column].unique().tolist()
+        return {
+            'inserted': new_rows[key_column].tolist(),
+            'changed': changed_keys,
+            'delisted': delisted,
+            'unchanged': int(df[key_column].nunique() - len(new_rows) - len(changed_keys)),
+        }
+
+    def delist_reference_rows(self, table, listed_keys, key_column='ticker', hash_column='ref_hash',
+                              active_column='active'):
+        """
+        Set active_column to 0 on stored rows whose key is not in listed_keys.
+
+        For reference lists synced in parts (e.g. page by page) with
+        sync_reference_rows(delist_missing=False), once every part is written.
+
+        Args:
+            table (str): Reference table, e.g. 'stocks'
+            listed_keys (set): Every key of the complete reference list
+            key_column, hash_column, active_column: As in sync_reference_rows
+
+        Returns:
+            list: Delisted keys
+        """
+        with self.connection() as conn:
+            table_columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+            if active_column not in table_columns:
+                return []
+            stored = pd.read_sql(f"SELECT rowid AS id, {key_column}, {active_column} FROM {table}", conn)
+            return self._delist_rows(conn, table, stored, set(listed_keys), key_column, hash_column, active_column)
+
+    @staticmethod
+    def _delist_rows(conn, table, stored, listed_keys, key_column, hash_column, active_column):
+        """Deactivate stored rows missing from listed_keys that are not inactive yet"""
+        if active_column not in stored.columns:
+            return []
+        active = stored[active_column].isna() | (stored[active_column] != 0)
+        missing = stored[active & ~stored[key_column].isin(listed_keys)]
+        if not missing.empty:
+            # Clearing the hash makes a relisted row count as changed
+            conn.executemany(
+                f"UPDATE {table} SET {active_column} = 0, {hash_column} = NULL WHERE rowid = ?",
+                [(int(row_id),) for row_id in missing['id']]
+            )
+        return missing[key_column].unique().tolist()
@@ -0,0 +1,164 @@
+"""
+NYSE trading calendar backed by a precomputed array of session dates.
+
+The sessions between SESSIONS_START and SESSIONS_END are generated once with
+pandas_market_calendars and cached on disk as a sorted datetime64[D] array, so
+lookups are a searchsorted over that array instead of a schedule() query.
+"""
+import os
+import numpy as np
+
+CALENDAR_NAME = 'NYSE'
+SESSIONS_START = '1990-01-01'
+SESSIONS_END = '2040-12-31'
+
+# Anchored to the project root so every working directory shares the cache
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'nyse_sessions.npy')
+
+# Sessions loaded in this process
+_sessions = None
+
+def _build_sessions():
+    """
+    Generate the session dates with pandas_market_calendars.
+
+    Returns:
+        np.ndarray: Sorted datetime64[D] array of sessions
+    """
+    # Only needed when the cache is missing, so it is not imported at module level
+    import pandas_market_calendars as mcal
+
+    print(f"Building {CALENDAR_NAME} sessions from {SESSIONS_START} to {SESSIONS_END}")
+    valid_days = mcal.get_calendar(CALENDAR_NAME).valid_days(start_date=SESSIONS_START, end_date=SESSIONS_END)
+    return valid_days.tz_localize(None).to_numpy().astype('datetime64[D]')
+
+def get_sessions(rebuild=False):
+    """
+    Get every session date, from memory, the disk cache or the exchange calendar.
+
+    Args:
+        rebuild (bool): Regenerate the sessions and overwrite the disk cache
+
+    Returns:
+        np.ndarray: Sorted datetime64[D] array of sessions
+    """
+    global _sessions
+    if _sessions is not None and not rebuild:
+        return _sessions
+
+    if not rebuild and os.path.exists(CACHE_FILE):
+        try:
+            _sessions = np.load(CACHE_FILE)
+            return _sessions
+        except Exception as e:
+            print(f"Error reading {CACHE_FILE}, rebuilding: {e}")
+
+    sessions = _build_sessions()
+
+    # Write to a temporary file first so concurrent processes never read a partial cache
+    os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+    temp_file = f"{CACHE_FILE}.{os.getpid()}.tmp"
+    with open(temp_file, 'wb') as f:
+        np.save(f, sessions)
+    os.replace(temp_file, CACHE_FILE)
+
+    _sessions = sessions
+    return _sessions
+
+def to_day(date):
+    """
+    Convert a date-like value to a datetime64[D].
+
+    Timezone-aware timestamps keep their local date.
+
+    Args:
+        date (str, datetime, date, pd.Timestamp or np.datetime64): Date to convert,
+              strings in YYYY-MM-DD format (a time part is ignored)
+
+    Returns:
+        np.datetime64: The date
+    """
+    if isinstance(date, str):
+        return np.datetime64(date[:10], 'D')
+    if isinstance(date, np.datetime64):
+        return date.astype('datetime64[D]')
+    if hasattr(date, 'date'):
+        return np.datetime64(date.date(), 'D')
+    return np.datetime64(date, 'D')
+
+def _search(date, side):
+    """searchsorted of a date in the sessions, checking it is inside the precomputed range"""
+    sessions = get_sessions()
+    day = to_day(date)
+    if day < sessions[0] or day > sessions[-1]:
+        raise ValueError(f"{day} is outside the precomputed sessions ({sessions[0]} to {sessions[-1]})")
+    return sessions, np.searchsorted(sessions, day, side=side)
+
+def is_session(date):
+    """Check if a date is a trading session"""
+    sessions, position = _search(date, 'left')
+    return position < len(sessions) and sessions[position] == to_day(date)
+
+def next_session(date):
+    """
+    Get the first session strictly after a date.
+
+    Args:
+        date: Reference date (see to_day for accepted types)
+
+    Returns:
+        datetime.date: Next session
+    """
+    sessions, position = _search(date, 'right')
+    if position == len(sessions):
+        raise ValueError(f"No session after {to_day(date)} in the precomputed range")
+    return sessions[position].item()
+
+def previous_session(date):
+    """
+    Get the last session strictly before a date.
+
+    Args:
+        date: Reference date (see to_day for accepted types)
+
+    Returns:
+        datetime.date: Previous session
+    """
+    sessions, position = _search(date, 'left')
+    if position == 0:
+        raise ValueError(f"No session before {to_day(date)} in the precomputed range")
+    return sessions[position - 1].item()
+
+def sessions_in_range(start_date, end_date):
+    """
+    Get the sessions between two dates, both included.
+
+    Args:
+        start_date: First date (see to_day for accepted types)
+        end_date: Last date (see to_day for accepted types)
+
+    Returns:
+        np.ndarray: datetime64[D] array of sessions
+    """
+    sessions, start = _search(start_date, 'left')
+    _, end = _search(end_date, 'right')
+    return sessions[start:end]
+
+def count_sessions(start_date, end_date):
+    """
+    Count the sessions between two dates, both included.
+
+    Args:
+        start_date: First date (see to_day for accepted types)
+        end_date: Last date (see to_day for accepted types)
+
+    Returns:
+        int: Number of sessions
+    """
+    _, start = _search(start_date, 'left')
+    _, end = _search(end_date, 'right')
+    return max(int(end - start), 0)
+
+if __name__ == "__main__":
+    sessions = get_sessions(rebuild=True)
+    print(f"Cached {len(sessions)} sessions from {sessions[0]} to {sessions[-1]} in {CACHE_FILE}")